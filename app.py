@@ -1,37 +1,47 @@
 ﻿# -*- coding: utf-8 -*-
+import importlib
 import streamlit as st
-from team_creator import render_team_creator
-from team_editor import render_team_editor
-from battle_judge import render_battle_judge
+from profiler import profile_rerun
+
+# ページ名 → (モジュール, 表示する関数)。モジュールはそのページを最初に選んだときに import する
+PAGES = {
+    "新規チーム作成": ("team_creator", "render_team_creator"),
+    "チーム自動探索": ("team_creator", "render_team_builder"),
+    "チーム選択・削除": ("team_editor", "render_team_editor"),
+    "バトル判定": ("battle_judge", "render_battle_judge"),
+}
+
+# ページを表示する関数を返す（import 済みのモジュールは sys.modules から返るので、読み込むのは最初の1回だけ）
+def load_page(page):
+    module_name, func_name = PAGES[page]
+    return getattr(importlib.import_module(module_name), func_name)
 
 # 左ペインのページ選択
-page = st.sidebar.radio("▼ ページを選んでください", options=["トップページ", "新規チーム作成", "チーム選択・削除", "バトル判定"], index=0)
+page = st.sidebar.radio("▼ ページを選んでください", options=["トップページ", *PAGES], index=0)
+
+# バックグラウンドで保存したチームの結果を通知（保存したことがあるセッションだけ team_creator を読み込む）
+if "pending_saves" in st.session_state:
+    importlib.import_module("team_creator").render_save_status()
 
-# ページの分岐
-if page == "新規チーム作成":
-    render_team_creator()
-    st.stop()
-elif page == "チーム選択・削除":
-    render_team_editor()
-    st.stop()
-elif page == "バトル判定":
-    render_battle_judge()
-    st.stop()
-else:
-    # トップページ
-    st.title("バトル相性カンニングシステム")
-    st.markdown(
-        """
-        このシステムは某「街を歩いてモンスターを捕まえるゲーム」のモンスターバトルでのタイプ相性を診断するツールです。<br>
-        自分のチームに登録したモンスターと、相手が使ってくるモンスターとのタイプ相性を自動で評価してくれます。<br>
-        「タイプ相性が覚えられない…」「どのモンスターが有利かわからない…」という方にぴったりのツールです。<br>
-        <br>
-        <h3>◆ 使い方</h3>
-        1. 「新規チーム作成」ページで自分のモンスター3体を選んでチームを作成<br>
-        2. 「チーム選択・削除」ページでバトルで使うチームを選択<br>
-        3. 「バトル判定」ページで相手のモンスターのタイプを入力すると相性診断が表示されます<br>
-        <br>
-        左側のメニュー（ラジオボタン）からページを選んでモンスターバトルに挑戦しましょう！
-        """,
-        unsafe_allow_html=True
-    )
+# ページの分岐（?profile=1 の場合は処理時間をサイドバーに表示）
+with profile_rerun():
+    if page in PAGES:
+        load_page(page)()
+    else:
+        # トップページ
+        st.title("バトル相性カンニングシステム")
+        st.markdown(
+            """
+            このシステムは某「街を歩いてモンスターを捕まえるゲーム」のモンスターバトルでのタイプ相性を診断するツールです。<br>
+            自分のチームに登録したモンスターと、相手が使ってくるモンスターとのタイプ相性を自動で評価してくれます。<br>
+            「タイプ相性が覚えられない…」「どのモンスターが有利かわからない…」という方にぴったりのツールです。<br>
+            <br>
+            <h3>◆ 使い方</h3>
+            1. 「新規チーム作成」ページで自分のモンスター3体を選んでチームを作成（「チーム自動探索」ページでおすすめのチームを探すこともできます）<br>
+            2. 「チーム選択・削除」ページでバトルで使うチームを選択<br>
+            3. 「バトル判定」ページで相手のモンスターのタイプを入力すると相性診断が表示されます<br>
+            <br>
+            左側のメニュー（ラジオボタン）からページを選んでモンスターバトルに挑戦しましょう！
+            """,
+            unsafe_allow_html=True
+        )
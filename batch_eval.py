@@ -0,0 +1,171 @@
+﻿# -*- coding: utf-8 -*-
+# Streamlit を起動せずに、多数のチーム × 相手チームの総合評価・攻撃評価・防御予測をまとめて計算する
+#
+# 使い方：
+#   python batch_eval.py saved_teams.json enemies.jsonl -o result.csv --workers 4
+#
+# - チーム：saved_teams.json と同じ形式（チームのリスト、拡張子 .json）、または1行に1チームの JSONL
+# - 相手チーム：1行に1チームの JSONL（例：[["ほのお", "不明"], ["みず", "じめん"], ["不明", "不明"]]）、
+#   またはそのリストの JSON（拡張子 .json、saved_teams.json 形式のチームも相手チームとして使える）
+# - 相手チームは CHUNK_SIZE 件ずつ読み込んで評価し、結果はすぐに書き出す（件数が多くてもメモリは一定）
+import argparse
+import collections
+import csv
+import io
+import json
+import multiprocessing
+import sys
+from type_logic import type_chart, calculation_totalscore_batch, evaluate_attack_defense, get_compiled_chart
+
+# 1回にまとめて評価する相手チームの数
+CHUNK_SIZE = 256
+
+# 出力する列
+FIELDS = ["チーム名", "相手チーム番号", "相手の番号", "相手のタイプ", "モンスター", "総合評価", "総合評価の記号", "攻撃評価", "防御予測"]
+
+# ワーカープロセスで使うチーム（プロセス起動時に1回だけ受け取る）
+_worker_teams = None
+
+# JSON（拡張子 .json、リスト）または JSONL（それ以外、"-" は標準入力）を1件ずつ読み込む
+def read_records(path):
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8-sig") as f:
+            yield from json.load(f)
+        return
+
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8-sig")
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# チームのモンスター3体（"1"〜"3" の順）
+def team_monsters(team):
+    return [team["モンスター"][key] for key in sorted(team["モンスター"], key=int)]
+
+# 相手チームを「タイプのリスト」に揃える
+def to_enemy_types_list(record):
+    """
+    - チーム（"モンスター" を持つ辞書）：モンスターのタイプ
+    - タイプ1つ分のリスト（例：["ほのお", "不明"]）：1体だけの相手チーム
+    - タイプのリストのリスト：そのまま
+    """
+    if isinstance(record, dict):
+        return [mon["タイプ"] for mon in team_monsters(record)]
+    if record and all(isinstance(t, str) or t is None for t in record):
+        return [record]
+    return record
+
+# 相手チームのまとまりを評価して、出力する行を返す
+def evaluate_chunk(teams, chunk):
+    """
+    - teams: 自分のチームのリスト
+    - chunk: (相手チーム番号, タイプのリスト) のリスト
+    - 戻り値：FIELDS の列を持つ辞書のリスト
+    """
+    type_ids = get_compiled_chart(type_chart).type_ids
+    enemies = [(number, j, types) for number, enemy_types_list in chunk for j, types in enumerate(enemy_types_list)]
+    rows = []
+    for team in teams:
+        mons = team_monsters(team)
+        scores, marks, _ = calculation_totalscore_batch(mons, [types for _, _, types in enemies], type_chart)
+        for i, mon in enumerate(mons):
+            moves = [move for move in mon["わざ"] if move in type_ids]
+            for e, (number, j, types) in enumerate(enemies):
+                attack = evaluate_attack_defense(moves, types, type_chart, is_attack=True)
+                defense = evaluate_attack_defense([t for t in types if t in type_ids], mon["タイプ"], type_chart, is_attack=False)
+                rows.append({
+                    "チーム名": team["チーム名"],
+                    "相手チーム番号": number,
+                    "相手の番号": j + 1,
+                    "相手のタイプ": "/".join(t or "不明" for t in types),
+                    "モンスター": mon["名前"],
+                    "総合評価": round(float(scores[i, e]), 4),
+                    "総合評価の記号": str(marks[i, e]),
+                    "攻撃評価": attack.mark if attack else "",
+                    "防御予測": defense.mark if defense else "",
+                })
+    return rows
+
+# 出力する行を CSV（ヘッダーなし）または JSONL の文字列にする
+def format_rows(rows, output_format):
+    buffer = io.StringIO()
+    if output_format == "csv":
+        csv.DictWriter(buffer, fieldnames=FIELDS, lineterminator="\n").writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return buffer.getvalue(), len(rows)
+
+def _init_worker(teams):
+    global _worker_teams
+    _worker_teams = teams
+
+# ワーカーでは書き出す文字列まで作って返す（行の辞書を親プロセスに送るより軽い）
+def _evaluate_worker_chunk(task):
+    chunk, output_format = task
+    return format_rows(evaluate_chunk(_worker_teams, chunk), output_format)
+
+# 相手チームを CHUNK_SIZE 件ずつにまとめる
+def chunked(records, size=CHUNK_SIZE):
+    chunk = []
+    for number, record in enumerate(records, start=1):
+        chunk.append((number, to_enemy_types_list(record)))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# まとまりごとの出力（文字列, 行数）を入力順に返す（並列の場合も、処理待ちのまとまりは workers × 2 件まで）
+def evaluate_all(teams, chunks, output_format, workers=1):
+    if workers <= 1:
+        for chunk in chunks:
+            yield format_rows(evaluate_chunk(teams, chunk), output_format)
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(teams,)) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_evaluate_worker_chunk, ((chunk, output_format),)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+# 結果を順に書き出す（CSV の場合は先頭にヘッダー）
+def write_results(results, out, output_format):
+    if output_format == "csv":
+        out.write(",".join(FIELDS) + "\n")
+    count = 0
+    for text, rows in results:
+        out.write(text)
+        count += rows
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="チーム × 相手チームの総合評価・攻撃評価・防御予測をまとめて計算します")
+    parser.add_argument("teams", help="自分のチーム（.json：saved_teams.json 形式、それ以外：JSONL）")
+    parser.add_argument("enemies", help="相手チーム（.json：リスト、それ以外：JSONL、\"-\" で標準入力）")
+    parser.add_argument("-o", "--output", default="-", help="出力先（省略時は標準出力）")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="出力形式（省略時は出力先の拡張子、標準出力は csv）")
+    parser.add_argument("--workers", type=int, default=1, help="並列で評価するプロセス数")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ("jsonl" if args.output.endswith(".jsonl") else "csv")
+    teams = list(read_records(args.teams))
+    chunks = chunked(read_records(args.enemies))
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        count = write_results(evaluate_all(teams, chunks, output_format, args.workers), out, output_format)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{count} 件を出力しました", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,33 @@
 ﻿# -*- coding: utf-8 -*-
 import streamlit as st
-import base64
-import uuid
-import json
-import os
 import random
-from ui_components import IMAGE_OPTIONS, TYPE_IMAGE_OPTIONS, prepare_base64_images, show_icon, render_monster_image_battlestate, render_type_icons, render_icon_selector
-from type_logic import  calculation_attack_defense_evaluation, calculation_totalscore, render_evaluation_guide
+import numpy as np
+from ui_components import TYPE_IMAGE_OPTIONS, ImageMap, icon_src, render_monster_image_battlestate, render_type_icons, render_icon_selector
+from type_logic import  type_chart, calculation_attack_defense_evaluation, calculation_totalscore, get_total_mark, load_meta_frequencies, render_evaluation_guide, render_meta_expectation
 from team_editor import load_saved_teams
-
-# タイプ相性表を読み込む
-with open("type_chart.json", encoding="utf-8") as f:
-    type_chart = json.load(f)
-
-# base64画像を準備
-TYPE_IMAGE_BASE64 = prepare_base64_images(TYPE_IMAGE_OPTIONS)
-IMAGE_BASE64 = prepare_base64_images(IMAGE_OPTIONS)
+from matchup_solver import solve_matchup
+from battle_simulator import MAX_SHIELDS, simulate_battles
+from shield_optimizer import optimize_shields
+from switch_advisor import recommend_switch
+from counter_index import get_counters
+from profiler import profiled, profiled_fragment
+
+# base64画像（全ページで共有するレジストリから、最初に使うときに読み込む）
+TYPE_IMAGE_BASE64 = ImageMap("move_icons")
+IMAGE_BASE64 = ImageMap("images")
+
+# 画面のパネル（st.fragment のキー。ボタンの on_click から st.rerun で、変わるパネルだけを再実行する）
+ENEMY_TYPE_PANEL = "battle_enemy_type_panel"
+WARNING_PANEL = "battle_warning_panel"
+ENEMY_PANEL = "battle_enemy_panel"
+MY_PANEL = "battle_my_panel"
+EVALUATION_PANEL = "battle_evaluation_panel"
+
+# 操作ごとに再実行するパネル
+ENEMY_TYPE_CHANGE_PANELS = [ENEMY_TYPE_PANEL, ENEMY_PANEL, MY_PANEL, EVALUATION_PANEL]
+ENEMY_FAINT_PANELS = [ENEMY_TYPE_PANEL, WARNING_PANEL, ENEMY_PANEL, MY_PANEL, EVALUATION_PANEL]
+MY_SWITCH_PANELS = [MY_PANEL, EVALUATION_PANEL]
+MY_FAINT_PANELS = [WARNING_PANEL, MY_PANEL, EVALUATION_PANEL]
 
 # セッション初期化
 def initialize_session_state(image_base64, load_teams):
@@ -100,9 +112,83 @@ def reset_battle():
     # 自分と相手の選択中インデックスを初期化（0番目に戻す）
     st.session_state["enemy_active_index"] = 0
     st.session_state["active_index"] = 0
-    st.rerun()
+
+    # シールドの残り回数を初期値に戻す
+    st.session_state.pop("my_shields", None)
+    st.session_state.pop("enemy_shields", None)
+
+# 選択中の相手モンスターに、選択しているタイプを仮設定
+def apply_enemy_type_selection():
+    if st.session_state["enemy_config_index"] < 3:
+        idx = st.session_state["enemy_config_index"]
+        st.session_state["enemy_mons"][idx]["タイプ"] = [
+            st.session_state.get("enemy_type1") or "不明",
+            st.session_state.get("enemy_type2") or "不明"
+        ]
+
+# 相手のタイプを選択・解除した（アイコン選択のコンポーネントのコールバックから呼ばれる）
+def change_enemy_type():
+    apply_enemy_type_selection()
+    st.rerun(scope=ENEMY_TYPE_CHANGE_PANELS)
+
+# ひんしにする（ボタンの on_click で、再実行の前にまとめて状態を更新して、変わるパネルだけを再実行する）
+def faint_monster(i: int, role: str = "self"):
+    fainted_list = st.session_state["fainted" if role == "self" else "enemy_fainted"]
+    fainted_list[i] = True
+
+    # 自分のモンスターは、ひんしの表示と評価だけを再実行する
+    if role != "enemy":
+        st.rerun(scope=MY_FAINT_PANELS)
+        return
+
+    # 未反映のままひんしになった場合選択を解除
+    if i == st.session_state["enemy_config_index"]:
+        st.session_state["enemy_type1"] = None
+        st.session_state["enemy_type2"] = None
+        st.session_state["enemy_config_index"] += 1
+
+    mons = st.session_state["enemy_mons"]
+    alive_indices = [
+        j for j, f in enumerate(fainted_list)
+        if not f and any(t != "不明" for t in mons[j]["タイプ"])
+    ]
+
+    # 条件①：2体ひんし → 残りの1体に自動切替
+    if len(alive_indices) == 1:
+        st.session_state["enemy_active_index"] = alive_indices[0]
+
+    # 条件②：1体目がひんし → 2体目が生存＆タイプ未設定なら2体目へ（自動で次を設定）
+    elif i == 0 and not fainted_list[1] and all(t == "不明" for t in mons[1]["タイプ"]):
+        st.session_state["enemy_active_index"] = 1
+
+    st.rerun(scope=ENEMY_FAINT_PANELS)
+
+# 入替える（ボタンの on_click で、再実行の前にまとめて状態を更新して、変わるパネルだけを再実行する）
+def switch_monster(i: int, role: str = "self"):
+
+    # 相手モンスターのタイプ選択中（未反映）なら保存してリセット
+    if role == "enemy":
+        idx = st.session_state["enemy_config_index"]
+        type1 = st.session_state.get("enemy_type1")
+        type2 = st.session_state.get("enemy_type2")
+
+        # どちらかのタイプが選択されていれば、現在のモンスターに反映
+        if type1 or type2:
+            st.session_state["enemy_mons"][idx]["タイプ"] = [
+                type1 or "不明",
+                type2 or "不明"
+            ]
+            # 選択状態をリセットして次のモンスターへ
+            st.session_state["enemy_type1"] = None
+            st.session_state["enemy_type2"] = None
+            st.session_state["enemy_config_index"] += 1
+
+    # 入替え対象のモンスターに移動する
+    st.session_state["active_index" if role == "self" else "enemy_active_index"] = i
+    st.rerun(scope=MY_SWITCH_PANELS if role == "self" else ENEMY_TYPE_CHANGE_PANELS)
 
 # 戦闘時モンスター切替ボタン・ひんし設定
+@profiled
 def render_monster_button(i: int, role: str = "self"):
     """
     モンスターの戦闘ボタン（入替え・ひんし）を描画し、
@@ -132,30 +218,7 @@ def render_monster_button(i: int, role: str = "self"):
     if active and not fainted:
 
         # ひんしにする
-        if st.button(faint_label, key=faint_key):
-            fainted_list[i] = True
-
-            # 未反映のままひんしになった場合選択を解除
-            if role == "enemy" and i == st.session_state["enemy_config_index"]:
-                st.session_state["enemy_type1"] = None
-                st.session_state["enemy_type2"] = None
-                st.session_state["enemy_config_index"] += 1
-
-            if role == "enemy":
-                alive_indices = [
-                    j for j, f in enumerate(fainted_list)
-                    if not f and any(t != "不明" for t in mons[j]["タイプ"])
-                ]
-
-                # 条件①：2体ひんし → 残りの1体に自動切替
-                if len(alive_indices) == 1:
-                    st.session_state["enemy_active_index"] = alive_indices[0]
-
-                # 条件②：1体目がひんし → 2体目が生存＆タイプ未設定なら2体目へ（自動で次を設定）
-                elif i == 0 and not fainted_list[1] and all(t == "不明" for t in mons[1]["タイプ"]):
-                    st.session_state["enemy_active_index"] = 1
-
-            st.rerun()
+        st.button(faint_label, key=faint_key, on_click=faint_monster, args=(i, role))
 
     # ひんしでない場合：入替えボタンを表示
     elif not fainted:
@@ -172,29 +235,8 @@ def render_monster_button(i: int, role: str = "self"):
 
         if can_switch:
 
-            # 入替えボタンがクリックされた場合：
-            if st.button(select_label, key=select_key):
-                
-                # 相手モンスターのタイプ選択中（未反映）なら保存してリセット
-                if role == "enemy":
-                    idx = st.session_state["enemy_config_index"]
-                    type1 = st.session_state.get("enemy_type1")
-                    type2 = st.session_state.get("enemy_type2")
-
-                    # どちらかのタイプが選択されていれば、現在のモンスターに反映
-                    if type1 or type2:
-                        st.session_state["enemy_mons"][idx]["タイプ"] = [
-                            type1 or "不明",
-                            type2 or "不明"
-                        ]
-                        # 選択状態をリセットして次のモンスターへ
-                        st.session_state["enemy_type1"] = None
-                        st.session_state["enemy_type2"] = None
-                        st.session_state["enemy_config_index"] += 1
-                
-                # 入替え対象のモンスターに移動する
-                st.session_state[active_key] = i
-                st.rerun()
+            # 入替えボタン
+            st.button(select_label, key=select_key, on_click=switch_monster, args=(i, role))
         else:
             # モンスターのタイプ未選択時：入替え不可の案内を表示
             st.markdown(
@@ -219,6 +261,7 @@ def render_monster_button(i: int, role: str = "self"):
             
 
 # 戦闘画面：相手または自分のモンスター3体を横並びで表示（自分には評価も表示）
+@profiled
 def render_team_cards(mons, role="self", show_evaluation=False, type_chart=None):
     active_key = "active_index" if role == "self" else "enemy_active_index"
     fainted_key = "fainted" if role == "self" else "enemy_fainted"
@@ -249,7 +292,7 @@ def render_team_cards(mons, role="self", show_evaluation=False, type_chart=None)
             # 画像とタイプ表示
             img_col, type_col = st.columns([1, 1])
             with img_col:
-                render_monster_image_battlestate(IMAGE_BASE64[mon["画像"]], width=80, darken=fainted, highlight=active)
+                render_monster_image_battlestate(icon_src(IMAGE_BASE64, mon["画像"], 80), width=80, darken=fainted, highlight=active)
             with type_col:
                 render_type_icons(mon["タイプ"], TYPE_IMAGE_BASE64, width=30)
 
@@ -266,7 +309,189 @@ def render_team_cards(mons, role="self", show_evaluation=False, type_chart=None)
                 else:
                     st.markdown("<span style='color:gray;'>相手のモンスターのタイプを選択、またはモンスターをすると評価が表示されます</span>", unsafe_allow_html=True)
 
+# 3対3の相性表とおすすめの組み合わせ・出す順番を表示
+def render_matchup_solution(my_mons, enemy_mons, type_chart):
+    solution = solve_matchup(my_mons, [mon["タイプ"] for mon in enemy_mons], type_chart)
+
+    # 相手のタイプが1体も分かっていない場合：案内を表示
+    if not solution.known_enemies:
+        st.markdown("<span style='color:gray;'>相手のモンスターのタイプを選択すると、相性表とおすすめの組み合わせが表示されます</span>", unsafe_allow_html=True)
+        return
+
+    # 相性表（自分のモンスター × 相手のモンスターの総合評価）
+    header = "".join(f"<th>{enemy['名前']}</th>" for enemy in enemy_mons)
+    rows = ""
+    for i, mon in enumerate(my_mons):
+        cells = ""
+        for j in range(len(enemy_mons)):
+            score = solution.scores[i, j]
+            if np.isnan(score):
+                cells += "<td style='color:gray;'>？</td>"
+            else:
+                mark, color = get_total_mark(score)
+                cells += f"<td style='color:{color};'>{mark}（{score:.2f}）</td>"
+        rows += f"<tr><th>{mon['名前']}</th>{cells}</tr>"
+    st.markdown(f"<table><tr><th></th>{header}</tr>{rows}</table>", unsafe_allow_html=True)
+
+    # タイプが分かっている相手ごとのおすすめ
+    st.markdown("◆ おすすめの組み合わせ：")
+    for enemy_index, my_index in solution.assignment:
+        st.markdown(f"- {enemy_mons[enemy_index]['名前']} には **{my_mons[my_index]['名前']}**（{solution.scores[my_index, enemy_index]:.2f}）")
+
+    # 相手の登場順に合わせたおすすめの出す順番
+    order = " → ".join(my_mons[i]["名前"] for i in solution.lead_order)
+    st.markdown(f"◆ おすすめの出す順番：{order}")
+
+# バトル中の相手のタイプに対する理想の対策（攻撃タイプ・防御タイプの組の上位）を表示
+def render_ideal_counters(enemy_mons, type_chart, top=3):
+    enemy_types = enemy_mons[st.session_state["enemy_active_index"]]["タイプ"]
+    counters = get_counters(enemy_types, type_chart)
+
+    # 相手のタイプが分かっていない場合：案内を表示
+    if counters is None:
+        st.markdown("<span style='color:gray;'>バトル中の相手のモンスターのタイプを選択すると、理想の対策が表示されます</span>", unsafe_allow_html=True)
+        return
+
+    icon = lambda t: f"<img src='{icon_src(TYPE_IMAGE_BASE64, t, 24)}' width='24' title='{t}'>"
+    attack = "　".join(f"{icon(t)} {t}（{value:g}倍）" for t, value in counters.attack_types[:top])
+    defense = "　".join(
+        f"{''.join(icon(t) for t in types if t != '未')} {'・'.join(t for t in types if t != '未')}（被ダメージ {value:g}倍）"
+        for types, value in counters.defense_types[:top]
+    )
+    st.markdown(f"◆ 有効な攻撃タイプ：{attack}", unsafe_allow_html=True)
+    st.markdown(f"◆ 受けに強いタイプ：{defense}", unsafe_allow_html=True)
+
+# 今のバトルの状態から、入替え先のおすすめ順を表示
+def render_switch_recommendation(my_mons, enemy_mons, type_chart):
+    recommendations = recommend_switch(
+        my_mons, [mon["タイプ"] for mon in enemy_mons], type_chart,
+        active_index=st.session_state["active_index"], enemy_active_index=st.session_state["enemy_active_index"],
+        my_fainted=st.session_state["fainted"], enemy_fainted=st.session_state["enemy_fainted"],
+    )
+
+    # 自分または相手の全モンスターがひんしの場合：表示しない
+    if not recommendations:
+        return
+
+    for rank, recommendation in enumerate(recommendations, start=1):
+        note = "（バトル中）" if recommendation.is_active else ""
+        st.markdown(f"{rank}. **{my_mons[recommendation.index]['名前']}**{note}：勝率 {recommendation.win_rate:.0%}")
+    st.markdown("<span style='color:gray;'>※ 残りのモンスター同士の1対1の相性から、相手が一番不利なモンスターを出してくると仮定して見積もった勝率です</span>", unsafe_allow_html=True)
+
+# バトルをランダムにシミュレーションした勝率（最初に出すモンスターごと・今から入替えるモンスターごと）を表示
+def render_battle_simulation(my_mons, enemy_mons, type_chart):
+    if not st.toggle("勝率シミュレーションを表示", key="show_simulation"):
+        return
+
+    # タイプ不明の相手は、出現頻度ファイルがあればその頻度で、なければ全タイプから均等に選ぶ
+    meta = load_meta_frequencies(type_chart=type_chart)
+    result = simulate_battles(
+        my_mons, [mon["タイプ"] for mon in enemy_mons], type_chart,
+        my_fainted=st.session_state["fainted"], enemy_fainted=st.session_state["enemy_fainted"],
+        enemy_active=st.session_state["enemy_active_index"],
+        unknown_pool=(meta.enemy_types, meta.weights) if meta else None,
+    )
+
+    rows = ""
+    for i, mon in enumerate(my_mons):
+        switch_rate = result.switch_win_rates[i]
+        switch_cell = "<td style='color:gray;'>ひんし</td>" if np.isnan(switch_rate) else f"<td>{switch_rate:.0%}</td>"
+        rows += f"<tr><th>{mon['名前']}</th><td>{result.lead_win_rates[i]:.0%}</td>{switch_cell}</tr>"
+    st.markdown(f"<table><tr><th></th><th>最初に出す場合</th><th>今から入替える場合</th></tr>{rows}</table>", unsafe_allow_html=True)
+    st.markdown(f"<span style='color:gray;'>※ 開始状態ごとに {result.battles} 回のバトルをランダムに行った勝率です（わざの威力やステータスは考えていません）</span>", unsafe_allow_html=True)
+
+# 今のバトルの状態で、相手のスペシャルわざにシールドを使うべきかを表示
+def render_shield_plan(my_mons, enemy_mons, type_chart):
+    left, right = st.columns(2)
+    with left:
+        my_shields = st.select_slider("自分のシールドの残り", options=list(range(MAX_SHIELDS + 1)), value=MAX_SHIELDS, key="my_shields")
+    with right:
+        enemy_shields = st.select_slider("相手のシールドの残り", options=list(range(MAX_SHIELDS + 1)), value=MAX_SHIELDS, key="enemy_shields")
+
+    plan = optimize_shields(
+        my_mons, [mon["タイプ"] for mon in enemy_mons], type_chart,
+        active_index=st.session_state["active_index"], enemy_active_index=st.session_state["enemy_active_index"],
+        my_fainted=st.session_state["fainted"], enemy_fainted=st.session_state["enemy_fainted"],
+        my_shields=my_shields, enemy_shields=enemy_shields,
+    )
+
+    # バトル中のモンスターがひんしの場合：案内を表示
+    if plan is None:
+        st.markdown("<span style='color:gray;'>バトル中のモンスターがひんしです。入替えるとシールドの使い方が表示されます</span>", unsafe_allow_html=True)
+        return
+
+    st.markdown(f"◆ シールドを最適に使った場合の勝率：**{plan.win_rate:.0%}**（使わない場合：{plan.no_shield_win_rate:.0%}）")
+    if not plan.decisions:
+        st.markdown("- 今の対面ではシールドを使う場面はありません")
+    for decision in plan.decisions:
+        advice = "<span style='color:red;'>シールドを使う</span>" if decision.use_shield else "シールドを使わない"
+        st.markdown(
+            f"- 相手の{decision.special_count}回目のスペシャルわざ：{advice}（使う：{decision.shield_win_rate:.0%} ／ 使わない：{decision.no_shield_win_rate:.0%}）",
+            unsafe_allow_html=True
+        )
+
+# パネル：相手のモンスターのタイプ選択
+@profiled_fragment(key=ENEMY_TYPE_PANEL)
+def render_enemy_type_panel():
+    st.markdown("### 1. 相手のモンスターのタイプを２つまで選択してください")
+    render_icon_selector(label_list=list(TYPE_IMAGE_OPTIONS.keys()), base64_dict=TYPE_IMAGE_BASE64, selected_labels=[st.session_state.get("enemy_type1"), st.session_state.get("enemy_type2")], session_keys=("enemy_type1", "enemy_type2"), max_select=2, title="", image_width=40, columns_per_row=9, highlight_color="#00ccff", border_color="#007BFF", show_label=True, rerun_on_select=True, on_change=change_enemy_type)
+    st.markdown("※ 一度他のモンスターに入替えるとタイプは変更できません")
+
+# パネル：自分または相手の全モンスターがひんしなら警告表示
+@profiled_fragment(key=WARNING_PANEL)
+def render_battle_warning():
+    fainted_self = st.session_state["fainted"]
+    fainted_enemy = st.session_state["enemy_fainted"]
+    if all(fainted_self) or all(fainted_enemy):
+        who = "自分" if all(fainted_self) else "相手"
+        st.markdown(
+            f"<div style='color:red; font-weight:bold;'>{who}のモンスターがすべてひんしです。ページ下部から次のバトルを選択してください。</div>",
+            unsafe_allow_html=True
+        )
+
+# パネル：相手のモンスター
+@profiled_fragment(key=ENEMY_PANEL)
+def render_enemy_panel():
+    st.markdown("#### 相手のモンスター")
+    render_team_cards(st.session_state["enemy_mons"], role="enemy")
+
+# パネル：自分のチームのモンスターとタイプ相性の評価
+@profiled_fragment(key=MY_PANEL)
+def render_my_panel(my_mons):
+    st.markdown("#### 自分のモンスター")
+    render_team_cards(my_mons, role="self", show_evaluation=True, type_chart=type_chart)
+
+# パネル：相性表・入替えのおすすめ・シミュレーション・シールド・環境に対する期待スコア
+@profiled_fragment(key=EVALUATION_PANEL)
+def render_evaluation_panel(my_mons):
+    enemy_mons = st.session_state["enemy_mons"]
+
+    # 3対3の相性表
+    st.markdown("#### 相性表とおすすめの組み合わせ")
+    render_matchup_solution(my_mons, enemy_mons, type_chart)
+
+    # バトル中の相手に対する理想の対策（保存したインデックスから引く）
+    st.markdown("#### 理想の対策")
+    render_ideal_counters(enemy_mons, type_chart)
+
+    # 入替えのおすすめ
+    st.markdown("#### 入替えのおすすめ")
+    render_switch_recommendation(my_mons, enemy_mons, type_chart)
+
+    # 3対3のバトルのシミュレーション（トグル・スライダーの操作はこのパネルだけ再実行される）
+    st.markdown("#### バトルのシミュレーション")
+    render_battle_simulation(my_mons, enemy_mons, type_chart)
+
+    # シールドの使い方
+    st.markdown("#### シールドの使い方")
+    render_shield_plan(my_mons, enemy_mons, type_chart)
+
+    # 環境（よく使われる相手のタイプ）に対する期待スコア
+    st.markdown("#### 環境に対する期待スコア")
+    render_meta_expectation(my_mons, type_chart)
+
 # 【メイン】バトルの評価
+@profiled
 def render_battle_judge():
 
     # ローディング
@@ -302,7 +527,7 @@ def render_battle_judge():
         load_teams = load_saved_teams()
 
         # チームが存在しない場合：案内を表示して処理終了
-        if not isinstance(load_teams, list) or not load_teams:
+        if not load_teams:
             st.info("作成済みのチームはありません。左のメニューから「新規チーム作成」を選んで、チームを登録してください。")
 
             # ローディング完了メッセージ
@@ -315,50 +540,25 @@ def render_battle_judge():
         # ローディング用メッセージ
         status.update(label="タイプアイコン を ひょうじチュウ ... ⚡")
 
+        # 選択中の相手モンスターにタイプを仮設定
+        apply_enemy_type_selection()
+
         # 相手モンスターのタイプ選択
-        st.markdown("### 1. 相手のモンスターのタイプを２つまで選択してください")
-        render_icon_selector(label_list=list(TYPE_IMAGE_OPTIONS.keys()), base64_dict=TYPE_IMAGE_BASE64, selected_labels=[st.session_state.get("enemy_type1"), st.session_state.get("enemy_type2")], session_keys=("enemy_type1", "enemy_type2"), max_select=2, title="", image_width=40, columns_per_row=9, highlight_color="#00ccff", border_color="#007BFF", show_label=True, rerun_on_select=True)
+        render_enemy_type_panel()
 
         # 自分の選択済みチームのモンスター3体を取得
         selected_team = load_teams[st.session_state["selected_team_index"]]
         my_mons = [selected_team["モンスター"][str(i)] for i in range(1, 4)]
 
-        # タイプ選択の状態を取得（未選択時：不明）
-        type1 = st.session_state.get("enemy_type1") or "不明"
-        type2 = st.session_state.get("enemy_type2") or "不明"
-
-        # 相手モンスター情報をセッションから取得
-        enemy_mons = st.session_state["enemy_mons"]
-
-        # 選択中の相手モンスターにタイプを仮設定
-        if st.session_state["enemy_config_index"] < 3: 
-            idx = st.session_state["enemy_config_index"]
-            st.session_state["enemy_mons"][idx]["タイプ"] = [
-                st.session_state.get("enemy_type1") or "不明",
-                st.session_state.get("enemy_type2") or "不明"
-            ]
-            
-        st.markdown("※ 一度他のモンスターに入替えるとタイプは変更できません")
-
         # ひんしチェックと警告表示
-        fainted_self = st.session_state["fainted"]
-        fainted_enemy = st.session_state["enemy_fainted"]
-
-        # 自分または相手の全モンスターがひんしなら警告表示
-        if all(fainted_self) or all(fainted_enemy):
-            who = "自分" if all(fainted_self) else "相手"
-            st.markdown(
-                f"<div style='color:red; font-weight:bold;'>{who}のモンスターがすべてひんしです。ページ下部から次のバトルを選択してください。</div>",
-                unsafe_allow_html=True
-            )
+        render_battle_warning()
 
         # ローディング用メッセージ
         status.update(label="あいて の モンスター を ひょうじチュウ ... ⚡")
 
         # バトル評価
         st.markdown("### 2.モンスターを入替えながらバトル相性を確認しよう")
-        st.markdown("#### 相手のモンスター")
-        render_team_cards(st.session_state["enemy_mons"], role="enemy")
+        render_enemy_panel()
 
         # 「VS」表示（配置：中央）
         left, center, right = st.columns([1, 2, 1])
@@ -369,15 +569,16 @@ def render_battle_judge():
         status.update(label="じぶん の モンスター を ひょうじチュウ ... ⚡")
 
         # 自分のチームのモンスターとタイプ相性の評価の表示
-        st.markdown("#### 自分のモンスター")
-        render_team_cards(my_mons, role="self", show_evaluation=True, type_chart=type_chart)
+        render_my_panel(my_mons)
+
+        # 相性表・シミュレーションなどの評価
+        render_evaluation_panel(my_mons)
 
         st.markdown("---")
 
         # 「新しいバトルをはじめる」ボタンが押されたら状態をリセット
         st.markdown("### バトル終了後：つぎのバトル")
-        if st.button("新しいバトルをはじめる"):
-            reset_battle()
+        st.button("新しいバトルをはじめる", on_click=reset_battle)
 
     # ローディング完了メッセージ
     status.update(label="じゅんび かんりょう！ バトル を はじめよう 🔥", state="complete")
\ No newline at end of file
@@ -0,0 +1,204 @@
+﻿# -*- coding: utf-8 -*-
+from typing import NamedTuple
+import numpy as np
+from bounded_cache import BoundedCache
+from type_logic import get_compiled_chart, get_defender_combinations, to_defender_ids
+
+# バトルの簡易モデル（HP は全モンスター 1.0、ステータス差は考えない）
+NORMAL_POWER = 0.06     # ノーマルわざ1回のダメージ（等倍）
+SPECIAL_POWER = 0.30    # スペシャルわざ1回のダメージ（等倍）
+ENERGY_GAIN = 10        # ノーマルわざ1回でたまるエネルギー
+SPECIAL_COST = 50       # スペシャルわざに必要なエネルギー
+MAX_SHIELDS = 3         # シールドの最大回数
+SHIELD_RATE = 0.5       # スペシャルわざを受けるときにシールドを使う確率（ひんしになる場合は必ず使う）
+DAMAGE_NOISE = (0.85, 1.0)  # ダメージのばらつき
+MAX_TURNS = 300         # これを超えたら残りHPの合計で勝敗を決める
+
+# シミュレーション結果
+class SimulationResult(NamedTuple):
+    lead_win_rates: np.ndarray    # 最初に出すモンスターごとの勝率（バトル開始時から）
+    switch_win_rates: np.ndarray  # 今の状態から入替えるモンスターごとの勝率（ひんしのモンスターは nan）
+    battles: int                  # 開始状態ごとのバトル数
+
+# 結果のキャッシュ（(チーム, 相手のタイプ, 状態, バトル数, 乱数シード, 不明な相手の候補, 相性表のバージョン) ごと）
+_results = BoundedCache(maxsize=256)
+
+# タイプ不明の相手の候補と重みのキャッシュキー（オブジェクトの id は使い回されることがあるので中身で比べる）
+def _unknown_pool_key(unknown_pool):
+    if not unknown_pool:
+        return None
+    types, weights = unknown_pool
+    return (
+        tuple(tuple(t) for t in types),
+        None if weights is None else np.asarray(weights, dtype=np.float64).tobytes(),
+    )
+
+# わざのタイプID（"なし"・"未"・空欄は使えないわざ）
+def _move_ids(moves, compiled):
+    return [compiled.type_ids[move] for move in moves if move in compiled.type_ids]
+
+# 自分のわざ・タイプと相手のタイプ（バトルごと）から倍率の配列を作る
+def move_multipliers(team, enemy_ids, compiled):
+    """
+    - enemy_ids: shape (バトル数, 3, 2) の相手のタイプID（"不明" は等倍ID）
+    - 戻り値：自分→相手のノーマル・スペシャル倍率 (バトル数, 自分, 相手)、相手→自分のノーマル・スペシャル倍率 (バトル数, 相手, 自分)
+    """
+    lookup, neutral_id = compiled.lookup, compiled.neutral_id
+    first, second = enemy_ids[:, None, :, 0], enemy_ids[:, None, :, 1]
+
+    # 自分のわざ（ノーマルわざがない場合は等倍、スペシャルわざは倍率が最大のもの）
+    my_normal, my_special = [], []
+    for mon in team:
+        normal = _move_ids(mon["わざ"][:1], compiled) or [neutral_id]
+        specials = _move_ids(mon["わざ"][1:], compiled) or [neutral_id]
+        my_normal.append(normal[0])
+        my_special.append(specials)
+    normal_rows = np.array(my_normal)[None, :, None]
+    my_normal = lookup[normal_rows, first] * lookup[normal_rows, second]
+    my_special = np.stack([
+        np.max([lookup[move, enemy_ids[:, :, 0]] * lookup[move, enemy_ids[:, :, 1]] for move in specials], axis=0)
+        for specials in my_special
+    ], axis=1)
+
+    # 相手のわざは相手のタイプと仮定（ノーマルわざはタイプ1、スペシャルわざはタイプ1・2の大きい方）
+    my_types = np.array([to_defender_ids(mon["タイプ"], compiled) for mon in team])
+    attack_first = enemy_ids[:, :, 0]
+    attack_second = np.where(enemy_ids[:, :, 1] == neutral_id, attack_first, enemy_ids[:, :, 1])
+    rows_first, rows_second = attack_first[:, :, None], attack_second[:, :, None]
+    defend_first, defend_second = my_types[None, None, :, 0], my_types[None, None, :, 1]
+    enemy_normal = lookup[rows_first, defend_first] * lookup[rows_first, defend_second]
+    enemy_special = np.maximum(enemy_normal, lookup[rows_second, defend_first] * lookup[rows_second, defend_second])
+    return my_normal, my_special, enemy_normal, enemy_special
+
+# ひんしになったモンスターの代わりに出すモンスター（優先度が一番高い、ひんしでないモンスター）
+def _next_active(hp, preference):
+    return np.where(hp > 0, preference, -np.inf).argmax(axis=1)
+
+# 開始状態をまとめてバトルを進める（バトルごとのループはせず、ターンごとに続いている全バトルを配列で計算）
+def _run_battles(my_hp, enemy_hp, my_active, enemy_active, multipliers, rng):
+    my_normal, my_special, enemy_normal, enemy_special = multipliers
+    battles = len(my_hp)
+    outcomes = np.full(battles, 0.5)
+    live = np.arange(battles)
+    my_energy = np.zeros(battles)
+    enemy_energy = np.zeros(battles)
+    my_shields = np.full(battles, MAX_SHIELDS)
+    enemy_shields = np.full(battles, MAX_SHIELDS)
+
+    # 入替え先の優先度（自分：ノーマル×1.2＋スペシャル−相手のスペシャル が大きい順、相手：番号の若い順）
+    my_preference = my_normal * 1.2 + my_special - np.swapaxes(enemy_special, 1, 2)
+    enemy_preference = -np.arange(3, dtype=float)
+
+    for _ in range(MAX_TURNS):
+        count = len(live)
+        if not count:
+            break
+        index = np.arange(count)
+
+        # わざの選択（エネルギーがたまっていればスペシャルわざ）とダメージ
+        my_use_special = my_energy >= SPECIAL_COST
+        enemy_use_special = enemy_energy >= SPECIAL_COST
+        my_damage = np.where(my_use_special, SPECIAL_POWER * my_special[live, my_active, enemy_active],
+                             NORMAL_POWER * my_normal[live, my_active, enemy_active]) * rng.uniform(*DAMAGE_NOISE, count)
+        enemy_damage = np.where(enemy_use_special, SPECIAL_POWER * enemy_special[live, enemy_active, my_active],
+                                NORMAL_POWER * enemy_normal[live, enemy_active, my_active]) * rng.uniform(*DAMAGE_NOISE, count)
+
+        # シールド（スペシャルわざを受けるとき、確率で または ひんしになる場合に使う）
+        enemy_shield = my_use_special & (enemy_shields > 0) & ((rng.random(count) < SHIELD_RATE) | (my_damage >= enemy_hp[index, enemy_active]))
+        my_shield = enemy_use_special & (my_shields > 0) & ((rng.random(count) < SHIELD_RATE) | (enemy_damage >= my_hp[index, my_active]))
+        enemy_shields -= enemy_shield
+        my_shields -= my_shield
+
+        # エネルギーとHPを更新
+        my_energy += np.where(my_use_special, -SPECIAL_COST, ENERGY_GAIN)
+        enemy_energy += np.where(enemy_use_special, -SPECIAL_COST, ENERGY_GAIN)
+        enemy_hp[index, enemy_active] -= np.where(enemy_shield, 0.0, my_damage)
+        my_hp[index, my_active] -= np.where(my_shield, 0.0, enemy_damage)
+
+        # ひんしになったら入替え（エネルギーは0から）
+        my_fainted = my_hp[index, my_active] <= 0
+        enemy_fainted = enemy_hp[index, enemy_active] <= 0
+        if my_fainted.any():
+            my_active = np.where(my_fainted, _next_active(my_hp, my_preference[live, :, enemy_active]), my_active)
+            my_energy[my_fainted] = 0.0
+        if enemy_fainted.any():
+            enemy_active = np.where(enemy_fainted, _next_active(enemy_hp, enemy_preference), enemy_active)
+            enemy_energy[enemy_fainted] = 0.0
+
+        # 決着がついたバトルの勝敗を記録し、続いているバトルだけを残す（勝ち：1、負け：0、同時に全滅：0.5）
+        if my_fainted.any() or enemy_fainted.any():
+            my_alive = my_hp.max(axis=1) > 0
+            enemy_alive = enemy_hp.max(axis=1) > 0
+            running = my_alive & enemy_alive
+            if not running.all():
+                outcomes[live[~running]] = np.where(my_alive, 1.0, np.where(enemy_alive, 0.0, 0.5))[~running]
+                live, my_hp, enemy_hp, my_active, enemy_active = live[running], my_hp[running], enemy_hp[running], my_active[running], enemy_active[running]
+                my_energy, enemy_energy = my_energy[running], enemy_energy[running]
+                my_shields, enemy_shields = my_shields[running], enemy_shields[running]
+
+    # 最大ターン数までに決着がつかない場合は残りHPの合計で決める（同じなら0.5）
+    left = np.clip(my_hp, 0, None).sum(axis=1) - np.clip(enemy_hp, 0, None).sum(axis=1)
+    outcomes[live] = np.sign(left) * 0.5 + 0.5
+    return outcomes
+
+def _simulate(team, enemy_types_list, my_fainted, enemy_fainted, enemy_active, n_battles, seed, type_chart, unknown_pool):
+    compiled = get_compiled_chart(type_chart)
+    rng = np.random.default_rng(seed)
+
+    # 開始状態：バトル開始時の先頭（3通り）＋ 今の状態からの入替え先（ひんしでないモンスター）
+    switch_targets = [i for i in range(3) if not my_fainted[i]]
+    starts = [(lead, (False, False, False), (False, False, False), 0) for lead in range(3)]
+    starts += [(target, my_fainted, enemy_fainted, enemy_active) for target in switch_targets]
+    battles = n_battles * len(starts)
+
+    # 相手のタイプ（タイプが不明な相手は、バトルごとに候補からランダムに決める）
+    unknown_types, unknown_weights = unknown_pool or (get_defender_combinations(type_chart), None)
+    unknown_ids = np.array([to_defender_ids(types, compiled) for types in unknown_types])
+    enemy_ids = np.empty((battles, 3, 2), dtype=np.intp)
+    for k, types in enumerate(enemy_types_list):
+        if any(t != "不明" and t is not None for t in types):
+            enemy_ids[:, k] = to_defender_ids(types, compiled)
+        else:
+            enemy_ids[:, k] = unknown_ids[rng.choice(len(unknown_ids), size=battles, p=unknown_weights)]
+    multipliers = move_multipliers(team, enemy_ids, compiled)
+
+    # 開始状態ごとのHP・バトル中のモンスター
+    my_hp = np.ones((battles, 3))
+    enemy_hp = np.ones((battles, 3))
+    my_active = np.empty(battles, dtype=np.intp)
+    enemy_active_start = np.empty(battles, dtype=np.intp)
+    for s, (lead, mine, theirs, active) in enumerate(starts):
+        block = slice(s * n_battles, (s + 1) * n_battles)
+        my_hp[block, list(mine)] = 0.0
+        enemy_hp[block, list(theirs)] = 0.0
+        my_active[block] = lead
+        enemy_active_start[block] = active if not theirs[active] else next((j for j in range(3) if not theirs[j]), active)
+
+    outcomes = _run_battles(my_hp, enemy_hp, my_active, enemy_active_start, multipliers, rng).reshape(len(starts), n_battles).mean(axis=1)
+    switch_win_rates = np.full(3, np.nan)
+    switch_win_rates[switch_targets] = outcomes[3:]
+    lead_win_rates = outcomes[:3]
+    lead_win_rates.setflags(write=False)
+    switch_win_rates.setflags(write=False)
+    return SimulationResult(lead_win_rates, switch_win_rates, n_battles)
+
+# 自分のチームと相手チームのバトルをランダムに何千回も行い、勝率を見積もる
+def simulate_battles(team, enemy_types_list, type_chart, my_fainted=(False, False, False), enemy_fainted=(False, False, False),
+                     enemy_active=0, n_battles=2000, seed=0, unknown_pool=None):
+    """
+    - team: 自分のモンスター3体（"わざ" と "タイプ" を持つ辞書）
+    - enemy_types_list: 相手のモンスター3体のタイプ（["不明", "不明"] の相手は unknown_pool からランダムに決める）
+    - my_fainted / enemy_fainted / enemy_active: 今のバトルの状態（入替えごとの勝率に使う）
+    - unknown_pool: タイプ不明の相手の候補と重み（None の場合は単一・複合タイプ171通りから均等に選ぶ）
+    - 戻り値：SimulationResult（同じ入力・同じシードなら同じ結果をキャッシュから返す）
+    """
+    key = (
+        tuple((tuple(mon["タイプ"]), tuple(mon["わざ"])) for mon in team),
+        tuple(tuple(types) for types in enemy_types_list),
+        tuple(my_fainted), tuple(enemy_fainted), enemy_active, n_battles, seed,
+        _unknown_pool_key(unknown_pool),
+        get_compiled_chart(type_chart).version,
+    )
+    return _results.get_or_create(
+        key, lambda: _simulate(team, enemy_types_list, tuple(my_fainted), tuple(enemy_fainted), enemy_active, n_battles, seed, type_chart, unknown_pool)
+    )
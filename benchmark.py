@@ -0,0 +1,211 @@
+﻿# -*- coding: utf-8 -*-
+# 評価・表示の処理時間を計測するベンチマーク（リポジトリのフォルダで実行する）
+#
+# 使い方：
+#   python benchmark.py -o benchmark_results.json                 計測して JSON に保存
+#   python benchmark.py --compare benchmark_results.json          保存した結果と比べる（遅くなっていたら終了コード 1）
+#   python benchmark.py -k totalscore --compare base.json --threshold 0.3
+#
+# - 入力は固定（単一タイプ・複合タイプ・"未"/"不明"）なので、同じ環境なら同じ条件で計測できる
+# - 各ベンチマークは repeat 回計測した1回あたりの時間の中央値で比べる
+# - startup/* は新しいプロセスで app.py を表示して、起動直後のトップページと最初に開いたバトル評価ページの時間を計測する
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import streamlit as st
+import streamlit.config
+import streamlit.logger
+from streamlit.testing.v1 import AppTest
+from type_logic import type_chart, calculation_attack_defense_evaluation, calculation_totalscore, get_effectiveness, get_label
+from ui_components import TYPE_IMAGE_OPTIONS, prepare_base64_images
+from counter_index import get_counters
+
+# 比較で「遅くなった」とみなす割合（0.2 = 20% 以上遅い）
+DEFAULT_THRESHOLD = 0.2
+
+# 入力のパターン（相手のタイプ）
+ENEMY_CASES = {
+    "single": ["くさ", "未"],
+    "dual": ["くさ", "はがね"],
+    "unknown": ["不明", "不明"],
+}
+
+# 自分のモンスター（わざ・タイプも単一・複合・"未" を含める）
+MONSTER = {"名前": "ベンチマーク", "画像": "ほのお", "タイプ": ["ほのお", "ひこう"], "わざ": ["ほのお", "ドラゴン", "未"]}
+
+# 倍率のラベルを付ける値（すべての区分を含む）
+LABEL_VALUES = [0.24, 0.39, 0.625, 1.0, 1.6, 2.56]
+
+# 全体の再実行の計測に使うアプリ
+BATTLE_SCRIPT = """
+from battle_judge import render_battle_judge
+render_battle_judge()
+"""
+
+# 起動の計測に使うスクリプト（新しいプロセスで実行して、計測した秒数を JSON で出力する）
+STARTUP_SCRIPT = """
+import json, sys, time
+import streamlit.config, streamlit.logger
+from streamlit.testing.v1 import AppTest
+streamlit.config.get_config_options()
+streamlit.logger.set_log_level("error")
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+start = time.perf_counter()
+at.run()
+top_page = time.perf_counter() - start
+at.sidebar.radio[0].set_value("バトル判定")
+start = time.perf_counter()
+at.run()
+print(json.dumps({"startup/top_page": top_page, "startup/first_battle_page": time.perf_counter() - start}))
+"""
+
+# 1回あたりの時間（秒）を repeat 回計測する（number 回まとめて実行して平均する）
+def measure(func, number, repeat):
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+# 関数を呼ぶベンチマーク（名前 → (関数, 1回の計測でまとめて実行する回数)、keyword を含む名前だけ）
+def function_benchmarks(keyword=None):
+    type_icons = prepare_base64_images(TYPE_IMAGE_OPTIONS)
+    benchmarks = {
+        "get_label": (lambda: [get_label(value) for value in LABEL_VALUES], 2000),
+    }
+    for case, enemy_types in ENEMY_CASES.items():
+        benchmarks[f"get_effectiveness/{case}"] = (lambda t=enemy_types: get_effectiveness("ほのお", t, type_chart), 20000)
+        benchmarks[f"calculation_totalscore/{case}"] = (lambda t=enemy_types: calculation_totalscore(MONSTER, t, type_chart), 2000)
+        benchmarks[f"get_counters/{case}"] = (lambda t=enemy_types: get_counters(t, type_chart), 20000)
+        benchmarks[f"calculation_attack_defense_evaluation/{case}"] = (
+            lambda t=enemy_types: (
+                calculation_attack_defense_evaluation("攻撃評価", MONSTER["わざ"], t, type_icons, type_chart, is_attack=True),
+                calculation_attack_defense_evaluation("防御予測", t, MONSTER["タイプ"], type_icons, type_chart, is_attack=False),
+            ),
+            200,
+        )
+    return {name: benchmark for name, benchmark in benchmarks.items() if not keyword or keyword in name}
+
+# バトル評価ページを AppTest で1回表示しておき、相手のタイプを固定して再実行する時間を計測する
+def rerun_benchmarks(keyword=None):
+    benchmarks = {}
+    for case, enemy_types in ENEMY_CASES.items():
+        name = f"render_battle_judge/{case}"
+        if keyword and keyword not in name:
+            continue
+        at = AppTest.from_string(BATTLE_SCRIPT, default_timeout=60)
+        at.run()
+        at.session_state["enemy_type1"] = None if enemy_types[0] in ("未", "不明") else enemy_types[0]
+        at.session_state["enemy_type2"] = None if enemy_types[1] in ("未", "不明") else enemy_types[1]
+
+        def rerun(at=at):
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+        benchmarks[name] = (rerun, 1)
+    return benchmarks
+
+# 起動の時間（秒）を repeat 回計測する（import 済みのモジュールを使わないように毎回新しいプロセスで実行する）
+def measure_startup(keyword=None, repeat=5):
+    names = [name for name in ("startup/top_page", "startup/first_battle_page") if not keyword or keyword in name]
+    if not names:
+        return {}
+    timings = {name: [] for name in names}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, os.path.abspath("app.py")], capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for name in names:
+            timings[name].append(result[name])
+    return timings
+
+# 計測した環境（比較するときの参考）
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "streamlit": st.__version__,
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+def run_benchmarks(keyword=None, repeat=7, rerun_repeat=5, startup_repeat=5):
+    results = {}
+
+    def record(name, timings, number, times):
+        results[name] = {
+            "median_us": statistics.median(timings) * 1e6,
+            "min_us": min(timings) * 1e6,
+            "number": number,
+            "repeat": times,
+        }
+        print(f"{name:55s} {results[name]['median_us']:12.1f} us", file=sys.stderr)
+
+    groups = [(function_benchmarks, repeat), (rerun_benchmarks, rerun_repeat)]
+    for build, times in groups:
+        for name, (func, number) in build(keyword).items():
+            record(name, measure(func, number, times), number, times)
+    if startup_repeat > 0:
+        for name, timings in measure_startup(keyword, startup_repeat).items():
+            record(name, timings, 1, startup_repeat)
+    return results
+
+# 基準の結果と比べて、threshold を超えて遅くなったベンチマークを返す
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        mark = "遅くなった" if ratio > 1 + threshold else ""
+        print(f"{name:55s} {base['median_us']:12.1f} → {result['median_us']:12.1f} us（{ratio:5.2f} 倍）{mark}", file=sys.stderr)
+        if mark:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="評価・表示の処理時間を計測します")
+    parser.add_argument("-o", "--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--compare", help="比べる基準の結果（JSON ファイル）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="遅くなったとみなす割合（0.2 = 20%%）")
+    parser.add_argument("-k", dest="keyword", help="名前にこの文字列を含むベンチマークだけ計測する")
+    parser.add_argument("--repeat", type=int, default=7, help="関数のベンチマークの計測回数")
+    parser.add_argument("--rerun-repeat", type=int, default=5, help="ページ再実行のベンチマークの計測回数")
+    parser.add_argument("--startup-repeat", type=int, default=5, help="起動のベンチマークの計測回数（0 の場合は計測しない）")
+    args = parser.parse_args(argv)
+
+    # AppTest・画面外での表示の警告でログが埋まらないようにする（設定の読込でログの設定が戻るので先に読み込む）
+    streamlit.config.get_config_options()
+    streamlit.logger.set_log_level("error")
+
+    results = run_benchmarks(args.keyword, args.repeat, args.rerun_repeat, args.startup_repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 件のベンチマークが {args.threshold:.0%} 以上遅くなりました：{', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+﻿# -*- coding: utf-8 -*-
+# 計算結果のキャッシュ（件数の上限を超えたら、一番長く使われていないものから捨てる）
+import collections
+import threading
+
+# 値が None の場合とキャッシュにない場合を区別する印
+_MISSING = object()
+
+class BoundedCache:
+    """
+    Streamlit のセッション（スレッド）から同時に使われるので、読み書きはロックの中で行う。
+    値の計算はロックの外で行う（同じキーを同時に計算した場合は後から入れた値が残る）。
+    - maxsize: 保持する件数の上限
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    # キーの値を返す（ない場合は default）
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    # キーに値を入れる（上限を超えたら一番古いものを捨てる）
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    # キーの値を返す（ない場合は create() の戻り値を入れて返す。None もキャッシュする）
+    def get_or_create(self, key, create):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = create()
+            self.set(key, value)
+        return value
+
+    # キーを削除して値を返す（ない場合は default）
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
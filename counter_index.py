@@ -0,0 +1,138 @@
+﻿# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+from typing import NamedTuple
+import numpy as np
+from bounded_cache import BoundedCache
+from type_logic import calculation_totalscore_batch, get_compiled_chart, get_defender_combinations
+
+# 相手のタイプの組み合わせ（171通り）ごとの理想の対策を保存するファイル
+# （相性表の内容から計算したバージョンと一緒に保存し、バージョンが違えば作り直す。
+#   type_chart.json は起動後の最初の参照で1回だけ読み込むので、書き換えた場合はアプリを再起動すると作り直される）
+INDEX_PATH = "counter_index.json"
+
+# 組み合わせごとに保存するランキングの件数
+MAX_RANKING = 10
+
+# 相手のタイプの組み合わせに対する理想の対策
+class Counters(NamedTuple):
+    attack_types: tuple    # (攻撃タイプ, 倍率) を総合評価の高い順
+    defense_types: tuple   # ((タイプ1, タイプ2), 被ダメージ最大倍率) を総合評価の高い順
+
+# 相性表のバージョンと、組み合わせのキー（"タイプ1/タイプ2"）→ Counters
+class CounterIndex(NamedTuple):
+    version: str
+    counters: dict
+
+# 読み込んだ・作ったインデックス（相性表のバージョン → CounterIndex）
+_indexes = BoundedCache(maxsize=4)
+
+# 同じインデックスを複数のセッションで同時に作らないためのロック
+_index_lock = threading.Lock()
+
+# 相手のタイプを組み合わせのキーにする（単一タイプは "ほのお/未"、複合タイプは相性表の順。タイプ不明・相性表にないタイプは None）
+def combination_key(enemy_types, compiled):
+    valid = []
+    for t in enemy_types:
+        if t and t not in ("未", "不明") and t not in valid:
+            valid.append(t)
+    if not valid or len(valid) > 2 or any(t not in compiled.type_ids for t in valid):
+        return None
+    valid.sort(key=compiled.type_ids.get)
+    return f"{valid[0]}/{valid[1] if len(valid) == 2 else '未'}"
+
+# 171通りの組み合わせごとに、攻撃タイプと防御タイプの組を総合評価の式で順位付けする
+def build_counter_index(type_chart):
+    """
+    calculation_totalscore_batch の評価式で、片方だけを変えたモンスターを並べて順位を付ける。
+    - 攻撃タイプ：わざ3つがすべてそのタイプで、タイプなし（等倍で受ける）のモンスター
+    - 防御タイプの組：わざなし（等倍で攻撃する）で、そのタイプの組のモンスター
+    """
+    compiled = get_compiled_chart(type_chart)
+    combinations = get_defender_combinations(type_chart)
+    enemy_types_list = [list(types) for types in combinations]
+
+    attackers = [{"わざ": [t, t, t], "タイプ": ["未", "未"]} for t in compiled.type_names]
+    defenders = [{"わざ": ["未", "未", "未"], "タイプ": list(types)} for types in combinations]
+    attack_scores = calculation_totalscore_batch(attackers, enemy_types_list, type_chart)[0]
+    defense_scores = calculation_totalscore_batch(defenders, enemy_types_list, type_chart)[0]
+
+    # 表示用の倍率（攻撃：わざの倍率、防御：被ダメージ最大倍率）は評価式の逆算で求める
+    attack_values = (attack_scores + 1.0) / 2.2
+    defense_values = 2.2 - defense_scores
+
+    counters = {}
+    for j, types in enumerate(combinations):
+        # 同点の場合は相性表の順（安定ソート）
+        attack_order = np.argsort(-attack_scores[:, j], kind="stable")[:MAX_RANKING]
+        defense_order = np.argsort(-defense_scores[:, j], kind="stable")[:MAX_RANKING]
+        counters[combination_key(types, compiled)] = Counters(
+            tuple((compiled.type_names[i], round(float(attack_values[i, j]), 4)) for i in attack_order),
+            tuple((combinations[i], round(float(defense_values[i, j]), 4)) for i in defense_order),
+        )
+    return CounterIndex(compiled.version, counters)
+
+# 保存したインデックスを読み込む（ファイルがない・壊れている・相性表のバージョンが違う場合は None）
+def _read_index(path, version):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != version:
+        return None
+    try:
+        counters = {
+            key: Counters(
+                tuple((t, value) for t, value in entry["attack"]),
+                tuple((tuple(types), value) for types, value in entry["defense"]),
+            )
+            for key, entry in data["counters"].items()
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+    return CounterIndex(version, counters)
+
+# インデックスを保存する（一時ファイルに書いてから置き換える）
+def _write_index(path, index):
+    data = {
+        "version": index.version,
+        "counters": {
+            key: {"attack": [list(item) for item in counters.attack_types],
+                  "defense": [[list(types), value] for types, value in counters.defense_types]}
+            for key, counters in index.counters.items()
+        },
+    }
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp, path)
+
+# インデックスを返す（保存したファイルの相性表のバージョンが違う場合は作り直して保存する）
+def get_counter_index(type_chart, path=INDEX_PATH):
+    version = get_compiled_chart(type_chart).version
+    index = _indexes.get((path, version))
+    if index is not None:
+        return index
+
+    with _index_lock:
+        index = _indexes.get((path, version))
+        if index is not None:
+            return index
+        index = _read_index(path, version)
+        if index is None:
+            index = build_counter_index(type_chart)
+            try:
+                _write_index(path, index)
+            except OSError as e:
+                print(f"対策インデックスの保存失敗: {path} → {e}")
+        _indexes.set((path, version), index)
+    return index
+
+# 相手のタイプ（例：["ほのお", "ひこう"]）に対する理想の対策を引く（タイプ不明の場合は None）
+def get_counters(enemy_types, type_chart, path=INDEX_PATH):
+    key = combination_key(enemy_types, get_compiled_chart(type_chart))
+    if key is None:
+        return None
+    return get_counter_index(type_chart, path).counters.get(key)
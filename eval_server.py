@@ -0,0 +1,275 @@
+﻿# -*- coding: utf-8 -*-
+# タイプ相性の評価を JSON で返すローカルHTTPサービス（標準ライブラリのみ）
+#
+# 使い方：
+#   python eval_server.py --port 8765 --workers 8
+#
+# - POST /effectiveness  {"わざ": "ほのお", "タイプ": ["くさ", "未"]}
+# - POST /totalscore     {"モンスター": {...}, "相手のタイプ": [["くさ", "未"], ...]}
+# - POST /matrix         {"チーム": {"チーム名": ..., "モンスター": {...}}, "相手のタイプ": [["くさ", "未"], ...]}
+#                        （"相手のタイプ" の代わりに "相手チーム": {"モンスター": {...}} も指定できる）
+# - GET  /stats          エンドポイントごとの件数と p50 / p99 レイテンシ（ミリ秒）
+# - POST の本文をリストにすると、まとめて評価して同じ順番のリストで返す（失敗した要素は {"エラー": [...]}）
+import argparse
+import collections
+import http.server
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from type_logic import type_chart, calculation_totalscore_batch, get_compiled_chart, get_effectiveness
+from validation import validate_monster, validate_team
+
+# レイテンシを記録する件数（エンドポイントごと、古いものから捨てる）
+MAX_LATENCY_SAMPLES = 10000
+
+# 本文の最大サイズ（バイト）
+MAX_BODY_SIZE = 1 << 20
+
+# 持続接続で次のリクエストを待つ秒数（過ぎたら接続を閉じてワーカーを空ける）
+IDLE_TIMEOUT = 5
+
+# 入力エラー（エラーメッセージのリストを持つ）
+class RequestError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+# 相性表にあるタイプ名か（文字列以外はリストなどもあり、そのまま in で調べると TypeError になる）
+def _is_type_name(value, allowed=()):
+    return isinstance(value, str) and (value in get_compiled_chart(type_chart).type_ids or value in allowed)
+
+# タイプ欄に使える値（"未"・"不明" は未設定）
+def _check_types(types, label):
+    if not isinstance(types, list) or len(types) != 2:
+        return [f"{label}は2つのタイプのリストで指定してください"]
+    return [f"{label}に不明なタイプ「{t}」があります" for t in types if not _is_type_name(t, ("未", "不明"))]
+
+# モンスターの形式チェック（タイプ・わざの値まで）
+def _check_monster(i, mon):
+    if not isinstance(mon, dict):
+        raise RequestError([f"{i}体目のモンスターの形式が正しくありません"])
+    moves = mon.get("わざ")
+    if not isinstance(moves, list) or len(moves) != 3:
+        raise RequestError([f"{i}体目のモンスターのわざは3つのリストで指定してください"])
+    errors = _check_types(mon.get("タイプ", ["未", "未"]), f"{i}体目のモンスターのタイプ")
+    errors += [f"{i}体目のモンスターのわざに不明なタイプ「{move}」があります" for move in moves if not _is_type_name(move, ("未", "なし"))]
+    for key in ("名前", "画像"):
+        if key in mon and not isinstance(mon[key], str):
+            errors.append(f"{i}体目のモンスターの{key}は文字列で指定してください")
+    if errors:
+        raise RequestError(errors)
+
+# 相手のタイプのリストの形式チェック
+def _check_enemy_types_list(enemy_types_list):
+    if not isinstance(enemy_types_list, list) or not enemy_types_list:
+        raise RequestError(["相手のタイプはタイプのリストのリストで指定してください"])
+    errors = [error for j, types in enumerate(enemy_types_list, start=1) for error in _check_types(types, f"相手{j}体目のタイプ")]
+    if errors:
+        raise RequestError(errors)
+    return enemy_types_list
+
+# わざ1つ × 相手のタイプの倍率
+def evaluate_effectiveness(body):
+    move = body.get("わざ")
+    if not _is_type_name(move):
+        raise RequestError([f"わざに不明なタイプ「{move}」があります"])
+    errors = _check_types(body.get("タイプ"), "相手のタイプ")
+    if errors:
+        raise RequestError(errors)
+    value, label = get_effectiveness(move, body["タイプ"], type_chart)
+    return {"倍率": value, "ラベル": label}
+
+# モンスター1体 × 相手のタイプのリストの総合評価
+def evaluate_totalscore(body):
+    mon = body.get("モンスター")
+    _check_monster(1, mon)
+
+    # 1体だけの評価では名前・画像は省略できる（指定した場合は team_creator と同じルールでチェック）
+    errors = validate_monster(1, {"名前": "", "画像": "", **mon})
+    if errors:
+        raise RequestError(errors)
+    scores, marks, _ = calculation_totalscore_batch([mon], _check_enemy_types_list(body.get("相手のタイプ")), type_chart)
+    return {"総合評価": scores[0].tolist(), "記号": marks[0].tolist()}
+
+# チーム3体 × 相手のタイプのリスト（または相手チーム）の総合評価の表
+def evaluate_matrix(body):
+    team = body.get("チーム")
+    if not isinstance(team, dict) or not isinstance(team.get("モンスター"), dict):
+        raise RequestError(["チームは {\"チーム名\": ..., \"モンスター\": {...}} の形式で指定してください"])
+    if not isinstance(team.get("チーム名", ""), str):
+        raise RequestError(["チーム名は文字列で指定してください"])
+    monsters = {}
+    for i in range(1, 4):
+        mon = team["モンスター"].get(str(i))
+        if mon is not None:
+            _check_monster(i, mon)
+            monsters[str(i)] = {"名前": "未", "画像": "未", **mon}
+
+    # チームは team_creator の保存前と同じルールでチェック
+    errors = validate_team(team.get("チーム名"), monsters)
+    if errors:
+        raise RequestError(errors)
+    # 相手チーム（saved_teams.json と同じ形式）の場合はモンスターのタイプを使う
+    enemy_types_list = body.get("相手のタイプ")
+    enemy_team = body.get("相手チーム")
+    if isinstance(enemy_team, dict) and isinstance(enemy_team.get("モンスター"), dict):
+        enemy_types_list = [mon.get("タイプ") if isinstance(mon, dict) else None for _, mon in sorted(enemy_team["モンスター"].items())]
+
+    mons = [monsters[str(i)] for i in range(1, 4)]
+    scores, marks, _ = calculation_totalscore_batch(mons, _check_enemy_types_list(enemy_types_list), type_chart)
+    return {"総合評価": scores.tolist(), "記号": marks.tolist()}
+
+# エンドポイント（POST の本文1件を受け取って結果を返す関数）
+ENDPOINTS = {
+    "/effectiveness": evaluate_effectiveness,
+    "/totalscore": evaluate_totalscore,
+    "/matrix": evaluate_matrix,
+}
+
+# エンドポイントごとのレイテンシ（秒）
+_latencies = collections.defaultdict(lambda: collections.deque(maxlen=MAX_LATENCY_SAMPLES))
+_latency_lock = threading.Lock()
+
+def record_latency(path, seconds):
+    with _latency_lock:
+        _latencies[path].append(seconds)
+
+# エンドポイントごとの件数と p50 / p99 レイテンシ（ミリ秒）
+def latency_stats():
+    with _latency_lock:
+        samples = {path: np.array(values) for path, values in _latencies.items()}
+    return {
+        path: {"件数": len(values), "p50": float(np.percentile(values, 50) * 1000), "p99": float(np.percentile(values, 99) * 1000)}
+        for path, values in samples.items() if len(values)
+    }
+
+# 本文1件（またはリストの各要素）を評価する（失敗した要素はエラーメッセージを返す）
+def _evaluate(handler, body):
+    if not isinstance(body, dict):
+        return {"エラー": ["リクエストは JSON オブジェクトで指定してください"]}
+    try:
+        return handler(body)
+    except RequestError as e:
+        return {"エラー": e.errors}
+    # 想定していない形の入力でも接続を切らずに 400 で返す
+    except (TypeError, ValueError, KeyError, AttributeError, IndexError):
+        return {"エラー": ["リクエストの形式が正しくありません"]}
+
+class EvaluationHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_TIMEOUT
+
+    def _send_json(self, status, data):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, latency_stats())
+        else:
+            self._send_json(404, {"エラー": [f"{self.path} はありません"]})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        handler = ENDPOINTS.get(self.path)
+        if handler is None:
+            self._discard_body()
+            self._send_json(404, {"エラー": [f"{self.path} はありません"]})
+            return
+
+        # エラーの応答もレイテンシに含める（件数が 200 の応答だけにならないように）
+        try:
+            status, results = self._evaluate_body(handler)
+            self._send_json(status, results)
+        finally:
+            record_latency(self.path, time.perf_counter() - start)
+
+    # 本文を読んで評価し、(ステータス, 結果) を返す
+    def _evaluate_body(self, handler):
+        length = self._content_length()
+        if length is None:
+            self.close_connection = True
+            return 400, {"エラー": ["Content-Length が正しくありません"]}
+        if length > MAX_BODY_SIZE:
+            self._discard_body()
+            return 413, {"エラー": ["本文が大きすぎます"]}
+
+        try:
+            body = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            return 400, {"エラー": ["本文が JSON ではありません"]}
+
+        # リストの場合はまとめて評価（1件でも成功すれば 200）
+        if isinstance(body, list):
+            results = [_evaluate(handler, item) for item in body]
+            return (200 if not body or any("エラー" not in result for result in results) else 400), results
+        results = _evaluate(handler, body)
+        return (400 if "エラー" in results else 200), results
+
+    # 本文の長さ（数値でない・負の場合は None）
+    def _content_length(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return None
+        return length if length >= 0 else None
+
+    # 使わない本文を読み捨てる（長さが不正・大きすぎる場合は接続を閉じる）
+    def _discard_body(self):
+        length = self._content_length()
+        if length is None or length > MAX_BODY_SIZE:
+            self.close_connection = True
+        if length:
+            self.rfile.read(min(length, MAX_BODY_SIZE))
+
+    # 1リクエストごとのアクセスログは出さない
+    def log_message(self, format, *args):
+        pass
+
+# 接続を決まった数のワーカースレッドで処理するHTTPサーバー（接続ごとにスレッドを作らない）
+class PooledHTTPServer(http.server.HTTPServer):
+    def __init__(self, address, handler_class, workers=8):
+        super().__init__(address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eval")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="タイプ相性の評価を JSON で返すローカルHTTPサービス")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8765, help="待ち受けるポート")
+    parser.add_argument("--workers", type=int, default=8, help="リクエストを処理するスレッド数")
+    args = parser.parse_args(argv)
+
+    # 相性表はここで一度だけコンパイルしておく
+    get_compiled_chart(type_chart)
+    server = PooledHTTPServer((args.host, args.port), EvaluationHandler, args.workers)
+    print(f"http://{args.host}:{args.port} で待ち受けています（Ctrl+C で終了）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
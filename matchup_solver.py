@@ -0,0 +1,70 @@
+﻿# -*- coding: utf-8 -*-
+import itertools
+from typing import NamedTuple
+import numpy as np
+from bounded_cache import BoundedCache
+from type_logic import calculation_totalscore_batch, get_compiled_chart, get_defender_combinations
+
+# 3対3の相性表と最適な組み合わせ
+class MatchupSolution(NamedTuple):
+    scores: np.ndarray           # 自分のモンスター × 相手のモンスターの総合評価（タイプ不明の相手は nan）
+    expected_scores: np.ndarray  # タイプ不明の相手（単一・複合タイプ171通り）に対する総合評価の平均
+    known_enemies: tuple         # タイプが分かっている相手モンスターの番号
+    assignment: tuple            # タイプが分かっている相手ごとの最適な自分のモンスター（(相手の番号, 自分の番号) の組）
+    assignment_score: float      # 最適な組み合わせの総合評価の合計
+    lead_order: tuple            # 相手の登場順に合わせた自分のモンスターを出す順番（タイプ不明の相手には平均で計算）
+    lead_order_score: float      # 出す順番の総合評価の合計
+
+# 解のキャッシュ（(チーム, 相手のタイプ, 相性表のバージョン) ごと）
+_solutions = BoundedCache(maxsize=256)
+
+# 相手のタイプが1つでも分かっているか（"不明" のみは未判明）
+def is_known_enemy(enemy_types):
+    return any(t != "不明" and t is not None for t in enemy_types)
+
+# 行（自分のモンスター）を列（相手のモンスター）に1体ずつ割り当てる全順列から合計が最大のものを探す
+def _best_permutation(values, rows, cols):
+    best_rows, best_score = (), float("-inf")
+    for perm in itertools.permutations(rows, len(cols)):
+        score = sum(values[row, col] for row, col in zip(perm, cols))
+        if score > best_score:
+            best_rows, best_score = perm, score
+    return best_rows, float(best_score) if best_rows else 0.0
+
+def _solve_matchup(team, enemy_types_list, type_chart):
+
+    # タイプが分かっている相手だけ総合評価を計算
+    known_enemies = tuple(j for j, types in enumerate(enemy_types_list) if is_known_enemy(types))
+    scores = np.full((len(team), len(enemy_types_list)), np.nan)
+    if known_enemies:
+        scores[:, known_enemies] = calculation_totalscore_batch(team, [enemy_types_list[j] for j in known_enemies], type_chart)[0]
+
+    # タイプ不明の相手には、すべてのタイプの組み合わせに対する平均スコアで見積もる
+    expected_scores = calculation_totalscore_batch(team, get_defender_combinations(type_chart), type_chart)[0].mean(axis=1)
+    planning_scores = np.where(np.isnan(scores), expected_scores[:, None], scores)
+
+    # タイプが分かっている相手への最適な割り当て
+    rows = range(len(team))
+    assigned_rows, assignment_score = _best_permutation(scores, rows, known_enemies[:len(team)])
+    assignment = tuple(zip(known_enemies, assigned_rows))
+
+    # 相手の登場順（1体目から）に対する最適な出す順番
+    lead_order, lead_order_score = _best_permutation(planning_scores, rows, range(min(len(team), len(enemy_types_list))))
+
+    # キャッシュで共有するため書き換え不可にする
+    scores.setflags(write=False)
+    expected_scores.setflags(write=False)
+    return MatchupSolution(scores, expected_scores, known_enemies, assignment, assignment_score, lead_order, lead_order_score)
+
+# 自分のチームと相手のタイプから3対3の相性表・最適な割り当て・出す順番を求める（同じ入力なら再計算しない）
+def solve_matchup(team, enemy_types_list, type_chart):
+    """
+    - team: 自分のモンスターのリスト（各要素は "わざ" と "タイプ" を持つ辞書）
+    - enemy_types_list: 相手のモンスターのタイプのリスト（例：[["ほのお", "不明"], ["不明", "不明"], ...]）
+    - 戻り値：MatchupSolution（ひんし状態や入替えには依存しないので、ボタン操作による再実行ではキャッシュを返す）
+    """
+    team_key = tuple((tuple(mon["タイプ"]), tuple(mon["わざ"])) for mon in team)
+    enemy_key = tuple(tuple(types) for types in enemy_types_list)
+    key = (team_key, enemy_key, get_compiled_chart(type_chart).version)
+
+    return _solutions.get_or_create(key, lambda: _solve_matchup(team, enemy_key, type_chart))
@@ -0,0 +1,198 @@
+﻿# -*- coding: utf-8 -*-
+import contextlib
+import functools
+import os
+import threading
+import time
+import streamlit as st
+
+# 環境変数 PTYPE_PROFILE=1、または URL に ?profile=1 を付けると計測する
+PROFILE_ENV = "PTYPE_PROFILE"
+
+# サイドバーに表示する再実行の履歴の数（fragment だけの再実行も含む）
+MAX_HISTORY = 10
+
+# 履歴の種類（ページ全体の再実行）
+FULL_RUN = "全体"
+
+# 計測中の再実行（Streamlit はセッションごとにスレッドで動くので、スレッドごとに持つ）
+_state = threading.local()
+
+# st.markdown の元の関数（計測中の再実行がある間だけ差し替える）
+_original_markdown = st.markdown
+_active_profiles = 0
+_hook_lock = threading.Lock()
+
+# 計測を有効にするか
+def is_enabled():
+    if os.environ.get(PROFILE_ENV) == "1":
+        return True
+    return st.query_params.get("profile") == "1"
+
+# 計測する関数に付けるデコレーター（計測していない再実行ではそのまま呼ぶ）
+def profiled(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = getattr(_state, "stats", None)
+        if stats is None:
+            return func(*args, **kwargs)
+
+        # 呼出回数・時間・HTMLのバイト数（中で呼んだ関数の分も含む）
+        entry = stats.setdefault(name, [0, 0.0, 0])
+        entry[0] += 1
+        _state.stack.append(entry)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            entry[1] += time.perf_counter() - start
+            _state.stack.pop()
+    return wrapper
+
+# st.markdown に渡した本文のバイト数を、実行中の関数すべてに加算する（計測していないセッションはそのまま呼ぶ）
+def _counting_markdown(body, *args, **kwargs):
+    stack = getattr(_state, "stack", None)
+    if getattr(_state, "stats", None) is not None:
+        size = len(str(body).encode("utf-8"))
+        _state.html_bytes += size
+        for entry in stack:
+            entry[2] += size
+    return _original_markdown(body, *args, **kwargs)
+
+# 計測中の再実行がある間だけ st.markdown を差し替える（最後の計測が終わったら元に戻す）
+@contextlib.contextmanager
+def _markdown_hook():
+    global _active_profiles
+    with _hook_lock:
+        if _active_profiles == 0:
+            st.markdown = _counting_markdown
+        _active_profiles += 1
+    try:
+        yield
+    finally:
+        with _hook_lock:
+            _active_profiles -= 1
+            if _active_profiles == 0:
+                st.markdown = _original_markdown
+
+# セッションの再実行の回数（計測していなくても数える、ボタン1回で何回実行されたかの確認用）
+def count_rerun():
+    count = st.session_state.get("rerun_count", 0) + 1
+    st.session_state["rerun_count"] = count
+    return count
+
+# fragment だけの再実行の回数（fragment のキーごと）
+def count_fragment_rerun(key):
+    counts = st.session_state.setdefault("fragment_rerun_counts", {})
+    counts[key] = counts.get(key, 0) + 1
+    return counts[key]
+
+# 1回の実行（ページ全体、または fragment だけ）を計測して履歴に残す
+@contextlib.contextmanager
+def _profile(kind):
+    with _markdown_hook():
+        _state.stats, _state.stack, _state.html_bytes = {}, [], 0
+        start = time.perf_counter()
+        status = "完了"
+        try:
+            yield
+        except BaseException as e:
+            # st.rerun()・st.stop() で中断された再実行も履歴に残す
+            status = type(e).__name__
+            raise
+        finally:
+            record = {
+                "kind": kind,
+                "status": status,
+                "seconds": time.perf_counter() - start,
+                "html_bytes": _state.html_bytes,
+                "functions": {name: tuple(entry) for name, entry in _state.stats.items()},
+            }
+            _state.stats = None
+            history = st.session_state.setdefault("profile_history", [])
+            history.append(record)
+            del history[:-MAX_HISTORY]
+
+# 1回の再実行を計測する（app.py の全体を囲む）
+@contextlib.contextmanager
+def profile_rerun():
+    count_rerun()
+    _state.full_run = True
+    try:
+        if not is_enabled():
+            yield
+            return
+        with _profile(FULL_RUN):
+            yield
+        render_profile(st.session_state["profile_history"])
+    finally:
+        _state.full_run = False
+
+# st.fragment の代わりに使う（ページ全体の再実行の外で fragment だけが再実行された場合も数えて、計測する）
+def profiled_fragment(func=None, *, key=None):
+    """
+    - key: st.fragment のキー（st.rerun(scope=...) で指定する名前。履歴・回数にもこの名前を使う）
+    - 戻り値：st.fragment と同じ（デコレーターとしても、profiled_fragment(func, key=...)(引数) のようにも使える）
+    """
+    if func is None:
+        return lambda func: profiled_fragment(func, key=key)
+    name = key or func.__name__
+
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        # ページ全体の再実行の中では profile_rerun が数えて計測している
+        if getattr(_state, "full_run", False):
+            return func(*args, **kwargs)
+        count_fragment_rerun(name)
+        if not is_enabled():
+            return func(*args, **kwargs)
+        with _profile(name):
+            return func(*args, **kwargs)
+    return st.fragment(body, key=key)
+
+# 関数ごとの計測結果の表（計測した関数を呼ばなかった場合は表示しない）
+def _render_functions(record):
+    if not record["functions"]:
+        return
+    rows = "".join(
+        f"<tr><td>{name}</td><td>{calls}</td><td>{seconds * 1000:.1f}</td><td>{html_bytes / 1024:.1f}</td></tr>"
+        for name, (calls, seconds, html_bytes) in sorted(record["functions"].items(), key=lambda item: -item[1][1])
+    )
+    st.sidebar.markdown(
+        f"<table style='font-size:12px;'><tr><th>関数</th><th>回数</th><th>ms</th><th>HTML KB</th></tr>{rows}</table>",
+        unsafe_allow_html=True
+    )
+
+# サイドバーに計測結果を表示（今回の再実行と、前回のページ全体の再実行の後に行われた fragment だけの再実行・中断された再実行）
+def render_profile(history):
+    current = history[-1]
+    st.sidebar.markdown("---")
+    st.sidebar.markdown(f"#### 処理時間（この再実行：{current['seconds'] * 1000:.0f} ms・HTML {current['html_bytes'] / 1024:.0f} KB）")
+    _render_functions(current)
+
+    # fragment の再実行はサイドバーに書けないので、次のページ全体の再実行でまとめて表示する
+    for record in _records_since_last_full_run(history):
+        if record["kind"] != FULL_RUN:
+            st.sidebar.markdown(f"#### fragment「{record['kind']}」の再実行（{record['seconds'] * 1000:.0f} ms・HTML {record['html_bytes'] / 1024:.1f} KB）")
+        else:
+            st.sidebar.markdown(f"#### 直前の再実行（{record['status']} で中断：{record['seconds'] * 1000:.0f} ms）")
+        _render_functions(record)
+
+    summary = " / ".join(f"{record['seconds'] * 1000:.0f}" + ("" if record["kind"] == FULL_RUN else "(f)") for record in history)
+    fragment_reruns = sum(st.session_state.get("fragment_rerun_counts", {}).values())
+    st.sidebar.markdown(
+        f"<span style='color:gray; font-size:12px;'>最近の再実行（ms、(f) は fragment だけの再実行）：{summary}<br>"
+        f"このセッションの実行回数：{st.session_state.get('rerun_count', 0)}（fragment だけの再実行：{fragment_reruns}）</span>",
+        unsafe_allow_html=True
+    )
+
+# 今回の前に残っている、fragment だけの再実行と中断されたページ全体の再実行（古い順）
+def _records_since_last_full_run(history):
+    records = []
+    for record in reversed(history[:-1]):
+        if record["kind"] == FULL_RUN and record["status"] == "完了":
+            break
+        records.append(record)
+    return records[::-1]
@@ -0,0 +1,153 @@
+﻿# -*- coding: utf-8 -*-
+import functools
+from typing import NamedTuple
+import numpy as np
+from type_logic import get_compiled_chart, to_defender_ids
+from battle_simulator import NORMAL_POWER, SPECIAL_POWER, ENERGY_GAIN, SPECIAL_COST, MAX_SHIELDS, SHIELD_RATE, DAMAGE_NOISE, move_multipliers
+
+# HPを整数で扱うための分割数（HP 1.0 = 100）
+HP_UNITS = 100
+
+# 1回の評価で表示するシールドの判断の上限（今の対面で相手のスペシャルわざを受ける回数）
+MAX_DECISIONS = 6
+
+# 相手のスペシャルわざを受けるときの判断
+class ShieldDecision(NamedTuple):
+    special_count: int          # 今の対面で相手のスペシャルわざを受ける回数目
+    use_shield: bool            # シールドを使うべきか
+    shield_win_rate: float      # シールドを使った場合の勝率
+    no_shield_win_rate: float   # シールドを使わなかった場合の勝率
+
+# シールドの使い方の最適化結果
+class ShieldPlan(NamedTuple):
+    win_rate: float             # 最適にシールドを使った場合の勝率
+    no_shield_win_rate: float   # 残りのシールドを使わなかった場合の勝率
+    decisions: tuple            # 今の対面での判断（ShieldDecision、相手はひんしになる場合だけシールドを使うと仮定した流れ）
+
+# わざ1回のダメージ（ばらつきは平均、HPの分割単位で最低1）
+def _damage_table(multipliers, power):
+    return tuple(tuple(max(1, round(HP_UNITS * power * value * sum(DAMAGE_NOISE) / 2)) for value in row) for row in multipliers)
+
+# 自分のチームと相手のタイプからダメージ表を作る（"不明" のタイプは等倍）
+def _damage_tables(team, enemy_types_list, type_chart):
+    compiled = get_compiled_chart(type_chart)
+    enemy_ids = np.array([[to_defender_ids(types, compiled) for types in enemy_types_list]])
+    my_normal, my_special, enemy_normal, enemy_special = (values[0] for values in move_multipliers(team, enemy_ids, compiled))
+    return (
+        _damage_table(my_normal, NORMAL_POWER), _damage_table(my_special, SPECIAL_POWER),
+        _damage_table(enemy_normal, NORMAL_POWER), _damage_table(enemy_special, SPECIAL_POWER),
+    )
+
+# バトル中のモンスターのHPを減らす
+def _hit(hp, index, damage):
+    return hp[:index] + (max(hp[index] - damage, 0),) + hp[index + 1:]
+
+# 次のターン（ノーマルわざだけのターンはまとめて進める）を、自分のシールドの選択肢ごとに求める
+def _turn(damage, state):
+    """
+    - state: (自分のバトル中の番号, 相手のバトル中の番号, 自分のHP, 相手のHP, 自分のエネルギー, 相手のエネルギー, 自分のシールド, 相手のシールド)
+    - 戻り値：{シールドを使うか: [(確率, 相手がシールドを使ったか, ターン後の状態), ...]}（ひんしの入替えはまだしない）
+    """
+    my_normal, my_special, enemy_normal, enemy_special = damage
+    active, enemy_active, my_hp, enemy_hp, my_energy, enemy_energy, my_shields, enemy_shields = state
+    my_use_special = my_energy >= SPECIAL_COST
+    enemy_use_special = enemy_energy >= SPECIAL_COST
+
+    # どちらもスペシャルわざを使えない場合：スペシャルわざが使えるようになるか、ひんしになるまでまとめて進める
+    if not my_use_special and not enemy_use_special:
+        my_damage, enemy_damage = my_normal[active][enemy_active], enemy_normal[enemy_active][active]
+        turns = min(-(-(SPECIAL_COST - max(my_energy, enemy_energy)) // ENERGY_GAIN),
+                    -(-my_hp[active] // enemy_damage), -(-enemy_hp[enemy_active] // my_damage))
+        after = (active, enemy_active, _hit(my_hp, active, enemy_damage * turns), _hit(enemy_hp, enemy_active, my_damage * turns),
+                 my_energy + ENERGY_GAIN * turns, enemy_energy + ENERGY_GAIN * turns, my_shields, enemy_shields)
+        return {False: [(1.0, False, after)]}
+
+    my_damage = my_special[active][enemy_active] if my_use_special else my_normal[active][enemy_active]
+    enemy_damage = enemy_special[enemy_active][active] if enemy_use_special else enemy_normal[enemy_active][active]
+    my_energy += -SPECIAL_COST if my_use_special else ENERGY_GAIN
+    enemy_energy += -SPECIAL_COST if enemy_use_special else ENERGY_GAIN
+
+    # 相手のシールド（ひんしになる場合は必ず、それ以外は確率で使う）
+    if my_use_special and enemy_shields > 0:
+        enemy_options = [(1.0, True)] if my_damage >= enemy_hp[enemy_active] else [(SHIELD_RATE, True), (1 - SHIELD_RATE, False)]
+    else:
+        enemy_options = [(1.0, False)]
+
+    # 自分のシールド（相手のスペシャルわざを受けるときだけ選べる）
+    my_options = (False, True) if enemy_use_special and my_shields > 0 else (False,)
+    return {
+        my_shield: [
+            (probability, enemy_shield, (
+                active, enemy_active,
+                _hit(my_hp, active, 0 if my_shield else enemy_damage), _hit(enemy_hp, enemy_active, 0 if enemy_shield else my_damage),
+                my_energy, enemy_energy, my_shields - my_shield, enemy_shields - enemy_shield,
+            ))
+            for probability, enemy_shield in enemy_options
+        ]
+        for my_shield in my_options
+    }
+
+# ターン後の状態の勝率（ひんしになったら入替え：自分は勝率が最大のモンスター、相手は番号の若い順）
+def _resolve(damage, state):
+    active, enemy_active, my_hp, enemy_hp, my_energy, enemy_energy, my_shields, enemy_shields = state
+    my_alive, enemy_alive = any(my_hp), any(enemy_hp)
+    if not my_alive or not enemy_alive:
+        return 1.0 if my_alive else 0.0 if enemy_alive else 0.5
+
+    if not enemy_hp[enemy_active]:
+        enemy_active = next(j for j, hp in enumerate(enemy_hp) if hp)
+        enemy_energy = 0
+    if not my_hp[active]:
+        return max(_win_rate(damage, (i, enemy_active, my_hp, enemy_hp, 0, enemy_energy, my_shields, enemy_shields))
+                   for i, hp in enumerate(my_hp) if hp)
+    return _win_rate(damage, (active, enemy_active, my_hp, enemy_hp, my_energy, enemy_energy, my_shields, enemy_shields))
+
+# 自分のシールドの選択肢ごとの勝率
+def _option_win_rates(damage, state):
+    return {
+        my_shield: sum(probability * _resolve(damage, after) for probability, _, after in outcomes)
+        for my_shield, outcomes in _turn(damage, state).items()
+    }
+
+# バトルの状態ごとの勝率（最適にシールドを使った場合、同じ状態は再計算しない）
+@functools.lru_cache(maxsize=1 << 18)
+def _win_rate(damage, state):
+    return max(_option_win_rates(damage, state).values())
+
+# 今のバトルの状態から、シールドをいつ使うべきかを動的計画法で求める
+def optimize_shields(team, enemy_types_list, type_chart, active_index=0, enemy_active_index=0,
+                     my_fainted=(False, False, False), enemy_fainted=(False, False, False), my_shields=MAX_SHIELDS, enemy_shields=MAX_SHIELDS):
+    """
+    バトルの簡易モデルは battle_simulator と同じ（ダメージのばらつきは平均で計算）。
+    ひんしでないモンスターのHPは満タン、バトル中のモンスターのエネルギーは0として今の状態を表す。
+    - team: 自分のモンスター3体（"わざ" と "タイプ" を持つ辞書）
+    - enemy_types_list: 相手のモンスター3体のタイプ（"不明" のタイプは等倍として計算）
+    - 戻り値：ShieldPlan（勝率は相手がシールドを確率 SHIELD_RATE で使う場合の期待値）
+    """
+    damage = _damage_tables(team, enemy_types_list, type_chart)
+    my_hp = tuple(0 if fainted else HP_UNITS for fainted in my_fainted)
+    enemy_hp = tuple(0 if fainted else HP_UNITS for fainted in enemy_fainted)
+    if not my_hp[active_index] or not enemy_hp[enemy_active_index]:
+        return None
+    state = (active_index, enemy_active_index, my_hp, enemy_hp, 0, 0, my_shields, enemy_shields)
+    win_rate = _win_rate(damage, state)
+    no_shield_win_rate = _win_rate(damage, state[:6] + (0, enemy_shields))
+
+    # 今の対面が終わるまでの判断（相手はひんしになる場合だけシールドを使うと仮定してたどる）
+    decisions = []
+    special_count = 0
+    while len(decisions) < MAX_DECISIONS:
+        options = _turn(damage, state)
+        if state[5] >= SPECIAL_COST:
+            special_count += 1
+        use_shield = False
+        if len(options) > 1:
+            values = _option_win_rates(damage, state)
+            use_shield = values[True] > values[False]
+            decisions.append(ShieldDecision(special_count, use_shield, values[True], values[False]))
+
+        # 相手の選択肢は [(使う), (使わない)] の順なので最後の結果をたどる
+        state = options[use_shield][-1][2]
+        if not state[2][state[0]] or not state[3][state[1]]:
+            break
+    return ShieldPlan(win_rate, no_shield_win_rate, tuple(decisions))
@@ -0,0 +1,118 @@
+﻿# -*- coding: utf-8 -*-
+from typing import NamedTuple
+import numpy as np
+from bounded_cache import BoundedCache
+from type_logic import get_compiled_chart, get_defender_combinations, to_defender_ids
+from battle_simulator import NORMAL_POWER, SPECIAL_POWER, ENERGY_GAIN, SPECIAL_COST, move_multipliers
+from matchup_solver import is_known_enemy
+
+# 1対1の勝率の鋭さ（与えるダメージの比をこの値で累乗して勝率にする）
+DUEL_SHARPNESS = 4
+
+# 全員ひんしを表すビットマスク
+_ALL_FAINTED = 0b111
+
+# 入替え先の候補
+class SwitchRecommendation(NamedTuple):
+    index: int          # 自分のモンスターの番号
+    win_rate: float     # このモンスターを出した場合の勝率（ゲーム木探索の評価値）
+    is_active: bool     # 今バトル中のモンスターか（入替えない場合）
+
+# 置換表（(チーム, 相性表のバージョン) ごとに、(ひんしのビットマスク, バトル中の番号, 判明している相手のタイプ) → 勝率）
+_tables = BoundedCache(maxsize=64)
+_MAX_TABLE_SIZE = 65536
+
+# 1対1の勝率（タイプ不明の相手は単一・複合タイプ171通りの平均）
+_duel_cache = BoundedCache(maxsize=256)
+
+# 自分のモンスター × 相手のモンスターの1対1の勝率を相性の倍率から求める
+def duel_win_rates(team, enemy_types_list, type_chart):
+    """
+    ノーマルわざ（SPECIAL_COST / ENERGY_GAIN 回）とスペシャルわざ（1回）を1サイクルとして、
+    1サイクルで与えるダメージの比から勝率を見積もる（HP・シールドは考えない）。
+    - 戻り値：shape (自分, 相手) の勝率
+    """
+    team_key = tuple((tuple(mon["タイプ"]), tuple(mon["わざ"])) for mon in team)
+    enemy_key = tuple(tuple(types) for types in enemy_types_list)
+    compiled = get_compiled_chart(type_chart)
+    key = (team_key, enemy_key, compiled.version)
+    rates = _duel_cache.get(key)
+    if rates is not None:
+        return rates
+
+    # タイプ不明の相手には171通りのタイプを並べて、最後に平均する
+    combos = np.array([to_defender_ids(types, compiled) for types in get_defender_combinations(type_chart)])
+    enemy_ids = np.empty((len(combos), len(enemy_key), 2), dtype=np.intp)
+    for k, types in enumerate(enemy_key):
+        enemy_ids[:, k] = to_defender_ids(types, compiled) if is_known_enemy(types) else combos
+    my_normal, my_special, enemy_normal, enemy_special = move_multipliers(team, enemy_ids, compiled)
+
+    normal_count = SPECIAL_COST / ENERGY_GAIN
+    my_power = (normal_count * NORMAL_POWER * my_normal + SPECIAL_POWER * my_special) ** DUEL_SHARPNESS
+    enemy_power = (normal_count * NORMAL_POWER * enemy_normal + SPECIAL_POWER * enemy_special).swapaxes(1, 2) ** DUEL_SHARPNESS
+    rates = (my_power / (my_power + enemy_power)).mean(axis=0)
+    rates.setflags(write=False)
+    _duel_cache.set(key, rates)
+    return rates
+
+# ひんしのビットマスクから、ひんしでないモンスターの番号
+def _alive(mask):
+    return [i for i in range(3) if not mask >> i & 1]
+
+# ゲーム木探索（1対1の勝敗は確率、自分の入替えは最大、相手の入替えは最小）
+def _search(rates, table, revealed, my_mask, enemy_mask, active, enemy_active):
+    if my_mask == _ALL_FAINTED:
+        return 0.0
+    if enemy_mask == _ALL_FAINTED:
+        return 1.0
+
+    key = (my_mask, enemy_mask, active, enemy_active, revealed)
+    value = table.get(key)
+    if value is not None:
+        return value
+
+    # 1対1に勝った場合：相手のモンスターがひんし（相手は自分に一番不利なモンスターを出す）
+    next_enemy_mask = enemy_mask | 1 << enemy_active
+    win_value = 1.0 if next_enemy_mask == _ALL_FAINTED else min(
+        _search(rates, table, revealed, my_mask, next_enemy_mask, active, k) for k in _alive(next_enemy_mask)
+    )
+
+    # 1対1に負けた場合：自分のモンスターがひんし（自分は一番有利なモンスターを出す）
+    next_my_mask = my_mask | 1 << active
+    lose_value = 0.0 if next_my_mask == _ALL_FAINTED else max(
+        _search(rates, table, revealed, next_my_mask, enemy_mask, m, enemy_active) for m in _alive(next_my_mask)
+    )
+
+    rate = rates[active, enemy_active]
+    value = float(rate * win_value + (1 - rate) * lose_value)
+    table[key] = value
+    return value
+
+# 今のバトルの状態から、入替え先のおすすめ順を求める
+def recommend_switch(team, enemy_types_list, type_chart, active_index=0, enemy_active_index=0,
+                     my_fainted=(False, False, False), enemy_fainted=(False, False, False)):
+    """
+    残りのモンスター同士の1対1の連続としてバトルを表し、最後まで探索する（入替えのコストは考えない）。
+    - 戻り値：ひんしでない自分のモンスターごとの SwitchRecommendation（勝率の高い順、全員ひんしの場合は空）
+    """
+    rates = duel_win_rates(team, enemy_types_list, type_chart)
+    my_mask = sum(1 << i for i, fainted in enumerate(my_fainted) if fainted)
+    enemy_mask = sum(1 << j for j, fainted in enumerate(enemy_fainted) if fainted)
+    if my_mask == _ALL_FAINTED or enemy_mask == _ALL_FAINTED:
+        return []
+
+    # 置換表はチームと相性表ごと（相手のタイプが判明するたびにキーが変わる）
+    table_key = (tuple((tuple(mon["タイプ"]), tuple(mon["わざ"])) for mon in team), get_compiled_chart(type_chart).version)
+    table = _tables.get(table_key)
+    if table is None or len(table) >= _MAX_TABLE_SIZE:
+        table = {}
+        _tables.set(table_key, table)
+
+    revealed = tuple(tuple(types) if is_known_enemy(types) else None for types in enemy_types_list)
+    if enemy_mask >> enemy_active_index & 1:
+        enemy_active_index = _alive(enemy_mask)[0]
+    recommendations = [
+        SwitchRecommendation(i, _search(rates, table, revealed, my_mask, enemy_mask, i, enemy_active_index), i == active_index)
+        for i in _alive(my_mask)
+    ]
+    return sorted(recommendations, key=lambda r: (-r.win_rate, not r.is_active, r.index))
@@ -0,0 +1,252 @@
+﻿# -*- coding: utf-8 -*-
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+from typing import NamedTuple
+import numpy as np
+from type_logic import calculation_totalscore_batch, get_compiled_chart
+
+# 一度に指定できる相手のタイプの組み合わせの上限（増やすと候補数と探索時間が急に増える）
+MAX_TARGETS = 10
+
+# workers を指定しない場合、候補がこれより少なければこのプロセスだけで探索する
+# （計測：候補 500 前後は 0.1〜0.4 秒、1000〜1400 は 0.9〜1.6 秒、2900 は 7.5 秒。プールの起動は数秒かかる）
+PARALLEL_MIN_CANDIDATES = 1000
+
+# 探索結果（最良のチームと評価値）
+class TeamSearchResult(NamedTuple):
+    team: list            # モンスター3体（"タイプ" と "わざ" を持つ辞書）
+    score: float          # 相手ごとに一番スコアが高いモンスターで戦った場合の総合評価の平均
+    candidates: int       # 枝刈り後の候補モンスター数
+    evaluated: int        # 3体目まで評価した組み合わせ（2体目まで決めた節点）の数
+
+# 優越されている行（他のどれかの行以下で、ひとつも上回らない行）を除いた行番号を返す（同じ行は1つだけ残す）
+def pareto_front(values):
+    order = np.argsort(-values.sum(axis=1), kind="stable")
+    values = values[order]
+    front = np.empty_like(values)
+    keep = np.zeros(len(values), dtype=bool)
+    count = 0
+    for row in range(len(values)):
+        if count and np.any(np.all(front[:count] >= values[row], axis=1)):
+            continue
+        front[count] = values[row]
+        keep[row] = True
+        count += 1
+    return order[keep]
+
+# 候補のモンスター（タイプの組 × わざ3つ）と、相手ごとの総合評価を求める
+def build_candidates(target_types_list, type_chart):
+    """
+    総合評価は「わざだけで決まる部分」と「タイプだけで決まる部分」の和なので、
+    わざの組・タイプの組それぞれで優越されているものを先に除いても最良のチームは変わらない。
+    - target_types_list: 相手のタイプのリスト（例：[["ほのお", "未"], ["みず", "じめん"]]）
+    - 戻り値：候補モンスターのリストと shape (候補数, 相手の数) の総合評価
+    """
+    type_names = get_compiled_chart(type_chart).type_names
+
+    # わざの組：ノーマルわざ1つ × スペシャルわざ（1つ または 2つ）
+    special_sets = [(t, "未") for t in type_names] + list(itertools.combinations(type_names, 2))
+    move_sets = [[normal, *specials] for normal in type_names for specials in special_sets]
+    move_scores = calculation_totalscore_batch([{"タイプ": ["未", "未"], "わざ": moves} for moves in move_sets], target_types_list, type_chart)[0]
+    move_sets = [move_sets[i] for i in pareto_front(move_scores)]
+
+    # タイプの組：単一タイプ18通り＋複合タイプ153通り
+    type_sets = [[t, "未"] for t in type_names] + [list(pair) for pair in itertools.combinations(type_names, 2)]
+    type_scores = calculation_totalscore_batch([{"タイプ": types, "わざ": ["未", "未", "未"]} for types in type_sets], target_types_list, type_chart)[0]
+    type_sets = [type_sets[i] for i in pareto_front(type_scores)]
+
+    # 残った組み合わせの総合評価を計算し、さらに優越されている候補を除く（平均スコアの高い順）
+    candidates = [{"タイプ": types, "わざ": moves} for types in type_sets for moves in move_sets]
+    scores = calculation_totalscore_batch(candidates, target_types_list, type_chart)[0]
+    front = pareto_front(scores)
+    return [candidates[i] for i in front], scores[front]
+
+# 後ろの行の要素ごとの最大値（suffix_max[i] = scores[i:] の最大値、末尾は -inf）
+def suffix_max(scores):
+    result = np.full((len(scores) + 1, scores.shape[1]), -np.inf)
+    if len(scores):
+        result[:-1] = np.maximum.accumulate(scores[::-1], axis=0)[::-1]
+    return result
+
+# ワーカープロセスのプール（起動に時間がかかるため、一度起動したら次の探索でも使い回す）
+_pool = None
+_pool_workers = 0
+_pool_best = None
+_pool_lock = threading.Lock()
+
+# ワーカープロセスで共有する暫定解の評価値（プロセス起動時に1回だけ受け取る）
+_worker_best = None
+
+def _init_worker(best):
+    global _worker_best
+    _worker_best = best
+
+def _pool_ready(workers):
+    return _pool is not None and _pool_workers == workers
+
+def _get_pool(workers):
+    global _pool, _pool_workers, _pool_best
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.terminate()
+
+        # Streamlit はスレッドで動くため fork ではなく spawn でプロセスを起動する
+        context = multiprocessing.get_context("spawn")
+        _pool_best = context.Value("d", -np.inf)
+        _pool = context.Pool(workers, initializer=_init_worker, initargs=(_pool_best,))
+        _pool_workers = workers
+        atexit.register(_pool.terminate)
+    return _pool, _pool_best
+
+# プールをバックグラウンドで起動しておく（大きな探索のときに起動を待たないように）
+def warm_pool(workers=None):
+    """
+    - workers: プロセス数（None の場合は CPU 数。1 以下なら何もしない）
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and not _pool_ready(workers):
+        threading.Thread(target=_warm_pool, args=(workers,), name="team-builder-pool", daemon=True).start()
+
+def _warm_pool(workers):
+    # 探索中・起動中ならそちらに任せる
+    if not _pool_lock.acquire(blocking=False):
+        return
+    try:
+        if not _pool_ready(workers):
+            # ワーカーの起動（spawn とモジュールの import）が終わるまで待つ
+            _get_pool(workers)[0].map(abs, range(workers))
+    finally:
+        _pool_lock.release()
+
+# 1体目を固定した部分木を分枝限定法で探索する
+def search_subtree(first, scores, suffix, best=None):
+    """
+    チームの評価値（ここでは平均ではなく合計）= 相手ごとの3体の最大スコアの合計。
+    まだ決めていない枠の上界は次の小さい方を使い、暫定解以下の枝は探索しない。
+    - 残りの候補の要素ごとの最大値が入ると仮定した値
+    - 1体目からの上積み（相手ごとに1体目を上回る分の合計）が大きい候補が入ると仮定した値
+    - best: 複数プロセスで共有する暫定解の評価値（multiprocessing.Value、None の場合はこの部分木だけで探索）
+    - 戻り値：(評価値, (1体目, 2体目, 3体目) の候補番号, 評価した節点の数)（暫定解を超えられない場合は評価値 -inf）
+    """
+    local_best = best.value if best is not None else -np.inf
+    found_value, found_team, evaluated = -np.inf, None, 0
+    if first + 2 >= len(scores):
+        return found_value, found_team, evaluated
+
+    # 1体目の上界
+    base = scores[first]
+    gains = np.maximum(scores[first + 1:] - base, 0).sum(axis=1)
+    bound = min(np.maximum(base, suffix[first + 1]).sum(), base.sum() + np.partition(gains, -2)[-2:].sum())
+    if bound <= local_best:
+        return found_value, found_team, evaluated
+
+    # 2体目の候補ごとの上界（まとめて計算し、上界の高い順に探索）
+    seconds = np.arange(first + 1, len(scores) - 1)
+    pair_max = np.maximum(base, scores[seconds])
+    gain_suffix = np.maximum.accumulate(gains[::-1])[::-1]
+    bounds = np.minimum(np.maximum(pair_max, suffix[seconds + 1]).sum(axis=1),
+                        pair_max.sum(axis=1) + gain_suffix[seconds - first])
+    for idx in np.argsort(-bounds, kind="stable"):
+        if best is not None:
+            local_best = max(local_best, best.value)
+        if bounds[idx] <= local_best:
+            break
+
+        # 3体目は残りの候補をまとめて評価
+        second = seconds[idx]
+        values = np.maximum(pair_max[idx], scores[second + 1:]).sum(axis=1)
+        third = int(values.argmax())
+        evaluated += 1
+        if values[third] > local_best:
+            local_best = found_value = float(values[third])
+            found_team = (first, int(second), int(second + 1 + third))
+            if best is not None:
+                with best.get_lock():
+                    best.value = max(best.value, local_best)
+    return found_value, found_team, evaluated
+
+def _search_chunk(task):
+    scores, firsts = task
+    suffix = suffix_max(scores)
+    results = [search_subtree(first, scores, suffix, _worker_best) for first in firsts]
+    return max(results, key=lambda r: r[0]), sum(r[2] for r in results), len(firsts)
+
+# 貪欲法で初期の暫定解を作る（1体ずつ評価値が最も上がる候補を追加）
+def greedy_team(scores, size=3):
+    team, current = [], np.full(scores.shape[1], -np.inf)
+    for _ in range(min(size, len(scores))):
+        values = np.maximum(current, scores).sum(axis=1)
+        values[team] = -np.inf
+        best = int(values.argmax())
+        team.append(best)
+        current = np.maximum(current, scores[best])
+    return tuple(team), float(current.sum())
+
+# 相手のタイプの組み合わせに対して総合評価が最大になるチームを探索する
+def search_best_team(target_types_list, type_chart, workers=None, progress=None):
+    """
+    - target_types_list: 相手のタイプのリスト（空の場合は探索しない）
+    - workers: 並列で探索するプロセス数（1 の場合はこのプロセスだけで探索）
+      None の場合、候補が PARALLEL_MIN_CANDIDATES 以上で起動済みのプールが空いていれば CPU 数で並列、それ以外はこのプロセスだけで探索
+    - progress: 進捗を受け取る関数 progress(完了した割合, 現在の最良の評価値)
+    """
+    candidates, scores = build_candidates(target_types_list, type_chart)
+    target_count = max(len(target_types_list), 1)
+    best_team, best_value = greedy_team(scores)
+    evaluated = 0
+
+    # 候補が3体以下の場合：貪欲法の結果がそのまま最良（足りない枠は一番良い候補で埋める）
+    if len(candidates) <= 3:
+        best_team = best_team + best_team[:1] * (3 - len(best_team))
+        if progress:
+            progress(1.0, best_value / target_count)
+        return TeamSearchResult([candidates[i] for i in best_team], best_value / target_count, len(candidates), evaluated)
+
+    firsts = list(range(len(candidates) - 2))
+    use_pool = False
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(candidates) >= PARALLEL_MIN_CANDIDATES else 1
+        if workers > 1:
+            # 起動していなければ次の探索に備えて起動だけしておき、今回はこのプロセスで探索する
+            warm_pool(workers)
+            use_pool = _pool_ready(workers) and _pool_lock.acquire(blocking=False)
+    elif workers > 1:
+        _pool_lock.acquire()
+        use_pool = True
+
+    # 1体目ごとの部分木をまとめてワーカーに渡す（上界が高い先頭側が偏らないよう交互に割り振る）
+    chunk_count = min(len(firsts), workers * 8)
+    chunks = [firsts[i::chunk_count] for i in range(chunk_count)]
+    done = 0
+
+    if not use_pool:
+        suffix = suffix_max(scores)
+        shared_best = multiprocessing.Value("d", best_value)
+        for chunk in chunks:
+            for first in chunk:
+                value, team, count = search_subtree(first, scores, suffix, shared_best)
+                evaluated += count
+                if value > best_value:
+                    best_value, best_team = value, team
+            done += len(chunk)
+            if progress:
+                progress(done / len(firsts), best_value / target_count)
+    else:
+        # プールは1つなので、同時に使えるのは1セッションだけ（workers=None の場合、使用中なら上でこのプロセスの探索にしている）
+        try:
+            pool, shared_best = _get_pool(workers)
+            shared_best.value = best_value
+            for (value, team, count), chunk_evaluated, chunk_size in pool.imap_unordered(_search_chunk, [(scores, chunk) for chunk in chunks]):
+                evaluated += chunk_evaluated
+                if value > best_value:
+                    best_value, best_team = value, team
+                done += chunk_size
+                if progress:
+                    progress(done / len(firsts), best_value / target_count)
+        finally:
+            _pool_lock.release()
+
+    return TeamSearchResult([candidates[i] for i in best_team], best_value / target_count, len(candidates), evaluated)
@@ -1,18 +1,18 @@
 ﻿# -*- coding: utf-8 -*-
 import streamlit as st
-import base64
-import json
-import os
-import time
-from ui_components import IMAGE_OPTIONS, TYPE_IMAGE_OPTIONS, prepare_base64_images, show_icon, render_monster_card, show_label, render_icon_selector
-from team_editor import load_saved_teams
+from ui_components import IMAGE_OPTIONS, TYPE_IMAGE_OPTIONS, ImageMap, icon_src, render_monster_card, render_icon_selector
+from type_logic import type_chart, get_defender_combinations
+from team_builder import MAX_TARGETS, search_best_team
+from profiler import profiled
+from team_store import submit_add_team
+from validation import validate_team
 
-# セーブ先の宣言
-SAVE_PATH = "saved_teams.json"
+# base64画像（全ページで共有するレジストリから、最初に使うときに読み込む）
+TYPE_IMAGE_BASE64 = ImageMap("move_icons")
+IMAGE_BASE64 = ImageMap("images")
 
-# base64画像を準備
-TYPE_IMAGE_BASE64 = prepare_base64_images(TYPE_IMAGE_OPTIONS)
-IMAGE_BASE64 = prepare_base64_images(IMAGE_OPTIONS)
+# 保存中のチームの結果を確認する間隔（秒）
+SAVE_STATUS_INTERVAL = 1
 
 # 初期化
 def initialize_team_creator_state():
@@ -80,11 +80,10 @@ def render_target_label(monster_index, target_options, target_map, type_image_ba
 
              # タイプが選択されている場合：タイプ画像とラベルを表示
             if selected_label and selected_label in type_image_base64:
-                img_base64 = type_image_base64[selected_label]
                 st.markdown(
                     f"""
                     <div style="text-align:center; margin-top:6px;">
-                        <img src="data:image/png;base64,{img_base64}" width="40"><br>
+                        <img src="{icon_src(type_image_base64, selected_label, 40)}" width="40"><br>
                         <div style="font-size:10px;">{selected_label}</div>
                     </div>
                     """,
@@ -94,9 +93,7 @@ def render_target_label(monster_index, target_options, target_map, type_image_ba
                 st.markdown("<div style='text-align:center; font-size:10px;'>未選択</div>", unsafe_allow_html=True)
             
             # 編集ボタン
-            if st.button("編集する", key=f"target_btn_{monster_index}_{slot_index}_{label}"):
-                st.session_state["selected_target"] = label
-                st.rerun()
+            st.button("編集する", key=f"target_btn_{monster_index}_{slot_index}_{label}", on_click=select_target, args=(label,))
 
 
 # モンスターに設定された設定のプレビューと編集ボタン表示（タイプ1～スペシャルわざ2）
@@ -151,22 +148,28 @@ def render_monster_preview(i, selected_index, type_image_base64, image_base64):
     render_monster_card(mon, type_image_base64, image_base64)
     return mon
 
+# 編集する項目（タイプ1～スペシャルわざ2）を選ぶ（ボタンの on_click）
+def select_target(label):
+    st.session_state["selected_target"] = label
+
+# n体目に切替える（ボタンの on_click）
+def switch_editing_monster(i):
+
+    # 現在編集中のモンスター情報を保存
+    set_selected_monster()
+
+    #　選択されたモンスターの処理へ
+    st.session_state["selected_monster"] = i
+
+    #　編集対象の項目を「タイプ1」に設定
+    st.session_state["selected_target"] = "タイプ1"
+
 # n体目の編集ボタンと切替処理
 def handle_monster_edit(i):
 
     # 現在選択中のモンスターと異なる場合のみ処理を実行
     if i != st.session_state["selected_monster"]:
-       if st.button(f"{i}体目を編集する", key=f"setup_monster_{i}"):
-
-            # 現在編集中のモンスター情報を保存
-            set_selected_monster()
-
-            #　選択されたモンスターの処理へ
-            st.session_state["selected_monster"] = i
-
-            #　編集対象の項目を「タイプ1」に設定
-            st.session_state["selected_target"] = "タイプ1"
-            st.rerun()
+        st.button(f"{i}体目を編集する", key=f"setup_monster_{i}", on_click=switch_editing_monster, args=(i,))
 
 # 3体分のプレビューと編集ボタン
 def render_monster_list(num=3, type_image_base64=None, image_base64=None):
@@ -194,51 +197,10 @@ def render_monster_list(num=3, type_image_base64=None, image_base64=None):
 
 # セーブ前のエラーチェック
 def validate_team_data():
-    team_name = st.session_state.get("set_teamname", "").strip()
-    saved_monsters = st.session_state.get("saved_monsters", {})
-    errors = []
-
-    # チーム名チェック
-    if not team_name:
-        errors.append("チーム名を入力してください")
-
-    # モンスターごとのチェック
-    for i in range(1, 4):
-        mon = saved_monsters.get(i)
-        if not mon:
-            errors.append(f"{i}体目のモンスターが未設定です")
-            continue
-
-        name = mon["名前"]
-        image = mon["画像"]
-        moves = mon["わざ"]
-        types = mon.get("タイプ", ["未", "未"])
-
-        if name == "未":
-            errors.append(f"{i}体目のモンスターの名前を入力してください")
-        if image == "未":
-            errors.append(f"{i}体目のモンスターの画像を選択してください")
+    return validate_team(st.session_state.get("set_teamname", ""), st.session_state.get("saved_monsters", {}))
 
-        # タイプ1・2の両方が未設定ならエラー
-        if types[0] == "未" and types[1] == "未":
-            errors.append(f"{i}体目のモンスターのタイプを最低1つは選択してください")
-
-        # 通常技は必須
-        if moves[0] == "未":
-            errors.append(f"{i}体目のモンスターの通常わざを選択してください")
-
-        # スペシャルわざ1・2のどちらも未選択ならエラー
-        if moves[1] == "未" and moves[2] == "未":
-            errors.append(f"{i}体目のモンスターのスペシャルわざを最低1つは選択してください")
-
-        # タイプ1・2が同じ場合（未設定以外）
-        if types[0] != "未" and types[0] == types[1]:
-            errors.append(f"{i}体目のモンスターのタイプ1とタイプ2が同じです。異なるタイプを選択してください")
-
-    return errors
-
-# チーム情報を保存ファイルに書込
-def save_team(save_path):
+# チーム情報を保存先に書込
+def save_team():
 
     # 現在編集中のモンスター情報をセッションに保存（最後の編集内容を反映）
     set_selected_monster()
@@ -252,45 +214,51 @@ def save_team(save_path):
     # チーム全体のデータ構造を作成（辞書形式）
     team = {"チーム名": team_name, "モンスター": team_data}
 
-    # 保存ファイルが存在する場合：既存のチームデータを読込
-    if os.path.exists(save_path):
-        with open(save_path, "r", encoding="utf-8") as f:
-            saved = json.load(f)
-
-    # 存在しない場合：空のリストとして初期化
-    else:
-        saved = []
+    # 保存先への書込みはバックグラウンドで行う（完了したら次の再実行で通知）
+    future = submit_add_team(team)
 
-    if len(saved) >= 2:
-        st.warning("保存できるチームは最大2件までです")
+    # 新規設定できるようにセッション情報をリセット
+    for i in range(1, 4):
+        for key in [f"name{i}", f"selected_image{i}"] + [f"types{i}_{j}" for j in range(2)] + [f"selected_move_image{i}_{k}" for k in range(1, 4)]:
+            st.session_state.pop(key, None)
+
+    st.session_state["saved_monsters"] = {}
+    st.session_state["selected_monster"] = 1
+    st.session_state["selected_target"] = "タイプ1"
+    st.session_state.pop("set_teamname", None)
+
+    # 前の保存が終わっていなくても、結果を通知できるように追加していく
+    st.session_state.setdefault("pending_saves", []).append((team_name, future))
+
+    # ページを再描画して初期状態に戻す
+    st.rerun()
+
+# バックグラウンドで保存したチームの結果を通知する（全ページの再実行ごとに呼ぶ）
+def render_save_status():
+    pending = []
+    for team_name, future in st.session_state.get("pending_saves", []):
+        if not future.done():
+            pending.append((team_name, future))
+        elif future.exception() is not None:
+            st.toast(f"チーム「{team_name}」を保存できませんでした：{future.exception()}", icon="⚠️")
+        else:
+            st.toast(f"チーム「{team_name}」を保存しました！", icon="✅")
+
+    # 保存中のチームは、画面を操作しなくても一定間隔で確認する
+    if pending:
+        st.sidebar.info("保存中：" + "、".join(team_name for team_name, _ in pending))
+        st.session_state["pending_saves"] = pending
+        st.fragment(_wait_for_saves, run_every=SAVE_STATUS_INTERVAL)()
     else:
-        saved.append(team)
-
-        # 保存ファイルにチーム一覧を上書き保存
-        with open(save_path, "w", encoding="utf-8") as f:
-            json.dump(saved, f, ensure_ascii=False, indent=2)
-
-        # 保存完了メッセージを表示
-        st.success(f"チーム「{team_name}」を保存しました！5秒後にページを初期化します")
-
-        # 5秒後に初期化処理(上限時の案内がすぐに出るのを防止)
-        time.sleep(5)
+        st.session_state.pop("pending_saves", None)
 
-        # 新規設定できるようにセッション情報をリセット
-        for i in range(1, 4):
-            for key in [f"name{i}", f"selected_image{i}"] + [f"types{i}_{j}" for j in range(2)] + [f"selected_move_image{i}_{k}" for k in range(1, 4)]:
-                st.session_state.pop(key, None)
-
-        st.session_state["saved_monsters"] = {}
-        st.session_state["selected_monster"] = 1
-        st.session_state["selected_target"] = "タイプ1"
-        st.session_state.pop("set_teamname", None)
-        st.session_state.clear()
-
-        # ページを再描画して初期状態に戻す
+# 保存中のチームがすべて終わったら全体を再実行して通知する（サイドバーの「保存中」も消す）
+def _wait_for_saves():
+    if all(future.done() for _, future in st.session_state.get("pending_saves", [])):
         st.rerun()
 
 # 【メイン】チーム選択ページ
+@profiled
 def render_team_creator():
 
     # ローディング
@@ -308,20 +276,6 @@ def render_team_creator():
             """,
             unsafe_allow_html=True
         )
-        # 保存済みチームの読み込み
-        saved_teams = load_saved_teams()
-
-        # チーム数が上限の場合：作成不可として案内を表示
-        if len(saved_teams) >= 2:
-            st.info("""
-                    すでにチームが2件登録されています。  
-                    新しいチームを作成するには、左の「チーム選択・削除」ページで不要なチームを削除してください。  
-                    または、登録済みのチームを使って「バトル判定」ページでバトルをしてください。
-            """)
-            # ローディング完了メッセージ
-            status.update(label="チーム が いっぱい です ... 🌀", state="complete")
-            return
-
         # 初期化
         initialize_team_creator_state()
         selected_monster = st.session_state["selected_monster"]
@@ -402,8 +356,97 @@ def render_team_creator():
                 for msg in errors:
                     st.markdown(f"- {msg}")
             else:
-                save_team(SAVE_PATH)
+                save_team()
+
+
+        # ローディング完了メッセージ
+        status.update(label="じゅんび かんりょう！チームを つくろう ✊", state="complete")
+
+# 探索で見つかったチームを新規チーム作成と同じ入力状態に反映する（保存は save_team を使う）
+def apply_builder_team(team):
+    st.session_state["saved_monsters"] = {}
+    for i, mon in enumerate(team, start=1):
+        st.session_state[f"name{i}"] = mon["名前"]
+        st.session_state[f"selected_image{i}"] = mon["画像"]
+        for j in range(2):
+            st.session_state[f"types{i}_{j}"] = mon["タイプ"][j]
+        for k in range(1, 4):
+            st.session_state[f"selected_move_image{i}_{k}"] = mon["わざ"][k - 1]
+        st.session_state["saved_monsters"][i] = mon
+    st.session_state["selected_monster"] = 1
+    st.session_state["selected_target"] = "タイプ1"
+
+# 【メイン】チーム自動探索ページ
+@profiled
+def render_team_builder():
+
+    # ローディング
+    with st.status("データ を よみこみチュウ ... ⚡", expanded=True) as status:
+        st.title("チーム自動探索")
+        st.markdown(
+            f"""
+            ここでは、対策したい相手のタイプを選ぶと、総合評価が一番高くなるチーム（タイプ・わざの組み合わせ）を探索します。<br>
+            相手ごとに、チームの中で一番総合評価が高いモンスターを出したときの平均スコアで比べます。<br><br>
+            <h3>◆チーム探索の手順</h3>
+            1. 対策したい相手のタイプの組み合わせを選択（最大{MAX_TARGETS}件）<br>
+            2. 「探索をはじめる」ボタンをクリック<br>
+            3. 見つかったチームにチーム名をつけて「チームを保存する」ボタンで登録完了！<br><br>
+            """,
+            unsafe_allow_html=True
+        )
+        initialize_team_creator_state()
+
+        # 相手のタイプの組み合わせ（単一タイプは "ほのお"、複合タイプは "ほのお・ひこう" と表示）
+        combinations = {(t1 if t2 == "未" else f"{t1}・{t2}"): [t1, t2] for t1, t2 in get_defender_combinations(type_chart)}
+        st.markdown("#### 1. 対策したい相手のタイプを選択してください")
+        targets = st.multiselect("▼ 相手のタイプ", options=list(combinations.keys()), max_selections=MAX_TARGETS, key="builder_targets", placeholder="例：ほのお・ひこう")
+        st.markdown("---")
+
+        # 探索（進捗はプログレスバーに表示）
+        st.markdown("#### 2. チームを探索してください")
+        if st.button("探索をはじめる", key="builder_search", disabled=not targets):
+            progress_bar = st.progress(0.0, text="たんさくチュウ ... ⚡")
+
+            def show_progress(fraction, best_score):
+                progress_bar.progress(min(fraction, 1.0), text=f"たんさくチュウ ... ⚡ {fraction:.0%}（いまの最良：{best_score:.2f}）")
+
+            result = search_best_team([combinations[label] for label in targets], type_chart, progress=show_progress)
+
+            # 名前と画像を付けて保存できる形にする（画像はタイプ1のアイコン）
+            st.session_state["builder_result"] = {
+                "スコア": result.score,
+                "モンスター": [
+                    {"名前": f"おすすめモンスター{i}", "タイプ": mon["タイプ"], "画像": mon["タイプ"][0], "わざ": mon["わざ"]}
+                    for i, mon in enumerate(result.team, start=1)
+                ],
+            }
+            progress_bar.progress(1.0, text=f"たんさく かんりょう！（候補 {result.candidates} 体、評価した組み合わせ {result.evaluated} 件）")
+
+        # 探索結果の表示
+        builder_result = st.session_state.get("builder_result")
+        if not builder_result:
+            status.update(label="じゅんび かんりょう！チームを さがそう ✊", state="complete")
+            return
+        st.markdown(f"▼ 見つかったチーム（平均スコア：{builder_result['スコア']:.2f}）")
+        cols = st.columns(3)
+        for i, mon in enumerate(builder_result["モンスター"]):
+            with cols[i]:
+                render_monster_card(mon, TYPE_IMAGE_BASE64, IMAGE_BASE64)
+        st.markdown("---")
+
+        # 保存（新規チーム作成と同じチェック・保存処理を使う）
+        st.markdown("#### 3. チーム名を入力して保存してください")
+        st.text_input("▼ チーム名を入力", key="set_teamname", placeholder="例：〇〇タイプチーム")
+        if st.button("チームを保存する", key="builder_save"):
+            apply_builder_team(builder_result["モンスター"])
+            errors = validate_team_data()
 
+            if errors:
+                st.warning("修正が必要な項目があります。以下の項目を確認してください：")
+                for msg in errors:
+                    st.markdown(f"- {msg}")
+            else:
+                save_team()
 
         # ローディング完了メッセージ
-        status.update(label="じゅんび かんりょう！チームを つくろう ✊", state="complete")
\ No newline at end of file
+        status.update(label="じゅんび かんりょう！チームを さがそう ✊", state="complete")
@@ -1,42 +1,94 @@
 ﻿# -*- coding: utf-8 -*-
 import streamlit as st
-import base64
-import uuid
-import json
-import os
-import random
-from ui_components import IMAGE_OPTIONS, TYPE_IMAGE_OPTIONS, prepare_base64_images, render_monster_card, show_icon
-
-# セーブ先の宣言
-SAVE_PATH = "saved_teams.json"
-
-# base64画像を準備
-TYPE_IMAGE_BASE64 = prepare_base64_images(TYPE_IMAGE_OPTIONS)
-IMAGE_BASE64 = prepare_base64_images(IMAGE_OPTIONS)
-
-# セーブデータをロードする
-def load_saved_teams(filepath="saved_teams.json"):
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+from ui_components import ImageMap, render_monster_card
+from type_logic import type_chart, render_meta_expectation
+from profiler import profiled, profiled_fragment
+from team_store import JsonTeamStore, TEAM_ID_KEY, get_team_store, load_teams_cached
+
+# base64画像（全ページで共有するレジストリから、最初に使うときに読み込む）
+TYPE_IMAGE_BASE64 = ImageMap("move_icons")
+IMAGE_BASE64 = ImageMap("images")
+
+# チームのタブ（st.fragment のキー。チームを選んだときは、表示が変わる2つのタブだけを再実行する）
+TEAM_TAB_KEY = "team_tab_{}"
+
+# セーブデータをロードする（filepath を指定した場合はその JSON ファイルから）
+@profiled
+def load_saved_teams(filepath=None):
+    """
+    全セッションで共有するキャッシュから返す（保存先が変わった場合だけ読み直す）。
+    - 戻り値：チームの tuple（書き換え不可）
+    """
+    store = JsonTeamStore(filepath) if filepath else get_team_store()
+    return load_teams_cached(store)
 
 # チーム名を20文字だけ表示する（チーム名が長い場合の対策）
 def shorten_name(name, max_len=20):
     return name if len(name) <= max_len else name[:max_len] + "…"
 
 
-# チームを削除する
+# バトルで使用するチームを選ぶ（ボタンの on_click で、前に選ばれていたタブと選んだタブだけを再実行する）
+def select_team(i):
+    previous = st.session_state.get("selected_team_index")
+    st.session_state["selected_team_index"] = i
+
+    # 前に選ばれていたチームが今のタブにない場合（他のセッションで削除された場合など）は再実行の対象から外す
+    rendered = range(st.session_state.get("team_tab_count", 0))
+    if i in rendered:
+        st.rerun(scope=[TEAM_TAB_KEY.format(j) for j in sorted({previous, i} - {None}) if j in rendered])
+    else:
+        st.rerun()
+
+# チームを削除する（タブの数と番号が変わるので、ボタンの on_click の後はページ全体を再実行する）
 def delete_team(load_teams, i):
-    del load_teams[i]
-    with open(SAVE_PATH, "w", encoding="utf-8") as f:
-        json.dump(load_teams, f, ensure_ascii=False, indent=2)
-    return load_teams
+    get_team_store().delete_team(load_teams[i][TEAM_ID_KEY])
+
+    # 選択中のチームより前を削除した場合は番号をずらす（選択中のチームを削除した場合は先頭を選ぶ）
+    selected = st.session_state.get("selected_team_index")
+    if selected is not None and selected >= i:
+        st.session_state["selected_team_index"] = selected - 1 if selected > i else 0
+
+    # ボタンはタブの fragment の中にあるので、ページ全体の再実行を指定する（指定しないとこのタブだけが再実行される）
+    st.rerun()
+
+
+# タブ：チームの詳細（タブごとの fragment。キーはタブの番号）
+def render_team_tab(load_teams, idx):
+    profiled_fragment(_render_team_tab, key=TEAM_TAB_KEY.format(idx))(load_teams, idx)
+
+@profiled
+def _render_team_tab(load_teams, idx):
+    myteam = load_teams[idx]
+
+    # 選択状態の判定
+    is_selected = st.session_state["selected_team_index"] == idx
+
+    # ボタン（選択・削除）表示
+    button_cols = st.columns([3, 5, 2])
+
+    with button_cols[0]:
+        if is_selected:
+            st.markdown("⭐ **バトルで使用中**")
+        else:
+            st.button("バトルで使用する", key=f"select_team_{idx}", on_click=select_team, args=(idx,))
+
+    with button_cols[2]:
+        st.button("削除", key=f"delete_team_{idx}", on_click=delete_team, args=(load_teams, idx))
+
+    # モンスターの表示
+    cols = st.columns(3)
+    for i in range(3):
+        with cols[i]:
+            monster_data = myteam["モンスター"][str(i + 1)]
+            render_monster_card(monster_data, TYPE_IMAGE_BASE64, IMAGE_BASE64)
+
+    # 環境（よく使われる相手のタイプ）に対する期待スコア
+    st.markdown("#### 環境に対する期待スコア")
+    render_meta_expectation([myteam["モンスター"][str(i + 1)] for i in range(3)], type_chart)
 
 
 # 【メイン】保存されているチームの表示
+@profiled
 def render_team_editor():
 
     # ローディング
@@ -46,10 +98,7 @@ def render_team_editor():
         st.markdown(
             """
             作成済みのチームから、バトルで使用するチームを選びましょう。 <br>
-            選択されたチームには「⭐ バトルで使用中」と表示され、デフォルトでは一番上のチームが選ばれています。<br>
-            <br>
-            最大で2つのチームを作成できます。<br>
-            上限に達している場合は、不要なチームを削除してから新しいチームを作成してください。<br><br>
+            選択されたチームには「⭐ バトルで使用中」と表示され、デフォルトでは一番上のチームが選ばれています。<br><br>
             <h3>◆チーム選択の手順</h3>
             1. バトルに使いたいチームの「バトルで使用する」ボタンをクリック<br>
             2. 使わなくなったチームは「削除」ボタンで削除できます<br>
@@ -57,11 +106,12 @@ def render_team_editor():
             """,
             unsafe_allow_html=True
         )
-        # チームデータの読み込み
+        # チームデータの読み込み（表示したタブの数は、タブだけを再実行するときに使う）
         load_teams = load_saved_teams()
+        st.session_state["team_tab_count"] = len(load_teams)
 
         # チームが存在しない場合：案内
-        if not isinstance(load_teams, list) or not load_teams:
+        if not load_teams:
             st.info("作成済みのチームはありません。左のメニューから「新規チーム作成」を選んで、チームを登録してください。")
             
             # ローディング完了メッセージ
@@ -83,32 +133,8 @@ def render_team_editor():
                 # ローディング用メッセージ
                 status.update(label=f"{myteam['チーム名']} の モンスター を ひょうじチュウ ... ⚡")
 
-                # 選択状態の判定
-                is_selected = st.session_state["selected_team_index"] == idx
-
-                # ボタン（選択・削除）表示
-                button_cols = st.columns([3, 5, 2])
-
-                with button_cols[0]:
-                    if is_selected:
-                        st.markdown("⭐ **バトルで使用中**")
-                    else:
-                        if st.button("バトルで使用する", key=f"select_team_{idx}"):
-                            st.session_state["selected_team_index"] = idx
-                            st.rerun()
-
-                with button_cols[2]:
-                    if st.button("削除", key=f"delete_team_{idx}"):
-                        delete_team(load_teams, idx)
-                        st.rerun()
-
-                # モンスターの表示
-                cols = st.columns(3)
-                for i in range(3):
-                    with cols[i]:
-                        monster_data = myteam["モンスター"][str(i + 1)]
-                        render_monster_card(monster_data, TYPE_IMAGE_BASE64, IMAGE_BASE64)
-
+                # チームの詳細（選択・削除のボタンとモンスター）
+                render_team_tab(load_teams, idx)
 
         # ローディング完了メッセージ
         status.update(label="じゅんび かんりょう！ チーム を えらぼう 🌸", state="complete")
@@ -0,0 +1,326 @@
+﻿# -*- coding: utf-8 -*-
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from bounded_cache import BoundedCache
+
+# 保存先の種類（環境変数 PTYPE_TEAM_STORE で "sqlite"・"json" を選ぶ）
+TEAM_STORE_ENV = "PTYPE_TEAM_STORE"
+DEFAULT_STORE = "sqlite"
+
+# 保存ファイル
+JSON_PATH = "saved_teams.json"
+SQLITE_PATH = "saved_teams.db"
+
+# SQLite のスキーマのバージョン（PRAGMA user_version に記録する）
+SCHEMA_VERSION = 1
+
+# 書込みがロックされていた場合に待つ時間（ミリ秒）
+BUSY_TIMEOUT_MS = 5000
+
+# 読み込んだチームに付ける、削除に使うID（JSON の場合はチームに保存した UUID（ない場合は内容から決めた ID）、SQLite の場合は teams.id）
+TEAM_ID_KEY = "チームID"
+
+# 読み込んだチームのキャッシュ（保存先のキー → (ファイルの更新日時・サイズ, チーム)）
+_team_cache = BoundedCache(maxsize=16)
+
+# キャッシュのヒット・ミスの回数（回数を更新するときのロック）
+_team_cache_lock = threading.Lock()
+_team_cache_stats = {"hits": 0, "misses": 0}
+
+# 書込みを1件ずつ順番に行うバックグラウンドのスレッド（終了時は残っている書込みを待つ）
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="team-writer")
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS monsters (
+    team_id INTEGER NOT NULL REFERENCES teams(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    image TEXT NOT NULL,
+    type1 TEXT NOT NULL,
+    type2 TEXT NOT NULL,
+    move1 TEXT NOT NULL,
+    move2 TEXT NOT NULL,
+    move3 TEXT NOT NULL,
+    PRIMARY KEY (team_id, slot)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS teams_name ON teams(name)",
+)
+
+# チームの辞書（saved_teams.json と同じ形式）からモンスターの行を作る
+def _monster_rows(team):
+    rows = []
+    for slot, mon in sorted(team["モンスター"].items(), key=lambda item: int(item[0])):
+        types = list(mon.get("タイプ", ["未", "未"])) + ["未", "未"]
+        moves = list(mon.get("わざ", ["未", "未", "未"])) + ["未", "未", "未"]
+        rows.append((int(slot), mon.get("名前", "未"), mon.get("画像", "未"), *types[:2], *moves[:3]))
+    return rows
+
+# ID のないチームの ID（同じ内容なら読むたびに同じ ID になる）
+def _content_team_id(team):
+    content = json.dumps({"チーム名": team.get("チーム名"), "モンスター": team.get("モンスター")}, ensure_ascii=False, sort_keys=True)
+    return uuid.uuid5(uuid.NAMESPACE_OID, content).hex
+
+# チームを JSON ファイル（saved_teams.json）に保存する
+class JsonTeamStore:
+    def __init__(self, path=JSON_PATH):
+        self.path = path
+        self.cache_key = ("json", os.path.abspath(path))
+        self._lock = threading.Lock()
+
+    # ファイルが変わったかの判定に使う値
+    def signature(self):
+        return _file_signature(self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                return data if isinstance(data, list) else []
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    # 一時ファイルに書いて fsync してから置き換える（書込み途中・電源断で壊れたファイルを読まれないように）
+    def _write(self, teams):
+        temp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(teams, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+    # ID のないチーム（以前のバージョンで保存したチーム）には内容から決めた ID を付ける（ファイルには書き込まない）
+    def _read_with_ids(self):
+        teams = self._read()
+        for team in teams:
+            if not team.get(TEAM_ID_KEY):
+                team[TEAM_ID_KEY] = _content_team_id(team)
+        return teams
+
+    # 読み込みではファイルを書き換えない（ID は次の追加・削除のときに一緒に保存する）
+    def load_teams(self):
+        return self._read_with_ids()
+
+    def add_team(self, team):
+        team_id = uuid.uuid4().hex
+        with self._lock:
+            teams = self._read_with_ids()
+            teams.append({"チーム名": team["チーム名"], "モンスター": {str(k): v for k, v in team["モンスター"].items()}, TEAM_ID_KEY: team_id})
+            self._write(teams)
+        invalidate_team_cache(self)
+        return team_id
+
+    # 位置ではなく ID で削除する（他のセッションが先に削除・追加していても、選んだチームだけを削除する）
+    # 内容から決めた ID は同じ内容のチームで重なるので、1つだけ削除する
+    def delete_team(self, team_id):
+        with self._lock:
+            teams = self._read_with_ids()
+            ids = [team[TEAM_ID_KEY] for team in teams]
+            if team_id in ids:
+                del teams[ids.index(team_id)]
+                self._write(teams)
+        invalidate_team_cache(self)
+
+# チームを SQLite（teams・monsters テーブル）に保存する
+class SqliteTeamStore:
+    """
+    - WAL モードなので、書込み中も他のセッションから読み込める
+    - 追加・削除はトランザクションで、途中で失敗しても書きかけのチームは残らない
+    - 初めて開いたときに saved_teams.json のチームを取り込む（JSON ファイルはそのまま残す）
+    """
+    def __init__(self, path=SQLITE_PATH, json_path=JSON_PATH):
+        self.path = path
+        self.json_path = json_path
+        self.cache_key = ("sqlite", os.path.abspath(path))
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    # ファイルが変わったかの判定に使う値（WAL モードの書込みは -wal ファイルに入る）
+    def signature(self):
+        return _file_signature(self.path), _file_signature(f"{self.path}-wal")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        # 設定・移行に失敗した場合は接続を閉じてから例外を返す
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            # WAL モードの既定（NORMAL）では電源断で最後のコミットが消えることがあるので、コミットごとに fsync する
+            conn.execute("PRAGMA synchronous = FULL")
+            if not self._initialized:
+                with self._lock:
+                    if not self._initialized:
+                        self._migrate(conn)
+                        self._initialized = True
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    # スキーマを作って、バージョンが古い場合は移行する
+    def _migrate(self, conn):
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+                for team in JsonTeamStore(self.json_path)._read():
+                    self._insert(conn, team)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _insert(self, conn, team):
+        team_id = conn.execute(
+            "INSERT INTO teams (name, created_at) VALUES (?, ?)", (team["チーム名"], time.time())
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO monsters (team_id, slot, name, image, type1, type2, move1, move2, move3) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(team_id, *row) for row in _monster_rows(team)]
+        )
+        return team_id
+
+    def load_teams(self):
+        conn = self._connect()
+        try:
+            teams = {
+                team_id: {"チーム名": name, "モンスター": {}, TEAM_ID_KEY: team_id}
+                for team_id, name in conn.execute("SELECT id, name FROM teams ORDER BY id")
+            }
+            for team_id, slot, name, image, type1, type2, move1, move2, move3 in conn.execute(
+                "SELECT team_id, slot, name, image, type1, type2, move1, move2, move3 FROM monsters ORDER BY team_id, slot"
+            ):
+                teams[team_id]["モンスター"][str(slot)] = {"名前": name, "タイプ": [type1, type2], "画像": image, "わざ": [move1, move2, move3]}
+        finally:
+            conn.close()
+        return list(teams.values())
+
+    def add_team(self, team):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                team_id = self._insert(conn, team)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        invalidate_team_cache(self)
+        return team_id
+
+    def delete_team(self, team_id):
+        conn = self._connect()
+        try:
+            # モンスターは ON DELETE CASCADE で同じ文の中で削除される
+            conn.execute("DELETE FROM teams WHERE id = ?", (team_id,))
+        finally:
+            conn.close()
+        invalidate_team_cache(self)
+
+# 置き換えたファイルの名前をディスクに書き込む（フォルダを開けない Windows では何もしない）
+def _fsync_directory(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# ファイルの更新日時とサイズ（ファイルがない場合は None）
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+# 辞書・リストを書き換えられない MappingProxyType・tuple にする
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+# チームを読み込む（ファイルが変わっていなければ、前回読み込んだチームをそのまま返す）
+def load_teams_cached(store):
+    """
+    全セッションで同じチームを共有するので、書き換えられないようにして返す。
+    - 戻り値：チームの tuple（チーム・モンスターは MappingProxyType、タイプ・わざは tuple）
+    """
+    # 読み込み中にファイルが変わっても、次の呼び出しで読み直すように先に調べる
+    signature = store.signature()
+    cached = _team_cache.get(store.cache_key)
+    if cached is not None and cached[0] == signature:
+        with _team_cache_lock:
+            _team_cache_stats["hits"] += 1
+        return cached[1]
+
+    teams = tuple(_freeze(team) for team in store.load_teams())
+    with _team_cache_lock:
+        _team_cache_stats["misses"] += 1
+    _team_cache.set(store.cache_key, (signature, teams))
+    return teams
+
+# アプリから書き込んだ場合は、ファイルの更新日時が変わらなくても読み直す
+def invalidate_team_cache(store):
+    _team_cache.pop(store.cache_key)
+
+# キャッシュのヒット・ミスの回数
+def team_cache_stats():
+    with _team_cache_lock:
+        return dict(_team_cache_stats)
+
+# チームの追加をバックグラウンドで行う（画面の再実行を待たせない）
+def submit_add_team(team, store=None):
+    """
+    - team: 追加するチーム（呼び出し後にセッションを書き換えても影響しないようにコピーする）
+    - 戻り値：concurrent.futures.Future（結果は add_team の戻り値、失敗した場合は例外）
+    """
+    store = store or get_team_store()
+    return _writer.submit(store.add_team, copy.deepcopy(team))
+
+# 保存先の種類ごとのクラス
+STORES = {
+    "sqlite": SqliteTeamStore,
+    "json": JsonTeamStore,
+}
+
+# 使用中の保存先（最初に使うときに作る）
+_store = None
+_store_lock = threading.Lock()
+
+# 保存先を返す
+def get_team_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                kind = os.environ.get(TEAM_STORE_ENV, DEFAULT_STORE)
+                if kind not in STORES:
+                    raise ValueError(f"{TEAM_STORE_ENV} は {', '.join(STORES)} のどれかを指定してください（{kind}）")
+                _store = STORES[kind]()
+    return _store
+
+# 保存先を差し替える（cache_key・signature・load_teams・add_team・delete_team を持つオブジェクト）
+def set_team_store(store):
+    global _store
+    _store = store
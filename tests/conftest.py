@@ -0,0 +1,34 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import pytest
+import streamlit.config
+import streamlit.logger
+
+# リポジトリのフォルダ（モジュールの import と、type_chart.json・画像などの相対パスの基準）
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# AppTest の警告でログが埋まらないようにする（設定の読込でログの設定が戻るので先に読み込む）
+streamlit.config.get_config_options()
+streamlit.logger.set_log_level("error")
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    return REPO_DIR
+
+# テスト用の空の SQLite の保存先（保存先を差し替えて、終わったら戻す）
+@pytest.fixture
+def team_store(tmp_path):
+    import team_store
+    previous = team_store._store
+    store = team_store.SqliteTeamStore(str(tmp_path / "teams.db"), json_path=str(tmp_path / "teams.json"))
+    team_store.set_team_store(store)
+    yield store
+    team_store.set_team_store(previous)
+
+# テスト用のチーム
+def make_team(name, types=("ほのお", "未")):
+    monster = {"名前": f"{name}のモンスター", "タイプ": list(types), "画像": "ほのお", "わざ": ["ほのお", "みず", "未"]}
+    return {"チーム名": name, "モンスター": {str(i): dict(monster) for i in range(1, 4)}}
@@ -0,0 +1,28 @@
+﻿# -*- coding: utf-8 -*-
+import json
+import subprocess
+import sys
+from conftest import REPO_DIR
+
+# app.py を新しいプロセスで表示して、トップページ・バトル判定ページの表示後に import 済みのページのモジュールを出力する
+SCRIPT = """
+import json, sys
+import streamlit.config, streamlit.logger
+from streamlit.testing.v1 import AppTest
+streamlit.config.get_config_options()
+streamlit.logger.set_log_level("error")
+pages = ["team_creator", "team_editor", "battle_judge"]
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+imported = [[name for name in pages if name in sys.modules]]
+at.sidebar.radio[0].set_value("バトル判定").run()
+imported.append([name for name in pages if name in sys.modules])
+print(json.dumps({"imported": imported, "exception": [e.message for e in at.exception]}))
+"""
+
+# ページのモジュールは、そのページを最初に選んだときに import する（battle_judge は保存済みチームの読込に team_editor を使う）
+def test_pages_are_imported_on_first_visit():
+    output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["exception"] == []
+    assert result["imported"] == [[], ["team_editor", "battle_judge"]]
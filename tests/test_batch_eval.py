@@ -0,0 +1,36 @@
+﻿# -*- coding: utf-8 -*-
+import json
+import random
+import pytest
+import batch_eval
+from conftest import make_team
+from type_logic import type_chart, get_compiled_chart
+
+TYPE_NAMES = list(get_compiled_chart(type_chart).type_names)
+
+@pytest.fixture
+def inputs(tmp_path):
+    teams = tmp_path / "teams.json"
+    teams.write_text(json.dumps([make_team("チームA"), make_team("チームB", ("みず", "じめん"))], ensure_ascii=False), encoding="utf-8")
+
+    # 相手チーム（まとまり CHUNK_SIZE 件をまたぐ数、"不明" を含む）
+    rng = random.Random(0)
+    enemies = tmp_path / "enemies.jsonl"
+    with open(enemies, "w", encoding="utf-8") as f:
+        for _ in range(batch_eval.CHUNK_SIZE + 50):
+            team = [[rng.choice(TYPE_NAMES + ["不明"]), rng.choice(TYPE_NAMES + ["未", "不明"])] for _ in range(3)]
+            f.write(json.dumps(team, ensure_ascii=False) + "\n")
+    return str(teams), str(enemies)
+
+# 並列で評価しても、このプロセスだけで評価した場合と同じ出力（順番も同じ）になる
+@pytest.mark.parametrize("extension", ["csv", "jsonl"])
+def test_parallel_output_matches_serial(inputs, tmp_path, extension):
+    serial = tmp_path / f"serial.{extension}"
+    parallel = tmp_path / f"parallel.{extension}"
+    batch_eval.main([*inputs, "-o", str(serial)])
+    batch_eval.main([*inputs, "-o", str(parallel), "--workers", "2"])
+
+    output = serial.read_text(encoding="utf-8")
+    assert output == parallel.read_text(encoding="utf-8")
+    rows = output.splitlines()[1:] if extension == "csv" else output.splitlines()
+    assert len(rows) == 2 * (batch_eval.CHUNK_SIZE + 50) * 3 * 3
@@ -0,0 +1,39 @@
+﻿# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+import pytest
+import battle_judge
+
+# コールバックの st.rerun は呼び出しを記録するだけにする
+@pytest.fixture
+def fake_st(monkeypatch):
+    state = {
+        "fainted": [False, False, False],
+        "enemy_fainted": [False, False, False],
+        "enemy_config_index": 0,
+        "enemy_active_index": 0,
+        "enemy_type1": "ほのお",
+        "enemy_type2": None,
+        "enemy_mons": [{"タイプ": ["ほのお", "未"]}, {"タイプ": ["不明", "不明"]}, {"タイプ": ["不明", "不明"]}],
+    }
+    scopes = []
+    monkeypatch.setattr(battle_judge, "st", SimpleNamespace(session_state=state, rerun=lambda scope="app": scopes.append(scope)))
+    return state, scopes
+
+# st.rerun が例外を出さなくても、自分のモンスターのひんしで相手の状態を変えない
+def test_faint_self_reruns_my_panels_only(fake_st):
+    state, scopes = fake_st
+    battle_judge.faint_monster(0, "self")
+    assert state["fainted"] == [True, False, False]
+    assert state["enemy_config_index"] == 0
+    assert state["enemy_type1"] == "ほのお"
+    assert scopes == [battle_judge.MY_FAINT_PANELS]
+
+# 相手の1体目がひんし：タイプ未設定の2体目に切り替える
+def test_faint_enemy_moves_to_next(fake_st):
+    state, scopes = fake_st
+    battle_judge.faint_monster(0, "enemy")
+    assert state["enemy_fainted"] == [True, False, False]
+    assert state["enemy_config_index"] == 1
+    assert state["enemy_type1"] is None
+    assert state["enemy_active_index"] == 1
+    assert scopes == [battle_judge.ENEMY_FAINT_PANELS]
@@ -0,0 +1,31 @@
+﻿# -*- coding: utf-8 -*-
+import numpy as np
+import battle_simulator
+from battle_simulator import simulate_battles
+from type_logic import type_chart
+
+TEAM = [
+    {"タイプ": ["ほのお", "未"], "わざ": ["ほのお", "みず", "未"]},
+    {"タイプ": ["みず", "未"], "わざ": ["みず", "くさ", "未"]},
+    {"タイプ": ["くさ", "未"], "わざ": ["くさ", "ほのお", "未"]},
+]
+ENEMIES = [["不明", "不明"], ["みず", "未"], ["くさ", "未"]]
+
+# 同じ入力・同じシードなら同じ結果（キャッシュから返す）
+def test_same_input_is_cached():
+    first = simulate_battles(TEAM, ENEMIES, type_chart, n_battles=200)
+    assert simulate_battles(TEAM, ENEMIES, type_chart, n_battles=200) is first
+
+# 不明な相手の候補は中身で区別する（作り直した同じ中身は同じ結果、中身が違えば別の結果）
+def test_unknown_pool_is_keyed_by_content():
+    pool = ([["ほのお", "未"], ["みず", "未"]], np.array([0.5, 0.5]))
+    first = simulate_battles(TEAM, ENEMIES, type_chart, n_battles=200, unknown_pool=pool)
+    same = ([["ほのお", "未"], ["みず", "未"]], np.array([0.5, 0.5]))
+    assert simulate_battles(TEAM, ENEMIES, type_chart, n_battles=200, unknown_pool=same) is first
+
+    # 古い重みの配列が解放されて id が使い回されても、別の中身なら計算し直す
+    del pool, same
+    other = ([["ほのお", "未"], ["みず", "未"]], np.array([1.0, 0.0]))
+    result = simulate_battles(TEAM, ENEMIES, type_chart, n_battles=200, unknown_pool=other)
+    expected = battle_simulator._simulate(TEAM, ENEMIES, (False,) * 3, (False,) * 3, 0, 200, 0, type_chart, other)
+    np.testing.assert_array_equal(result.lead_win_rates, expected.lead_win_rates)
@@ -0,0 +1,17 @@
+﻿# -*- coding: utf-8 -*-
+import json
+import benchmark
+from type_logic import get_label
+
+# 変わっていなければ基準と比べても終了コード 0、遅くした関数は「遅くなった」として終了コード 1 になる
+def test_compare_flags_injected_regression(tmp_path, monkeypatch):
+    base = str(tmp_path / "base.json")
+    args = ["-k", "get_label", "--repeat", "3"]
+    assert benchmark.main([*args, "-o", base]) == 0
+    with open(base, encoding="utf-8") as f:
+        assert list(json.load(f)["results"]) == ["get_label"]
+    assert benchmark.main([*args, "--compare", base, "--threshold", "5"]) == 0
+
+    # get_label を 200 倍遅くする（最初の計測がウォームアップ前で遅くても、しきい値を十分に超える）
+    monkeypatch.setattr(benchmark, "get_label", lambda value: [get_label(value) for _ in range(200)][0])
+    assert benchmark.main([*args, "--compare", base, "--threshold", "5"]) == 1
@@ -0,0 +1,40 @@
+﻿# -*- coding: utf-8 -*-
+import threading
+from bounded_cache import BoundedCache
+
+# 上限を超えたら、一番長く使われていないものから捨てる
+def test_evicts_least_recently_used():
+    cache = BoundedCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+# None もキャッシュする（毎回作り直さない）
+def test_get_or_create_caches_none():
+    cache = BoundedCache(maxsize=4)
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_create("key", lambda: calls.append(1)) is None
+    assert calls == [1]
+    assert cache.pop("key", "missing") is None
+    assert cache.pop("key", "missing") == "missing"
+
+# 複数のスレッドから同時に使っても上限を超えない
+def test_concurrent_use_keeps_bound():
+    cache = BoundedCache(maxsize=8)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.get_or_create((offset, i % 20), lambda: i)
+            cache.get((offset, (i + 1) % 20))
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 8
@@ -0,0 +1,63 @@
+﻿# -*- coding: utf-8 -*-
+import copy
+import json
+import pytest
+import counter_index
+from type_logic import type_chart, get_compiled_chart
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    # 他のテストで読み込んだインデックスを使わないように、読み込み済みのインデックスを空にする
+    monkeypatch.setattr(counter_index, "_indexes", counter_index.BoundedCache(maxsize=4))
+    return str(tmp_path / "counter_index.json")
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = counter_index.build_counter_index
+    monkeypatch.setattr(counter_index, "build_counter_index", lambda chart: calls.append(chart) or build(chart))
+    return calls
+
+def stored_version(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+def forget_loaded_indexes():
+    counter_index._indexes.clear()
+
+# 保存したインデックスは、再起動（読み込み済みのインデックスがない状態）の後も作り直さずに使う
+def test_reuses_stored_index(index_path, builds):
+    built = counter_index.get_counter_index(type_chart, index_path)
+    assert len(builds) == 1
+    assert stored_version(index_path) == get_compiled_chart(type_chart).version
+
+    forget_loaded_indexes()
+    assert counter_index.get_counter_index(type_chart, index_path) == built
+    assert len(builds) == 1
+
+# 保存したインデックスの相性表のバージョンが違う場合は作り直して保存し直す
+def test_rebuilds_when_stored_version_differs(index_path, builds):
+    counter_index.get_counter_index(type_chart, index_path)
+    with open(index_path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["version"] = "old"
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    forget_loaded_indexes()
+    counter_index.get_counter_index(type_chart, index_path)
+    assert len(builds) == 2
+    assert stored_version(index_path) == get_compiled_chart(type_chart).version
+
+# 相性表を書き換えた場合（再起動で読み直した場合）は、新しい相性表で作り直す
+def test_rebuilds_for_changed_chart(index_path, builds):
+    counter_index.get_counter_index(type_chart, index_path)
+    # ノーマルのわざがゴーストにも等倍で当たるようにする
+    changed = copy.deepcopy(type_chart)
+    changed["ノーマル"]["0.390625"] = []
+    changed["ノーマル"]["1.0"].append("ゴースト")
+
+    index = counter_index.get_counter_index(changed, index_path)
+    assert len(builds) == 2
+    assert index.version == get_compiled_chart(changed).version != get_compiled_chart(type_chart).version
+    assert stored_version(index_path) == index.version
@@ -0,0 +1,97 @@
+﻿# -*- coding: utf-8 -*-
+import http.client
+import json
+import threading
+import pytest
+import eval_server
+
+@pytest.fixture(scope="module")
+def server():
+    server = eval_server.PooledHTTPServer(("127.0.0.1", 0), eval_server.EvaluationHandler, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+# 同じ接続で続けて送る（エラーの後も接続が使えることを確かめる）
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    yield connection
+    connection.close()
+
+def post(connection, path, body):
+    payload = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    connection.request("POST", path, body=payload, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+MONSTER = {"タイプ": ["ほのお", "未"], "わざ": ["ほのお", "みず", "未"]}
+
+def test_effectiveness_ok(connection):
+    status, result = post(connection, "/effectiveness", {"わざ": "ほのお", "タイプ": ["くさ", "未"]})
+    assert status == 200
+    assert result["倍率"] > 1
+
+@pytest.mark.parametrize("path, body", [
+    ("/effectiveness", {"わざ": ["ほのお"], "タイプ": ["くさ", "未"]}),
+    ("/effectiveness", {"わざ": {"ほのお": 1}, "タイプ": ["くさ", "未"]}),
+    ("/effectiveness", {"わざ": "ほのお", "タイプ": [["くさ"], "未"]}),
+    ("/effectiveness", {"わざ": "ほのお", "タイプ": [{"くさ": 1}, "未"]}),
+    ("/effectiveness", {"わざ": "ほのお"}),
+    ("/effectiveness", {"わざ": "ないタイプ", "タイプ": ["くさ", "未"]}),
+    ("/totalscore", {"モンスター": {**MONSTER, "わざ": [["ほのお"], "みず", "未"]}, "相手のタイプ": [["くさ", "未"]]}),
+    ("/totalscore", {"モンスター": {**MONSTER, "タイプ": [{}, "未"]}, "相手のタイプ": [["くさ", "未"]]}),
+    ("/totalscore", {"モンスター": {**MONSTER, "名前": ["名前"]}, "相手のタイプ": [["くさ", "未"]]}),
+    ("/totalscore", {"モンスター": MONSTER, "相手のタイプ": [[["くさ"], "未"]]}),
+    ("/totalscore", {"モンスター": MONSTER, "相手のタイプ": "くさ"}),
+    ("/totalscore", {"モンスター": [MONSTER]}),
+    ("/matrix", {"チーム": {"チーム名": ["A"], "モンスター": {"1": MONSTER}}, "相手のタイプ": [["くさ", "未"]]}),
+    ("/matrix", {"チーム": {"チーム名": "A", "モンスター": {"1": MONSTER}}, "相手のタイプ": [["くさ", "未"]]}),
+    ("/matrix", {"チーム": []}),
+    ("/matrix", [{"チーム": []}, "文字列"]),
+    ("/matrix", "文字列"),
+    ("/matrix", b"{"),
+])
+def test_invalid_request_returns_400(connection, path, body):
+    status, result = post(connection, path, body)
+    assert status == 400
+    errors = [item["エラー"] for item in result] if isinstance(result, list) else [result["エラー"]]
+    assert all(errors)
+
+    # 同じ接続で次のリクエストも処理できる
+    status, _ = post(connection, "/effectiveness", {"わざ": "ほのお", "タイプ": ["くさ", "未"]})
+    assert status == 200
+
+def test_unknown_path_returns_404(connection):
+    status, _ = post(connection, "/unknown", {})
+    assert status == 404
+
+# エラーの応答もレイテンシの件数に含まれる
+def test_error_responses_are_recorded(connection):
+    before = eval_server.latency_stats().get("/totalscore", {}).get("件数", 0)
+    post(connection, "/totalscore", {"モンスター": {**MONSTER, "わざ": [["ほのお"], "みず", "未"]}})
+    post(connection, "/totalscore", b"not json")
+    assert eval_server.latency_stats()["/totalscore"]["件数"] == before + 2
+
+# ワーカーが1つでも、何も送らない持続接続がワーカーを占有し続けない
+def test_idle_keep_alive_does_not_block_other_clients(monkeypatch):
+    monkeypatch.setattr(eval_server.EvaluationHandler, "timeout", 0.5)
+    server = eval_server.PooledHTTPServer(("127.0.0.1", 0), eval_server.EvaluationHandler, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    idle = http.client.HTTPConnection(*server.server_address, timeout=10)
+    other = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        # 1件処理した後、接続を開いたまま何も送らない
+        status, _ = post(idle, "/effectiveness", {"わざ": "ほのお", "タイプ": ["くさ", "未"]})
+        assert status == 200
+        status, result = post(other, "/effectiveness", {"わざ": "ほのお", "タイプ": ["くさ", "未"]})
+        assert status == 200
+        assert result["倍率"] > 1
+    finally:
+        idle.close()
+        other.close()
+        server.shutdown()
+        server.server_close()
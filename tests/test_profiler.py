@@ -0,0 +1,52 @@
+﻿# -*- coding: utf-8 -*-
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from conftest import REPO_DIR, make_team
+import battle_judge
+import profiler
+
+# 計測した再実行の間だけ st.markdown を差し替えて、終わったら元に戻す
+def test_markdown_is_restored_after_profiling():
+    at = AppTest.from_file(f"{REPO_DIR}/app.py", default_timeout=60)
+    at.query_params["profile"] = "1"
+    at.run()
+    assert not at.exception
+    assert at.session_state["profile_history"][-1]["html_bytes"] > 0
+    assert st.markdown is profiler._original_markdown
+
+def open_battle_page(profile):
+    at = AppTest.from_file(f"{REPO_DIR}/app.py", default_timeout=60)
+    if profile:
+        at.query_params["profile"] = "1"
+    at.run()
+    at.sidebar.radio[0].set_value("バトル判定")
+    at.run()
+    assert not at.exception
+    return at
+
+# ボタンで再実行したパネル（fragment）だけが数えられ、ページ全体の再実行の回数は変わらない
+def test_fragment_reruns_are_counted(team_store):
+    team_store.add_team(make_team("チームA"))
+    at = open_battle_page(profile=False)
+    rerun_count = at.session_state["rerun_count"]
+
+    at.button(key="faint_self_0").click()
+    at.run()
+    assert not at.exception
+    assert at.session_state["rerun_count"] == rerun_count
+    assert at.session_state["fragment_rerun_counts"] == {key: 1 for key in battle_judge.MY_FAINT_PANELS}
+
+# 計測中は fragment だけの再実行も履歴に残り、終わったら st.markdown は元に戻る
+def test_fragment_reruns_are_profiled(team_store):
+    team_store.add_team(make_team("チームA"))
+    at = open_battle_page(profile=True)
+    assert st.markdown is profiler._original_markdown
+
+    at.button(key="faint_self_0").click()
+    at.run()
+    assert not at.exception
+    history = at.session_state["profile_history"]
+    fragments = history[-len(battle_judge.MY_FAINT_PANELS):]
+    assert sorted(record["kind"] for record in fragments) == sorted(battle_judge.MY_FAINT_PANELS)
+    assert {record["kind"]: record for record in fragments}[battle_judge.MY_PANEL]["html_bytes"] > 0
+    assert st.markdown is profiler._original_markdown
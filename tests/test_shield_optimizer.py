@@ -0,0 +1,21 @@
+﻿# -*- coding: utf-8 -*-
+from shield_optimizer import optimize_shields
+from type_logic import type_chart
+
+# 同じノーマルタイプ同士（シールドの数だけが違う）
+TEAM = [{"タイプ": ["ノーマル", "未"], "わざ": ["ノーマル", "ノーマル", "ノーマル"]} for _ in range(3)]
+ENEMIES = [["ノーマル", "未"] for _ in range(3)]
+
+# シールドが多いほど勝率が上がる
+def test_win_rate_increases_with_shields():
+    plans = [optimize_shields(TEAM, ENEMIES, type_chart, my_shields=shields) for shields in range(4)]
+    win_rates = [plan.win_rate for plan in plans]
+    assert win_rates == sorted(win_rates)
+    assert win_rates[0] < win_rates[-1]
+
+    # シールドを使わない場合の勝率は、シールドがない場合と同じ
+    assert all(plan.no_shield_win_rate == plans[0].win_rate for plan in plans)
+
+# 今バトル中のモンスターがひんしの場合は評価しない
+def test_fainted_active_monster_returns_none():
+    assert optimize_shields(TEAM, ENEMIES, type_chart, my_fainted=(True, False, False)) is None
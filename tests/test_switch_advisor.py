@@ -0,0 +1,22 @@
+﻿# -*- coding: utf-8 -*-
+from switch_advisor import recommend_switch
+from type_logic import type_chart
+
+# ほのお・くさ・ノーマルのモンスター（わざはすべて自分のタイプ）
+TEAM = [{"タイプ": [t, "未"], "わざ": [t, t, t]} for t in ("ほのお", "くさ", "ノーマル")]
+
+# 相手：今バトル中のみず・じめん（くさが4倍で有利）と、控えのほのお（くさが不利）
+ENEMIES = [["みず", "じめん"], ["ほのお", "未"], ["不明", "不明"]]
+
+# バトル中の相手に圧倒的に有利なモンスターへの入替えをすすめる
+def test_recommends_dominant_duel():
+    recommendations = recommend_switch(TEAM, ENEMIES, type_chart, active_index=0, enemy_fainted=(False, False, True))
+    assert [r.index for r in recommendations][0] == 1
+    assert recommendations[0].win_rate > max(r.win_rate for r in recommendations[1:])
+    assert [r.is_active for r in recommendations if r.index == 0] == [True]
+
+# ひんしのモンスターはすすめない（全員ひんしの場合は空）
+def test_skips_fainted_monsters():
+    recommendations = recommend_switch(TEAM, ENEMIES, type_chart, enemy_fainted=(False, False, True), my_fainted=(False, True, False))
+    assert sorted(r.index for r in recommendations) == [0, 2]
+    assert recommend_switch(TEAM, ENEMIES, type_chart, my_fainted=(True, True, True)) == []
@@ -0,0 +1,102 @@
+﻿# -*- coding: utf-8 -*-
+import itertools
+import random
+import threading
+import numpy as np
+import pytest
+from streamlit.testing.v1 import AppTest
+from conftest import REPO_DIR
+import team_builder
+from type_logic import type_chart, calculation_totalscore_batch, get_compiled_chart, get_defender_combinations
+
+TARGETS = [["ほのお", "ひこう"], ["みず", "じめん"], ["くさ", "未"], ["でんき", "未"], ["ゴースト", "あく"]]
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(team_builder, "_pool", None)
+    monkeypatch.setattr(team_builder, "_pool_workers", 0)
+    yield
+    if team_builder._pool is not None:
+        team_builder._pool.terminate()
+
+def wait_for_warm_pool():
+    for thread in threading.enumerate():
+        if thread.name == "team-builder-pool":
+            thread.join(timeout=120)
+
+# 候補が少ない探索はプールを起動しない
+def test_small_search_runs_in_process(fresh_pool, monkeypatch):
+    monkeypatch.setattr(team_builder.os, "cpu_count", lambda: 4)
+    result = team_builder.search_best_team(TARGETS, type_chart)
+    assert result.candidates < team_builder.PARALLEL_MIN_CANDIDATES
+    wait_for_warm_pool()
+    assert team_builder._pool is None
+
+# ページを開いただけではプールを起動しない（探索が並列になるときに初めて起動する）
+def test_builder_page_does_not_start_pool(fresh_pool, monkeypatch):
+    monkeypatch.setattr(team_builder.os, "cpu_count", lambda: 4)
+    at = AppTest.from_file(f"{REPO_DIR}/app.py", default_timeout=60)
+    at.run()
+    at.sidebar.radio[0].set_value("チーム自動探索").run()
+    assert not at.exception
+    wait_for_warm_pool()
+    assert team_builder._pool is None
+
+# 大きな探索：プールが起動していなければこのプロセスで探索して起動だけしておき、次の探索から使う
+def test_large_search_uses_warm_pool(fresh_pool, monkeypatch):
+    monkeypatch.setattr(team_builder.os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(team_builder, "PARALLEL_MIN_CANDIDATES", 0)
+    serial = team_builder.search_best_team(TARGETS, type_chart, workers=1)
+
+    first = team_builder.search_best_team(TARGETS, type_chart)
+    wait_for_warm_pool()
+    assert team_builder._pool_ready(2)
+
+    get_pool = team_builder._get_pool
+    calls = []
+    monkeypatch.setattr(team_builder, "_get_pool", lambda workers: calls.append(workers) or get_pool(workers))
+    second = team_builder.search_best_team(TARGETS, type_chart)
+    assert calls == [2]
+    assert first.score == second.score == pytest.approx(serial.score)
+
+# --- 総当たりとの比較 ---
+
+TYPE_NAMES = get_compiled_chart(type_chart).type_names
+COMBINATIONS = [list(types) for types in get_defender_combinations(type_chart)]
+
+# 全モンスター（タイプの組171通り × わざの組）の相手ごとの最大スコア
+def brute_force_best_per_target(targets):
+    specials = [(t, "未") for t in TYPE_NAMES] + list(itertools.combinations(TYPE_NAMES, 2))
+    move_sets = [[normal, *special] for normal in TYPE_NAMES for special in specials]
+    best = np.full(len(targets), -np.inf)
+    for types in COMBINATIONS:
+        scores = calculation_totalscore_batch([{"タイプ": types, "わざ": moves} for moves in move_sets], targets, type_chart)[0]
+        best = np.maximum(best, scores.max(axis=0))
+    return best
+
+# チームの評価値（相手ごとに一番スコアが高いモンスターで戦った場合の平均）
+def team_score(team, targets):
+    return calculation_totalscore_batch(team, targets, type_chart)[0].max(axis=0).mean()
+
+# 相手が3体以下なら、相手ごとに一番強いモンスターを選べるので、最良の評価値は相手ごとの最大の平均
+@pytest.mark.parametrize("targets", [[["ほのお", "ひこう"]], [["みず", "じめん"], ["ドラゴン", "未"], ["はがね", "フェアリー"]]])
+def test_search_matches_brute_force_for_few_targets(targets):
+    result = team_builder.search_best_team(targets, type_chart, workers=1)
+    expected = brute_force_best_per_target(targets).mean()
+    assert result.score == pytest.approx(expected)
+    assert team_score(result.team, targets) == pytest.approx(expected)
+
+# 相手が4体以上：候補の3体の組み合わせを総当たりした最良と同じ（候補の枝刈りは相手ごとの最大を変えない）
+@pytest.mark.parametrize("seed", range(6))
+def test_search_matches_brute_force_over_candidates(seed):
+    rng = random.Random(seed)
+    targets = rng.sample(COMBINATIONS, rng.choice([4, 5]))
+    candidates, scores = team_builder.build_candidates(targets, type_chart)
+    if len(candidates) > 150:
+        pytest.skip("候補が多すぎて総当たりに時間がかかる")
+
+    best = max(np.maximum(np.maximum(scores[i], scores[j]), scores[k]).sum() for i, j, k in itertools.combinations(range(len(scores)), 3))
+    result = team_builder.search_best_team(targets, type_chart, workers=1)
+    assert result.score == pytest.approx(best / len(targets))
+    assert team_score(result.team, targets) == pytest.approx(result.score)
+    np.testing.assert_allclose(scores.max(axis=0), brute_force_best_per_target(targets))
@@ -0,0 +1,69 @@
+﻿# -*- coding: utf-8 -*-
+import threading
+from streamlit.testing.v1 import AppTest
+import team_store
+
+# app.py と同じように、再実行ごとに保存の結果を通知して、ボタンで今のチーム名を保存する
+def save_script():
+    import streamlit as st
+    import team_creator
+
+    team_creator.initialize_team_creator_state()
+    if "pending_saves" in st.session_state:
+        team_creator.render_save_status()
+    if st.button("保存"):
+        team_creator.save_team()
+
+def save(at, team_name):
+    at.session_state["set_teamname"] = team_name
+    at.button[0].click().run()
+    assert not at.exception
+
+# バックグラウンドの書込みがすべて終わるまで待つ（書込みは1スレッドで順番に行う）
+def wait_for_writer():
+    team_store._writer.submit(lambda: None).result(timeout=10)
+
+# 前の保存が終わる前に続けて保存しても、両方の結果が通知される
+def test_quick_saves_are_all_reported(team_store, monkeypatch):
+    release = threading.Event()
+    add_team = team_store.add_team
+    monkeypatch.setattr(team_store, "add_team", lambda team: release.wait(10) and add_team(team))
+
+    at = AppTest.from_function(save_script, default_timeout=60)
+    at.session_state["selected_team_index"] = 0
+    at.run()
+    save(at, "チームA")
+    save(at, "チームB")
+    assert [info.value for info in at.sidebar.info] == ["保存中：チームA、チームB"]
+    assert not at.toast
+
+    # 保存の後も、他のページの状態は残る
+    assert at.session_state["selected_team_index"] == 0
+
+    release.set()
+    wait_for_writer()
+    at.run()
+    assert sorted(toast.value for toast in at.toast) == ["チーム「チームA」を保存しました！", "チーム「チームB」を保存しました！"]
+    assert not at.sidebar.info
+    assert "pending_saves" not in at.session_state
+    assert [team["チーム名"] for team in team_store.load_teams()] == ["チームA", "チームB"]
+
+# 保存に失敗した場合はエラーを通知する
+def test_failed_save_is_reported(team_store, monkeypatch):
+    release = threading.Event()
+    def fail(team):
+        release.wait(10)
+        raise OSError("書き込めません")
+    monkeypatch.setattr(team_store, "add_team", fail)
+
+    at = AppTest.from_function(save_script, default_timeout=60)
+    at.run()
+    save(at, "チームA")
+    assert not at.toast
+
+    release.set()
+    wait_for_writer()
+    at.run()
+    assert [toast.value for toast in at.toast] == ["チーム「チームA」を保存できませんでした：書き込めません"]
+    assert "pending_saves" not in at.session_state
+    assert team_store.load_teams() == []
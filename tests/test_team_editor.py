@@ -0,0 +1,50 @@
+﻿# -*- coding: utf-8 -*-
+from streamlit.testing.v1 import AppTest
+from conftest import REPO_DIR, make_team
+
+def open_team_editor():
+    at = AppTest.from_file(f"{REPO_DIR}/app.py", default_timeout=60)
+    at.run()
+    at.sidebar.radio[0].set_value("チーム選択・削除")
+    at.run()
+    assert not at.exception
+    return at
+
+# 削除するとタブが減り、削除したチームのタブは残らない
+def test_delete_team_removes_tab(team_store):
+    for name in ("チームA", "チームB", "チームC"):
+        team_store.add_team(make_team(name))
+    at = open_team_editor()
+    assert len(at.tabs) == 3
+
+    at.button(key="delete_team_1").click()
+    at.run()
+    assert not at.exception
+    assert [tab.label for tab in at.tabs] == ["チームA", "チームC"]
+    assert [team["チーム名"] for team in team_store.load_teams()] == ["チームA", "チームC"]
+
+# 選択中のチームより前を削除すると、選択中の番号がずれる
+def test_delete_team_keeps_selected_team(team_store):
+    for name in ("チームA", "チームB", "チームC"):
+        team_store.add_team(make_team(name))
+    at = open_team_editor()
+    at.session_state["selected_team_index"] = 2
+
+    at.button(key="delete_team_0").click()
+    at.run()
+    assert not at.exception
+    assert len(at.tabs) == 2
+    assert at.session_state["selected_team_index"] == 1
+
+# 前に選ばれていたチームのタブがない場合（他のセッションで削除された場合など）も選べる
+def test_select_team_when_previous_tab_is_gone(team_store):
+    for name in ("チームA", "チームB", "チームC"):
+        team_store.add_team(make_team(name))
+    at = open_team_editor()
+    at.session_state["selected_team_index"] = 5
+    at.run()
+
+    at.button(key="select_team_1").click()
+    at.run()
+    assert not at.exception
+    assert at.session_state["selected_team_index"] == 1
@@ -0,0 +1,132 @@
+﻿# -*- coding: utf-8 -*-
+import json
+import sqlite3
+import pytest
+from conftest import make_team
+from team_store import SCHEMA_VERSION, TEAM_ID_KEY, JsonTeamStore, SqliteTeamStore, load_teams_cached
+
+def team_names(store):
+    return [team["チーム名"] for team in store.load_teams()]
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "saved_teams.json"
+    path.write_text(json.dumps([make_team("チームA"), make_team("チームB", ("みず", "じめん"))], ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+# 初めて開いたときに JSON のチームを取り込み、2回目以降は取り込まない
+def test_migrates_json_once(tmp_path, json_path):
+    db_path = str(tmp_path / "teams.db")
+    store = SqliteTeamStore(db_path, json_path=json_path)
+    teams = store.load_teams()
+    assert [team["チーム名"] for team in teams] == ["チームA", "チームB"]
+    assert teams[1]["モンスター"]["2"]["タイプ"] == ["みず", "じめん"]
+    assert teams[0]["モンスター"]["3"]["わざ"] == ["ほのお", "みず", "未"]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+    # 開き直しても同じチームが増えない（JSON ファイルはそのまま残る）
+    assert team_names(SqliteTeamStore(db_path, json_path=json_path)) == ["チームA", "チームB"]
+    assert len(json.loads(open(json_path, encoding="utf-8").read())) == 2
+
+# 移行に失敗した場合は接続を閉じる
+def test_connection_is_closed_when_migration_fails(tmp_path, monkeypatch):
+    connections = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: connections.append(connect(*args, **kwargs)) or connections[-1])
+    def fail(conn):
+        raise sqlite3.OperationalError("移行できません")
+    store = SqliteTeamStore(str(tmp_path / "teams.db"), json_path=str(tmp_path / "none.json"))
+    monkeypatch.setattr(store, "_migrate", fail)
+
+    with pytest.raises(sqlite3.OperationalError):
+        store.load_teams()
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+
+# JSON ファイルがなくても空の保存先として開ける
+def test_opens_without_json(tmp_path):
+    store = SqliteTeamStore(str(tmp_path / "teams.db"), json_path=str(tmp_path / "none.json"))
+    assert store.load_teams() == []
+
+def test_add_and_delete(team_store):
+    first = team_store.add_team(make_team("チームA"))
+    second = team_store.add_team(make_team("チームB"))
+    third = team_store.add_team(make_team("チームC"))
+    assert team_names(team_store) == ["チームA", "チームB", "チームC"]
+    assert [team[TEAM_ID_KEY] for team in team_store.load_teams()] == [first, second, third]
+
+    # 削除したチームのモンスターも一緒に消える
+    team_store.delete_team(second)
+    assert team_names(team_store) == ["チームA", "チームC"]
+    conn = sqlite3.connect(team_store.path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM monsters WHERE team_id = ?", (second,)).fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM monsters").fetchone()[0] == 6
+    finally:
+        conn.close()
+
+    # ない ID の削除は何もしない
+    team_store.delete_team(second)
+    assert team_names(team_store) == ["チームA", "チームC"]
+
+# 追加・削除の後は、キャッシュからではなく読み直したチームを返す
+def test_cache_is_invalidated_on_write(team_store):
+    team_store.add_team(make_team("チームA"))
+    assert [team["チーム名"] for team in load_teams_cached(team_store)] == ["チームA"]
+    assert load_teams_cached(team_store) is load_teams_cached(team_store)
+
+    team_id = team_store.add_team(make_team("チームB"))
+    assert [team["チーム名"] for team in load_teams_cached(team_store)] == ["チームA", "チームB"]
+    team_store.delete_team(team_id)
+    assert [team["チーム名"] for team in load_teams_cached(team_store)] == ["チームA"]
+
+# 以前のバージョンで保存したチーム（ID なし）は、読み込むたびに同じ ID になり、読み込みではファイルを書き換えない
+def test_json_assigns_stable_ids_without_writing(json_path):
+    with open(json_path, "rb") as f:
+        original = f.read()
+    store = JsonTeamStore(json_path)
+    ids = [team[TEAM_ID_KEY] for team in store.load_teams()]
+    assert len(set(ids)) == 2 and all(ids)
+    assert [team[TEAM_ID_KEY] for team in JsonTeamStore(json_path).load_teams()] == ids
+    with open(json_path, "rb") as f:
+        assert f.read() == original
+
+    # 追加したときに、それまでのチームにも同じ ID を保存する
+    store.add_team(make_team("チームC"))
+    saved = json.loads(open(json_path, encoding="utf-8").read())
+    assert [team[TEAM_ID_KEY] for team in saved[:2]] == ids
+
+# ID のない同じ内容のチームは、削除すると1つだけ消える
+def test_json_delete_duplicate_legacy_team(tmp_path):
+    path = tmp_path / "saved_teams.json"
+    path.write_text(json.dumps([make_team("チームA"), make_team("チームA")], ensure_ascii=False), encoding="utf-8")
+    store = JsonTeamStore(str(path))
+    teams = store.load_teams()
+    store.delete_team(teams[0][TEAM_ID_KEY])
+    assert team_names(store) == ["チームA"]
+
+# 他のセッションが先に削除していても、古い一覧から選んだチームだけを削除する
+def test_json_delete_by_id_with_stale_list(json_path):
+    store = JsonTeamStore(json_path)
+    store.add_team(make_team("チームC"))
+    session_a = store.load_teams()
+    session_b = store.load_teams()
+
+    store.delete_team(session_a[0][TEAM_ID_KEY])
+    store.delete_team(session_b[1][TEAM_ID_KEY])
+    assert team_names(store) == ["チームC"]
+
+    # 削除済みの ID は何もしない
+    store.delete_team(session_b[0][TEAM_ID_KEY])
+    assert team_names(store) == ["チームC"]
+
+def test_json_add_returns_id(tmp_path):
+    store = JsonTeamStore(str(tmp_path / "teams.json"))
+    team_id = store.add_team(make_team("チームA"))
+    assert [team[TEAM_ID_KEY] for team in store.load_teams()] == [team_id]
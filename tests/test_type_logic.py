@@ -0,0 +1,153 @@
+﻿# -*- coding: utf-8 -*-
+import itertools
+import random
+import subprocess
+import sys
+import pytest
+from conftest import REPO_DIR
+from type_logic import type_chart, get_compiled_chart, get_effectiveness, get_effectiveness_table, get_label, get_total_mark, calculation_totalscore, calculation_totalscore_batch, calculation_meta_expectation, evaluate_attack_defense
+
+# --- 相性表を行列にする前の計算（比較の基準） ---
+
+def reference_effectiveness(attacker_type, enemy_types):
+    data = type_chart.get(attacker_type, {})
+    if isinstance(enemy_types, str):
+        enemy_types = [enemy_types]
+    valid_types = [t for t in enemy_types if t != "未"]
+    if len(valid_types) not in (1, 2):
+        return 1.0
+    attackvalue = 1.0
+    for defender in valid_types:
+        for key, type_list in data.items():
+            if defender in type_list:
+                attackvalue *= 1.0 if key == "等倍" else float(key)
+                break
+    return attackvalue
+
+def reference_totalscore(mon, enemy_types):
+    def usable(move):
+        return move and move != "なし"
+
+    normal_move = mon["わざ"][0]
+    normal = reference_effectiveness(normal_move, enemy_types) if usable(normal_move) else 1.0
+    specials = [reference_effectiveness(move, enemy_types) for move in mon["わざ"][1:] if usable(move)]
+    incoming = [reference_effectiveness(t, mon["タイプ"]) for t in enemy_types if usable(t)]
+    return normal * 1.2 + max(specials, default=1.0) - max(incoming, default=1.0)
+
+TYPE_NAMES = list(get_compiled_chart(type_chart).type_names)
+
+# 相手のタイプ：単一・複合・"未"・"不明"・文字列1つ・相性表にないタイプ
+ENEMY_TYPES = (
+    [[t, "未"] for t in TYPE_NAMES] + [list(pair) for pair in itertools.combinations(TYPE_NAMES, 2)]
+    + [["未", "未"], ["不明", "不明"], ["ほのお", "不明"], ["不明", "みず"], ["未", "くさ"], ["ほのお"], "でんき", ["ないタイプ", "ほのお"]]
+)
+
+@pytest.mark.parametrize("attacker", TYPE_NAMES + ["未", "不明", "なし", ""])
+def test_effectiveness_matches_reference(attacker):
+    for enemy_types in ENEMY_TYPES:
+        value, label = get_effectiveness(attacker, enemy_types, type_chart)
+        expected = reference_effectiveness(attacker, enemy_types)
+        assert value == pytest.approx(expected), (attacker, enemy_types)
+        assert label == get_label(expected)
+
+def test_totalscore_matches_reference():
+    rng = random.Random(0)
+    move_options = TYPE_NAMES + ["未", "なし", ""]
+    type_options = TYPE_NAMES + ["未"]
+    for _ in range(3000):
+        mon = {"タイプ": rng.sample(type_options, 2), "わざ": [rng.choice(move_options) for _ in range(3)]}
+        enemy_types = rng.choice(ENEMY_TYPES)
+        if isinstance(enemy_types, str):
+            continue
+        score, mark, color = calculation_totalscore(mon, enemy_types, type_chart)
+        assert score == pytest.approx(reference_totalscore(mon, enemy_types)), (mon, enemy_types)
+        assert mark and color
+
+# 相性表の倍率の境界でラベルが変わる
+@pytest.mark.parametrize("value, label", [(2.56, "◎ ばつぐん"), (1.6, "〇 ばつぐん"), (1.0, "◇ ふつう"), (0.625, "△ いまひとつ"), (0.39, "▲ いまひとつ"), (0.244, "× ほぼこうかなし")])
+def test_label(value, label):
+    assert get_label(value) == label
+
+# 倍率表は get_effectiveness を1つずつ呼んだ結果と要素ごとに一致する
+def test_effectiveness_table_matches_get_effectiveness():
+    attackers = TYPE_NAMES + ["未", "不明", "ないタイプ"]
+    table = get_effectiveness_table(attackers, ENEMY_TYPES, type_chart)
+    assert table.shape == (len(attackers), len(ENEMY_TYPES))
+    for i, attacker in enumerate(attackers):
+        for j, enemy_types in enumerate(ENEMY_TYPES):
+            assert table[i, j] == get_effectiveness(attacker, enemy_types, type_chart)[0], (attacker, enemy_types)
+
+# まとめて計算した総合評価は、モンスターと相手の組ごとに計算した値と一致する
+def test_totalscore_batch_matches_per_pair():
+    rng = random.Random(1)
+    move_options = TYPE_NAMES + ["未", "なし", ""]
+    type_options = TYPE_NAMES + ["未"]
+    mons = [{"タイプ": rng.sample(type_options, 2), "わざ": [rng.choice(move_options) for _ in range(3)]} for _ in range(40)]
+    enemies = [enemy_types for enemy_types in ENEMY_TYPES if not isinstance(enemy_types, str)]
+
+    scores, marks, colors = calculation_totalscore_batch(mons, enemies, type_chart)
+    assert scores.shape == marks.shape == colors.shape == (len(mons), len(enemies))
+    for i, mon in enumerate(mons):
+        for j, enemy_types in enumerate(enemies):
+            expected = reference_totalscore(mon, enemy_types)
+            assert scores[i, j] == pytest.approx(expected), (mon, enemy_types)
+            mark, color = get_total_mark(expected)
+            assert (marks[i, j], colors[i, j]) == (mark, color)
+
+# 出現頻度がすべて同じなら、期待スコアは相手ごとの総合評価の単純な平均になる
+def test_meta_expectation_with_uniform_frequencies(tmp_path):
+    enemies = [["ほのお", "未"], ["みず", "じめん"], ["くさ", "どく"], ["でんき", "未"], ["ゴースト", "あく"], ["ドラゴン", "フェアリー"]]
+    path = tmp_path / "meta_frequency.csv"
+    path.write_text("タイプ1,タイプ2,頻度\n" + "".join(f"{t1},{'' if t2 == '未' else t2},5\n" for t1, t2 in enemies), encoding="utf-8")
+    mons = [
+        {"名前": "A", "タイプ": ["ほのお", "未"], "わざ": ["ほのお", "みず", "未"]},
+        {"名前": "B", "タイプ": ["みず", "じめん"], "わざ": ["でんき", "くさ", "こおり"]},
+        {"名前": "C", "タイプ": ["はがね", "フェアリー"], "わざ": ["なし", "ドラゴン", ""]},
+    ]
+
+    expectation = calculation_meta_expectation(mons, type_chart, str(path))
+    assert expectation.opponents == len(enemies)
+    scores = [[reference_totalscore(mon, enemy_types) for enemy_types in enemies] for mon in mons]
+    for monster_score, row in zip(expectation.monster_scores, scores):
+        assert monster_score == pytest.approx(sum(row) / len(enemies))
+    assert expectation.team_score == pytest.approx(sum(max(column) for column in zip(*scores)) / len(enemies))
+
+# 以前の表示関数（calculation_attack_defense_evaluation）の中にあった記号の区分
+def reference_evaluation_mark(best_attackvalue, is_attack):
+    if is_attack:
+        levels = [(0.38, "×", "#d00"), (0.61, "▲", "#00a"), (0.99, "△", "#00a"), (1.59, "◇", "#000"), (2.56, "〇", "#d00")]
+        highest = ("◎", "#d00")
+    else:
+        levels = [(0.38, "◎", "#d00"), (0.75, "●", "#d00"), (1.0, "〇", "#000"), (1.59, "◇", "#000"), (2.56, "▲", "#00a")]
+        highest = ("×", "#00a")
+    for upper, mark, color in levels:
+        if best_attackvalue < upper:
+            return mark, color
+    return highest
+
+# 攻撃評価・防御予測の記号と倍率は、以前の表示関数と同じ
+def test_evaluate_attack_defense_matches_reference():
+    rng = random.Random(2)
+    for _ in range(300):
+        moves = [rng.choice(TYPE_NAMES + ["なし"]) for _ in range(3)]
+        my_types = [rng.choice(TYPE_NAMES), rng.choice(TYPE_NAMES + ["未"])]
+        enemy_types = [rng.choice(TYPE_NAMES + ["不明"]), rng.choice(TYPE_NAMES + ["未", "不明"])]
+
+        for items, target_types, is_attack in [(moves, enemy_types, True), (enemy_types, my_types, False)]:
+            # 表示関数と同じく、アイコンのあるタイプ（"なし"・"不明" 以外）だけを渡す
+            evaluated = [item for item in items if item in TYPE_NAMES]
+            result = evaluate_attack_defense(evaluated, target_types, type_chart, is_attack=is_attack)
+            if all(t == "不明" for t in target_types) or not evaluated:
+                assert result is None
+                continue
+
+            values = [reference_effectiveness(item, target_types) for item in evaluated]
+            assert result.best_attackvalue == pytest.approx(max(values))
+            assert (result.mark, result.mark_color) == reference_evaluation_mark(max(values), is_attack)
+            assert [(item, label) for item, _, label, _ in result.rows] == [(item, get_label(value)) for item, value in zip(evaluated, values)]
+
+# 相性表は import しただけでは読み込まず、最初に type_chart を参照したときに読み込む（新しいプロセスで確認する）
+def test_type_chart_is_loaded_on_first_use():
+    script = "import type_logic; print(type_logic._type_chart is None, len(type_logic.type_chart) > 0, type_logic._type_chart is not None)"
+    output = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["True", "True", "True"]
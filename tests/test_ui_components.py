@@ -0,0 +1,134 @@
+﻿# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import io
+import os
+import pytest
+import streamlit as st
+import streamlit.config
+from streamlit.testing.v1 import AppTest
+from conftest import REPO_DIR
+import ui_components
+
+@pytest.fixture
+def fresh_registry():
+    ui_components.get_asset_registry.clear()
+    yield
+    ui_components.get_asset_registry.clear()
+
+# 画像はプロセスで1回だけ読み込み、ファイルの内容どおりの base64・マニフェストを全ページで共有する
+def test_asset_registry_loads_each_image_once(fresh_registry, monkeypatch):
+    load_asset = ui_components._load_asset
+    loaded = []
+    monkeypatch.setattr(ui_components, "_load_asset", lambda path: loaded.append(path) or load_asset(path))
+
+    registry = ui_components.get_asset_registry()
+    assert ui_components.get_asset_registry() is registry
+    paths = {path for options in ui_components.ASSET_GROUPS.values() for path in options.values()}
+    assert sorted(loaded) == sorted(paths)
+
+    for group, options in ui_components.ASSET_GROUPS.items():
+        for label, path in options.items():
+            with open(path, "rb") as f:
+                data = f.read()
+            assert registry.images[group][label] == base64.b64encode(data).decode("utf-8")
+            assert registry.manifest[path] == {"sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)}
+    assert ui_components.prepare_base64_images(ui_components.TYPE_IMAGE_OPTIONS) == registry.images["move_icons"]
+
+# 静的ファイルを配信できる場合は画像を書き出してURLを使い、できない場合はデータURIを埋め込む
+@pytest.mark.parametrize("static", [True, False])
+def test_asset_sources_follow_static_serving(fresh_registry, monkeypatch, tmp_path, static):
+    enabled = st.get_option("server.enableStaticServing")
+    streamlit.config.set_option("server.enableStaticServing", static)
+    monkeypatch.setattr(ui_components, "STATIC_ICON_DIR", str(tmp_path))
+    try:
+        registry = ui_components.get_asset_registry()
+    finally:
+        streamlit.config.set_option("server.enableStaticServing", enabled)
+
+    for group, options in ui_components.ASSET_GROUPS.items():
+        for label, path in options.items():
+            src = registry.sources[group][label]
+            if not static:
+                assert src == f"data:image/png;base64,{registry.images[group][label]}"
+                continue
+            assert src.startswith(ui_components.STATIC_ICON_URL)
+            with open(path, "rb") as original, open(tmp_path / src[len(ui_components.STATIC_ICON_URL):], "rb") as exported:
+                assert exported.read() == original.read()
+    assert len(os.listdir(tmp_path)) == (len(registry.manifest) if static else 0)
+
+# 表示幅の2倍が元の画像より小さい場合は縮小版を1回だけ作り、それ以外は元の画像を使う
+def test_icon_variants_are_downscaled_once(fresh_registry, monkeypatch, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(ui_components, "STATIC_ICON_DIR", str(tmp_path))
+    make_variant = ui_components._make_variant
+    made = []
+    monkeypatch.setattr(ui_components, "_make_variant", lambda registry, path, width: made.append((path, width)) or make_variant(registry, path, width))
+    ui_components._variants.clear()
+
+    image_map = ui_components.ImageMap("move_icons")
+    label = next(iter(image_map))
+    with Image.open(ui_components.TYPE_IMAGE_OPTIONS[label]) as original:
+        width = max(original.size) // ui_components.VARIANT_SCALE - 1
+
+    src = image_map.src(label, width)
+    assert src != image_map[label]
+    assert image_map.src(label, width) == src
+    assert made == [(ui_components.TYPE_IMAGE_OPTIONS[label], width)]
+
+    data = base64.b64decode(src.split(",", 1)[1]) if src.startswith("data:") else (tmp_path / src[len(ui_components.STATIC_ICON_URL):]).read_bytes()
+    with Image.open(io.BytesIO(data)) as variant:
+        assert max(variant.size) == width * ui_components.VARIANT_SCALE
+
+    # 縮小しても小さくならない表示幅・表示幅の指定がない場合は元の画像
+    assert image_map.src(label, width + 1) == image_map[label]
+    assert image_map.src(label) == image_map[label]
+
+# 選択コンポーネントの登録はランタイムごとに1回だけで、表示するたびには登録しない
+# （AppTest は実行ごとにランタイムを作り直すので、実行ごとに1回登録し直す）
+def test_icon_selector_registers_once_per_runtime(monkeypatch):
+    component = st.components.v2.component
+    calls = []
+    monkeypatch.setattr(st.components.v2, "component", lambda *args, **kwargs: calls.append(args[0]) or component(*args, **kwargs))
+
+    at = AppTest.from_file(f"{REPO_DIR}/app.py", default_timeout=60)
+    at.run()
+    at.sidebar.radio[0].set_value("新規チーム作成")
+    for _ in range(2):
+        calls.clear()
+        at.run()
+        assert not at.exception
+        assert len(at.get("bidi_component")) == 2
+        assert calls == [ui_components.ICON_SELECT_COMPONENT]
+
+# 上限まで選んでいるときに別のものを選んでも置き換えず、警告を出す（解除すれば選べる）
+def test_icon_selection_over_the_limit_is_refused():
+    def script():
+        import streamlit as st
+        import ui_components
+        st.session_state.setdefault("type1", "ほのお")
+
+        def send(labels):
+            st.session_state["select_icons"] = {"selection": {"labels": labels}}
+            ui_components._apply_icon_selection("select_icons", ("type1",))
+
+        st.button("追加", on_click=send, args=(["ほのお", "みず"],))
+        st.button("置き換え", on_click=send, args=(["みず"],))
+        ui_components.render_icon_selector(["ほのお", "みず"], {}, [st.session_state["type1"]], ("type1",), max_select=1)
+
+    at = AppTest.from_function(script, default_timeout=60)
+    at.run()
+    assert not at.warning
+
+    at.button[0].click().run()
+    assert at.session_state["type1"] == "ほのお"
+    assert [warning.value for warning in at.warning] == ["最大1つまで選択できます"]
+
+    # 警告は次の実行では消える
+    at.run()
+    assert not at.warning
+
+    # 選択済みのものを外して選び直す場合は受け付ける
+    at.button[1].click().run()
+    assert at.session_state["type1"] == "みず"
+    assert not at.warning
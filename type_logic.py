@@ -1,10 +1,89 @@
 ﻿# -*- coding: utf-8 -*-
+import csv
+import functools
+import hashlib
 import json
+import os
+import threading
+from typing import NamedTuple
+import numpy as np
 import streamlit as st
+from bounded_cache import BoundedCache
+from ui_components import icon_src
+
+# タイプ相性(JSON)のファイル
+TYPE_CHART_PATH = "type_chart.json"
+
+# 読み込んだタイプ相性（最初に使うときに読み込んで、全セッションで共有する）
+_type_chart = None
+_type_chart_lock = threading.Lock()
 
 # タイプ相性(JSON)を読み込む
-with open("type_chart.json", encoding="utf-8") as f:
-    type_chart = json.load(f)
+def get_type_chart():
+    global _type_chart
+    if _type_chart is None:
+        with _type_chart_lock:
+            if _type_chart is None:
+                with open(TYPE_CHART_PATH, encoding="utf-8") as f:
+                    _type_chart = json.load(f)
+    return _type_chart
+
+# type_chart（from type_logic import type_chart）は、最初に参照したときに読み込む
+def __getattr__(name):
+    if name == "type_chart":
+        return get_type_chart()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# コンパイル済みのタイプ相性表（タイプIDで引ける倍率行列）
+class CompiledTypeChart(NamedTuple):
+    type_names: tuple    # タイプID順のタイプ名
+    type_ids: dict       # タイプ名 → タイプID
+    matrix: np.ndarray   # 18×18 の倍率行列（行：攻撃タイプ、列：防御タイプ）
+    lookup: np.ndarray   # matrix の末尾に等倍用の行・列を足した行列（"未"・"不明" などは等倍IDで引く）
+    neutral_id: int      # 相性表にないタイプに割り当てる等倍ID
+    version: str         # 相性表の内容から計算したバージョン（ハッシュ値）
+
+# タイプ相性(JSON)を倍率行列に変換する（get_effectiveness と同じく、同じ防御タイプが複数の倍率にある場合は先に書かれた倍率を優先）
+def compile_type_chart(type_chart):
+    type_names = tuple(key for key in type_chart if not key.startswith("_"))
+    type_ids = {name: i for i, name in enumerate(type_names)}
+    neutral_id = len(type_names)
+
+    # 未定義の組み合わせは等倍扱い
+    lookup = np.ones((neutral_id + 1, neutral_id + 1))
+    for attacker_type in type_names:
+        attacker_id = type_ids[attacker_type]
+        found = set()
+        for key, type_list in type_chart[attacker_type].items():
+
+            # "_comment" などの説明文は読み飛ばす
+            if not isinstance(type_list, list):
+                continue
+            value = 1.0 if key == "等倍" else float(key)
+            for defender in type_list:
+                defender_id = type_ids.get(defender)
+                if defender_id is not None and defender_id not in found:
+                    lookup[attacker_id, defender_id] = value
+                    found.add(defender_id)
+
+    # 共有して使うため書き換え不可にする
+    lookup.setflags(write=False)
+    version = hashlib.sha256(json.dumps(type_chart, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return CompiledTypeChart(type_names, type_ids, lookup[:neutral_id, :neutral_id], lookup, neutral_id, version)
+
+# コンパイル済みの相性表のキャッシュ（相性表の辞書オブジェクトごとに1回だけ変換する）とバージョンからの逆引き
+_compiled_charts = {}
+_compiled_versions = {}
+
+def get_compiled_chart(type_chart):
+    entry = _compiled_charts.get(id(type_chart))
+
+    # 辞書オブジェクトも一緒に保持しておき、id の再利用による取り違えを防ぐ
+    if entry is None or entry[0] is not type_chart:
+        entry = (type_chart, compile_type_chart(type_chart))
+        _compiled_charts[id(type_chart)] = entry
+        _compiled_versions.setdefault(entry[1].version, entry[1])
+    return entry[1]
 
 # 倍率をラベル文字に置き換える
 def get_label(attackvalue):
@@ -25,10 +104,13 @@ def get_label(attackvalue):
 
 # 自分のモンスターのわざに対して相手のモンスター（単一タイプと複合タイプ）への攻撃倍率の計算
 def get_effectiveness(attacker_type, enemy_types, type_chart):
+    return _lookup_effectiveness(attacker_type, enemy_types, get_compiled_chart(type_chart))
 
-    # 攻撃タイプに対応する相性データを取得
-    data = type_chart.get(attacker_type, {})
-    attackvalue = 1.0
+# コンパイル済みの倍率行列から攻撃倍率を引く（相性表にないタイプは等倍IDで引く）
+def _lookup_effectiveness(attacker_type, enemy_types, compiled):
+    type_ids = compiled.type_ids
+    neutral_id = compiled.neutral_id
+    attacker_id = type_ids.get(attacker_type, neutral_id)
 
     # enemy_types が文字列の場合：リストに変換して統一処理
     if isinstance(enemy_types, str):
@@ -39,39 +121,12 @@ def get_effectiveness(attacker_type, enemy_types, type_chart):
 
     # 有効タイプが1つだけの場合：単一タイプとして処理
     if len(valid_types) == 1:
-        defender = valid_types[0]
-        found = False
-
-        # 相性表から該当タイプの倍率を探す
-        for key, type_list in data.items():
-            if defender in type_list:
-
-                # "等倍" は1.0、それ以外は数値に変換して倍率に設定
-                value = 1.0 if key == "等倍" else float(key)
-                attackvalue = value
-                found = True
-                break
-
-        # 該当タイプが相性表に存在しない場合は等倍扱い
-        if not found:
-            attackvalue = 1.0
+        attackvalue = compiled.lookup.item(attacker_id, type_ids.get(valid_types[0], neutral_id))
 
     # 有効タイプが2つある場合：複合タイプとして倍率を掛け合わせる
     elif len(valid_types) == 2:
-        for defender in valid_types:
-            found = False
-
-            # 各タイプに対して倍率を取得し掛け算
-            for key, type_list in data.items():
-                if defender in type_list:
-                    value = 1.0 if key == "等倍" else float(key)
-                    attackvalue *= value
-                    found = True
-                    break
-
-            # 該当タイプが相性表に存在しない場合：等倍扱い
-            if not found:
-                attackvalue *= 1.0  # 未定義なら等倍扱い
+        attackvalue = (compiled.lookup.item(attacker_id, type_ids.get(valid_types[0], neutral_id))
+                       * compiled.lookup.item(attacker_id, type_ids.get(valid_types[1], neutral_id)))
 
     # どちらも "未" だった場合：念のため等倍扱い
     else:
@@ -80,6 +135,117 @@ def get_effectiveness(attacker_type, enemy_types, type_chart):
     # 最終倍率とそれに対応する評価ラベルを返す
     return attackvalue, get_label(attackvalue)
 
+# 防御側のタイプ（単一・複合）を get_effectiveness と同じルールでタイプIDの組に変換する
+def to_defender_ids(enemy_types, compiled):
+    if isinstance(enemy_types, str):
+        enemy_types = [enemy_types]
+    valid_types = [t for t in enemy_types if t != "未"]
+
+    # 単一タイプは2つ目を等倍IDにする（倍率を掛けても変わらない）
+    if len(valid_types) == 1:
+        return compiled.type_ids.get(valid_types[0], compiled.neutral_id), compiled.neutral_id
+    elif len(valid_types) == 2:
+        return (compiled.type_ids.get(valid_types[0], compiled.neutral_id),
+                compiled.type_ids.get(valid_types[1], compiled.neutral_id))
+    else:
+        return compiled.neutral_id, compiled.neutral_id
+
+# 相性表にある全タイプの単一タイプ18通り＋複合タイプ153通り（計171通り）の組み合わせを返す（例：("ほのお", "未"), ("ほのお", "みず")）
+def get_defender_combinations(type_chart):
+    type_names = get_compiled_chart(type_chart).type_names
+    singles = [(t, "未") for t in type_names]
+    duals = [(type_names[i], type_names[j]) for i in range(len(type_names)) for j in range(i + 1, len(type_names))]
+    return singles + duals
+
+# 複数の攻撃タイプ × 複数の防御タイプ（単一・複合）の倍率表をまとめて計算する
+def get_effectiveness_table(attacker_types, defender_types, type_chart):
+    """
+    get_effectiveness を全組み合わせ分ループする代わりに、倍率行列からまとめて引く。
+    - attacker_types: 攻撃タイプのリスト（例：わざのタイプ、相性表の全タイプ）
+    - defender_types: 防御タイプのリスト（各要素は "ほのお" のような文字列か、["ほのお", "未"] のようなタイプの組）
+    - 戻り値：shape (攻撃タイプ数, 防御タイプ数) の倍率表（値は get_effectiveness(...)[0] と同じ）
+    """
+    compiled = get_compiled_chart(type_chart)
+    attacker_ids = np.array([compiled.type_ids.get(t, compiled.neutral_id) for t in attacker_types], dtype=np.intp)
+    defender_ids = np.array([to_defender_ids(types, compiled) for types in defender_types], dtype=np.intp).reshape(-1, 2)
+
+    # 防御タイプ1・2の倍率をそれぞれ引いて掛け合わせる（単一タイプは等倍IDとの掛け算）
+    rows = attacker_ids[:, None]
+    return compiled.lookup[rows, defender_ids[None, :, 0]] * compiled.lookup[rows, defender_ids[None, :, 1]]
+
+# 総合評価の記号と色の区分（スコアの下限, 記号, 色）（最大値：5.24、最小値：-1.7 を想定）
+TOTAL_MARK_LEVELS = [
+    (2.5, "◎", "#d00"),
+    (1.4, "〇", "#d00"),
+    (1.0, "◇", "#000"),
+    (0.5, "△", "#00a"),
+    (0, "▲", "#00a"),
+]
+TOTAL_MARK_LOWEST = ("×", "#00a")
+
+# スコアに応じた記号と色（スコアの配列にまとめて適用）
+def get_total_mark(scores):
+    scores = np.asarray(scores)
+    conditions = [scores >= threshold for threshold, _, _ in TOTAL_MARK_LEVELS]
+    marks = np.select(conditions, [mark for _, mark, _ in TOTAL_MARK_LEVELS], default=TOTAL_MARK_LOWEST[0])
+    colors = np.select(conditions, [color for _, _, color in TOTAL_MARK_LEVELS], default=TOTAL_MARK_LOWEST[1])
+    return marks, colors
+
+# 攻撃側のタイプのリストをそろえた長さのタイプID配列と有効フラグに変換する（"なし" や空欄は無効、"未" や "不明" は等倍として有効）
+def _pad_attacker_ids(type_lists, compiled):
+    width = max((len(types) for types in type_lists), default=1)
+    ids = np.full((len(type_lists), width), compiled.neutral_id, dtype=np.intp)
+    valid = np.zeros((len(type_lists), width), dtype=bool)
+    for row, types in enumerate(type_lists):
+        for col, t in enumerate(types):
+            ids[row, col] = compiled.type_ids.get(t, compiled.neutral_id)
+            valid[row, col] = bool(t) and t != "なし"
+    return ids, valid
+
+# 有効な倍率の最大値（有効な倍率がひとつもない場合は等倍）
+def _max_valid(values, valid, axis):
+    best = np.where(valid, values, -np.inf).max(axis=axis, initial=-np.inf)
+    return np.where(np.isneginf(best), 1.0, best)
+
+# 総合評価をチーム（複数モンスター）× 相手のタイプの組み合わせ（複数）でまとめて計算する
+def calculation_totalscore_batch(mons, enemy_types_list, type_chart):
+    """
+    calculation_totalscore と同じ評価式を、倍率行列からまとめて計算する。
+    - mons: モンスターのリスト（各要素は "わざ" と "タイプ" を持つ辞書）
+    - enemy_types_list: 相手のタイプのリスト（各要素は ["ほのお", "ひこう"] のようなタイプの組）
+    - 戻り値：shape (モンスター数, 相手の数) のスコア・記号・色の配列
+    """
+    compiled = get_compiled_chart(type_chart)
+    lookup = compiled.lookup
+
+    # 相手のタイプ（防御側）：タイプ1・2のID
+    enemy_ids = np.array([to_defender_ids(types, compiled) for types in enemy_types_list], dtype=np.intp).reshape(-1, 2)
+    enemy_first, enemy_second = enemy_ids[None, :, 0], enemy_ids[None, :, 1]
+
+    # ノーマルわざ（最初の1つ）倍率
+    normal_ids, normal_valid = _pad_attacker_ids([mon["わざ"][:1] for mon in mons], compiled)
+    normal_rows = normal_ids[:, :1]
+    normal_values = lookup[normal_rows, enemy_first] * lookup[normal_rows, enemy_second]
+    normal_attackvalue = np.where(normal_valid[:, :1], normal_values, 1.0)
+
+    # スペシャルわざ（後ろ2つ）→ 最大倍率を採用
+    special_ids, special_valid = _pad_attacker_ids([mon["わざ"][1:] for mon in mons], compiled)
+    special_rows = special_ids[:, :, None]
+    special_values = lookup[special_rows, enemy_first[:, None]] * lookup[special_rows, enemy_second[:, None]]
+    special_attackvalue = _max_valid(special_values, special_valid[:, :, None], axis=1)
+
+    # 被ダメージ予測（相手のタイプが使うと仮定）
+    incoming_ids, incoming_valid = _pad_attacker_ids(enemy_types_list, compiled)
+    mon_ids = np.array([to_defender_ids(mon["タイプ"], compiled) for mon in mons], dtype=np.intp).reshape(-1, 2)
+    incoming_rows = incoming_ids[None, :, :]
+    incoming_values = (lookup[incoming_rows, mon_ids[:, 0, None, None]]
+                       * lookup[incoming_rows, mon_ids[:, 1, None, None]])
+    incoming_attackvalue = _max_valid(incoming_values, incoming_valid[None, :, :], axis=2)
+
+    # 総合スコア計算
+    total_score = normal_attackvalue * 1.2 + special_attackvalue * 1.0 - incoming_attackvalue * 1.0
+    return (total_score, *get_total_mark(total_score))
+
 # 総合評価（モンスターの攻撃・防御をもとに総合評価スコアと記号・色を返す）
 def calculation_totalscore(mon, enemy_types, type_chart):
     """
@@ -90,42 +256,204 @@ def calculation_totalscore(mon, enemy_types, type_chart):
     スペシャルわざ：火力は高いがシールド（最大3回）で無効化される可能性あり
     相手のこうげき（減点）：相手のタイプをわざとして自分に与えるより大きいダメージで計算（仮定）
     """
-    # ノーマルわざ（最初の1つ）倍率取得
-    normal_move = mon["わざ"][0]
-    normal_attackvalue = get_effectiveness(normal_move, enemy_types, type_chart)[0] if normal_move and normal_move != "なし" else 1.0
-
-    # スペシャルわざ（後ろ2つ）→ 最大倍率を採用
-    special_moves = mon["わざ"][1:]
-    special_attackvalue = max(
-        get_effectiveness(move, enemy_types, type_chart)[0]
-        for move in special_moves if move and move != "なし"
-    ) if any(move and move != "なし" for move in special_moves) else 1.0
-
-    # 被ダメージ予測（相手のタイプが使うと仮定）
-    incoming_attackvalue = max(
-        get_effectiveness(enemy_type, mon["タイプ"], type_chart)[0]
-        for enemy_type in enemy_types if enemy_type and enemy_type != "なし"
-    ) if any(enemy_type and enemy_type != "なし" for enemy_type in enemy_types) else 1.0
-
-    # 総合スコア計算
-    total_score = normal_attackvalue * 1.2 + special_attackvalue * 1.0 - incoming_attackvalue * 1.0
+    scores, marks, colors = calculation_totalscore_batch([mon], [enemy_types], type_chart)
+    return float(scores[0, 0]), str(marks[0, 0]), str(colors[0, 0])
+
+# 相手のタイプの出現頻度（環境）のファイル（CSV：タイプ1,タイプ2,頻度 ／ JSON：[{"タイプ": ["ほのお", "ひこう"], "頻度": 12}, ...]）
+META_PATH = "meta_frequency.csv"
+
+# 読み込んだ出現頻度
+class MetaFrequencies(NamedTuple):
+    enemy_types: list    # 相手のタイプの組（例：["ほのお", "未"]）
+    weights: np.ndarray  # 合計が1になるよう正規化した出現頻度
+    mtime: float         # 読み込んだときのファイルの更新時刻
+
+# 環境に対する期待スコア
+class MetaExpectation(NamedTuple):
+    monster_scores: np.ndarray  # モンスターごとの総合評価の期待値（出現頻度で重み付けした平均）
+    team_score: float           # 相手ごとにチームで一番総合評価が高いモンスターを出した場合の期待値
+    opponents: int              # 出現頻度ファイルにある相手の数
+
+# 出現頻度のキャッシュ（ファイルの更新時刻が変わったときだけ読み直す）と、期待スコアのキャッシュ（(チーム, ファイル, 更新時刻, 相性表のバージョン) ごと）
+_meta_frequencies = {}
+_meta_expectations = BoundedCache(maxsize=256)
+
+def _read_meta_rows(path):
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return [(row.get("タイプ", []), row.get("頻度")) for row in json.load(f)]
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return [([row.get("タイプ1") or "未", row.get("タイプ2") or "未"], row.get("頻度")) for row in csv.DictReader(f)]
+
+# 相手のタイプの出現頻度を読み込む（ファイルがない・有効な行がない場合は None）
+def load_meta_frequencies(path=META_PATH, type_chart=None):
+    type_chart = type_chart if type_chart is not None else get_type_chart()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _meta_frequencies.get((path, id(type_chart)))
+    if cached is not None and cached.mtime == mtime:
+        return cached
+
+    try:
+        rows = _read_meta_rows(path)
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        print(f"出現頻度の読み込み失敗: {path} → {e}")
+        return None
+
+    # 相性表にないタイプ・頻度が数値でない行は読み飛ばす
+    type_ids = get_compiled_chart(type_chart).type_ids
+    enemy_types, weights = [], []
+    for types, frequency in rows:
+        types = [t or "未" for t in list(types)[:2]]
+        types += ["未"] * (2 - len(types))
+        try:
+            frequency = float(frequency)
+        except (TypeError, ValueError):
+            continue
+        if frequency > 0 and types[0] in type_ids and (types[1] == "未" or types[1] in type_ids):
+            enemy_types.append(types)
+            weights.append(frequency)
+    if not weights:
+        return None
+
+    weights = np.array(weights) / sum(weights)
+    weights.setflags(write=False)
+    meta = MetaFrequencies(enemy_types, weights, mtime)
+    _meta_frequencies[(path, id(type_chart))] = meta
+    return meta
+
+# 出現頻度で重み付けした総合評価の期待値をモンスターごと・チームごとに計算する（ファイルがない場合は None）
+def calculation_meta_expectation(mons, type_chart, path=META_PATH):
+    meta = load_meta_frequencies(path, type_chart)
+    if meta is None:
+        return None
+
+    team_key = tuple((tuple(mon["タイプ"]), tuple(mon["わざ"])) for mon in mons)
+    key = (team_key, path, meta.mtime, get_compiled_chart(type_chart).version)
+    expectation = _meta_expectations.get(key)
+    if expectation is None:
+
+        # モンスター × 相手の総合評価に出現頻度を掛けて合計（行列積）
+        scores = calculation_totalscore_batch(mons, meta.enemy_types, type_chart)[0]
+        monster_scores = scores @ meta.weights
+        monster_scores.setflags(write=False)
+        team_score = float(scores.max(axis=0, initial=-np.inf) @ meta.weights) if len(mons) else 0.0
+        expectation = MetaExpectation(monster_scores, team_score, len(meta.enemy_types))
+        _meta_expectations.set(key, expectation)
+    return expectation
+
+# 環境（よく使われる相手のタイプ）に対する期待スコアを表示
+def render_meta_expectation(mons, type_chart, path=META_PATH):
+    expectation = calculation_meta_expectation(mons, type_chart, path)
+
+    # 出現頻度ファイルがない場合：案内を表示
+    if expectation is None:
+        st.markdown(f"<span style='color:gray;'>{path}（相手のタイプの出現頻度）を置くと、環境に対する期待スコアが表示されます</span>", unsafe_allow_html=True)
+        return
 
-    # スコアに応じた記号と色（最大値：5.24、最小値：-1.7 を想定）
-    def get_total_mark(score):
-        if score >= 2.5:
-            return "◎", "#d00"
-        elif score >= 1.4:
+    mark, color = get_total_mark(expectation.team_score)
+    st.markdown(
+        f"<span style='font-size:18px; font-weight:bold;'>チームの期待スコア：<span style='color:{color};'>{mark}（{expectation.team_score:.2f}）</span></span>",
+        unsafe_allow_html=True
+    )
+    for mon, score in zip(mons, expectation.monster_scores):
+        mark, color = get_total_mark(score)
+        st.markdown(f"- {mon['名前']}：<span style='color:{color};'>{mark}（{score:.2f}）</span>", unsafe_allow_html=True)
+    st.markdown(f"<span style='font-size:12px; color:gray;'>※ {expectation.opponents} 種類の相手の出現頻度で重み付けした総合評価の平均です</span>", unsafe_allow_html=True)
+
+# 攻撃評価・防御予測の計算結果（キャッシュで共有するため変更不可・ハッシュ可能な形）
+class AttackDefenseEvaluation(NamedTuple):
+    mark: str            # 評価記号
+    mark_color: str      # 評価記号の色
+    best_attackvalue: float
+    rows: tuple          # わざやタイプごとの (わざ・タイプ, 倍率, 評価ラベル, 文字色)
+
+# 最良倍率に応じた記号と色を返す（攻撃と防御で異なる）
+def get_evaluation_mark(best_attackvalue, is_attack=True):
+    if is_attack:
+        if best_attackvalue < 0.38:
+            return "×", "#d00"
+        elif 0.38 <= best_attackvalue < 0.61:
+            return "▲", "#00a"
+        elif 0.61 <= best_attackvalue < 0.99:
+            return "△", "#00a"
+        elif 0.99 <= best_attackvalue < 1.59:
+            return "◇", "#000"
+        elif 1.59 <= best_attackvalue < 2.56:
             return "〇", "#d00"
-        elif score >= 1.0:
+        else:
+            return "◎", "#d00"
+    else:
+        if best_attackvalue < 0.38:
+            return "◎", "#d00"
+        elif 0.38 <= best_attackvalue < 0.75:
+            return "●", "#d00"
+        elif 0.75 <= best_attackvalue < 1.0:
+            return "〇", "#000"
+        elif 1.0 <= best_attackvalue < 1.59:
             return "◇", "#000"
-        elif score >= 0.5:
-            return "△", "#00a"
-        elif score >= 0:
+        elif 1.59 <= best_attackvalue < 2.56:
             return "▲", "#00a"
         else:
             return "×", "#00a"
 
-    return total_score, *get_total_mark(total_score)
+# こうかの色分け
+def get_evaluation_label_color(attackvalue, is_attack=True):
+    try:
+        attackvalue = round(attackvalue, 2)
+    except (ValueError, TypeError):
+        return "#000"
+    if is_attack:
+        # 攻撃評価：高いほど赤、低いほど青
+        if attackvalue <= 0.5:
+            return "#00a"
+        elif attackvalue <= 1.0:
+            return "#000"
+        else:
+            return "#d00"
+    else:
+        # 防御予測：高いほど赤、低いほど青
+        if attackvalue <= 0.98:
+            return "#d00"
+        elif attackvalue <= 1.0:
+            return "#000"
+        else:
+            return "#00a"
+
+@functools.lru_cache(maxsize=4096)
+def _evaluate_attack_defense(items, target_types, is_attack, chart_version):
+    compiled = _compiled_versions[chart_version]
+
+    # 各わざやタイプに対して倍率と評価ラベルを計算し、最大倍率を探す
+    best_attackvalue = -1
+    rows = []
+    for item in items:
+        attackvalue, label = _lookup_effectiveness(item, target_types, compiled)
+        rows.append((item, attackvalue, label, get_evaluation_label_color(attackvalue, is_attack)))
+        if attackvalue > best_attackvalue:
+            best_attackvalue = attackvalue
+
+    # 評価が1件もない場合：結果なし
+    if not rows:
+        return None
+    return AttackDefenseEvaluation(*get_evaluation_mark(best_attackvalue, is_attack), best_attackvalue, tuple(rows))
+
+# 攻撃評価・防御予測の計算（Streamlit に依存しない。同じ入力・同じ相性表なら LRU キャッシュの結果を返す）
+def evaluate_attack_defense(items, target_types, type_chart, is_attack=True):
+    """
+    - items: 評価するわざやタイプ（"なし" や空欄は除く）
+    - target_types: 対象となるタイプ（すべて "不明" の場合は評価しない）
+    - 戻り値：AttackDefenseEvaluation（評価できない場合は None）
+    """
+    if not target_types or all(t == "不明" or t is None for t in target_types):
+        return None
+    items = tuple(item for item in items if item and item != "なし")
+    if isinstance(target_types, str):
+        target_types = [target_types]
+    return _evaluate_attack_defense(items, tuple(target_types), is_attack, get_compiled_chart(type_chart).version)
 
 # 攻撃評価・防御予測を共通のUIで表示
 def calculation_attack_defense_evaluation(title: str, items: list, target_types: list, type_icon_map: dict, type_chart: dict, is_attack: bool = True):
@@ -137,98 +465,25 @@ def calculation_attack_defense_evaluation(title: str, items: list, target_types:
     - is_attack: Trueなら攻撃評価、Falseなら防御予測
     """
 
-    # 最良倍率の初期値を設定（攻撃なら低く、防御なら高く）
-    best_attackvalue = -1
-    best_label = None
-    evaluations = []
-
-    # タイプやわざが未設定の場合：表示しない
-    if (not target_types or all(t == "不明" or t is None for t in target_types)
-        or not items or all(item == "なし" or item not in type_icon_map for item in items)
-        ):
-            return
-
-    # 各わざやタイプに対して倍率と評価ラベルを計算
-    for item in items:
-        if item and item != "なし" and item in type_icon_map:
-            attackvalue, label = get_effectiveness(item, target_types, type_chart)
-            evaluations.append((item, attackvalue, label))
-
-            # 最大倍率を探す
-            if attackvalue > best_attackvalue:
-                best_attackvalue = attackvalue
-                best_label = label
-
-    # 評価が1件もない場合：表示せず終了
-    if not evaluations:
+    # アイコンがあるわざやタイプだけを評価（タイプやわざが未設定の場合：表示しない）
+    if not items:
+        return
+    evaluation = evaluate_attack_defense([item for item in items if item in type_icon_map], target_types, type_chart, is_attack)
+    if evaluation is None:
         return
-
-    # # 最良倍率に応じた記号と色を返す関数（攻撃と防御で異なる）
-    def get_mark_and_color(attackvalue):
-        if is_attack:
-            if best_attackvalue < 0.38:
-                return "×", "#d00"
-            elif 0.38 <= attackvalue < 0.61:
-                return "▲", "#00a"
-            elif 0.61 <= attackvalue < 0.99:
-                return "△", "#00a"
-            elif 0.99 <= attackvalue < 1.59:
-                return "◇", "#000"
-            elif 1.59 <= attackvalue < 2.56:
-                return "〇", "#d00"
-            else:
-                return "◎", "#d00"
-        else:
-            if best_attackvalue < 0.38:
-                return "◎", "#d00"
-            elif 0.38 <= attackvalue < 0.75:
-                return "●", "#d00"
-            elif 0.75 <= attackvalue < 1.0:
-                return "〇", "#000"
-            elif 1.0 <= attackvalue < 1.59:
-                return "◇", "#000"
-            elif 1.59 <= attackvalue < 2.56:
-                return "▲", "#00a"
-            else:
-                return "×", "#00a"
 
     # タイトルと評価記号を表示
-    mark, mark_color = get_mark_and_color(best_attackvalue)
     st.markdown(
-        f"<span style='font-size:18px; font-weight:bold;'>{title}：<span style='color:{mark_color};'>{mark}</span></span>",
+        f"<span style='font-size:18px; font-weight:bold;'>{title}：<span style='color:{evaluation.mark_color};'>{evaluation.mark}</span></span>",
         unsafe_allow_html=True
     )
 
-    # こうかの色分け
-    def get_label_color(attackvalue):
-        try:
-            attackvalue = round(attackvalue, 2)
-        except (ValueError, TypeError):
-            return "#000"
-        if is_attack:
-            # 攻撃評価：高いほど赤、低いほど青
-            if attackvalue <= 0.5:
-                return "#00a"
-            elif attackvalue <= 1.0:
-                return "#000"
-            else:
-                return "#d00"
-        else:
-            # 防御予測：高いほど赤、低いほど青
-            if attackvalue <= 0.98:
-                return "#d00"
-            elif attackvalue <= 1.0:
-                return "#000"
-            else:
-                return "#00a"
-
     # 各わざやタイプの評価をアイコン付きで表示
-    for item, attackvalue, label in evaluations:
-        color = get_label_color(attackvalue)
+    for item, attackvalue, label, color in evaluation.rows:
         st.markdown(
             f"""
             <div style="display:flex; align-items:center; gap:8px; font-size:16px;">
-                <img src="data:image/png;base64,{type_icon_map[item]}" width="24">
+                <img src="{icon_src(type_icon_map, item, 24)}" width="24">
                 <span style="color:{color};">{label}{'（予測）' if not is_attack else ''}</span>
             </div>
             """,
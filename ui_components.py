@@ -1,5 +1,20 @@
 ﻿import streamlit as st
 import base64
+import hashlib
+import io
+import os
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from streamlit.runtime import Runtime
+from bounded_cache import BoundedCache
+from profiler import profiled
+
+# Pillow がない場合は縮小版を作らずに元の画像を表示する
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # モンスター画像
 IMAGE_OPTIONS = {
@@ -44,6 +59,164 @@ TYPE_IMAGE_OPTIONS = {
     "ノーマル": "move_icons/Normal_move.png",
 }
 
+# アセットのグループ（グループ名 → ラベルと画像パスの辞書）
+ASSET_GROUPS = {
+    "images": IMAGE_OPTIONS,
+    "move_icons": TYPE_IMAGE_OPTIONS,
+}
+
+# 画像を並列で読み込むスレッド数
+ASSET_LOAD_WORKERS = 8
+
+# 静的ファイル配信（.streamlit/config.toml の server.enableStaticServing）で画像を置くフォルダとURL
+STATIC_ICON_DIR = os.path.join("static", "icons")
+STATIC_ICON_URL = "app/static/icons/"
+
+# 表示幅ごとの縮小版（高解像度の画面でもぼやけないように表示幅の VARIANT_SCALE 倍で作る、WebP が使えない場合は PNG）
+VARIANT_SCALE = 2
+VARIANT_FORMAT = "WEBP"
+VARIANT_QUALITY = 90
+
+# 縮小版の <img> の src（(画像パス, 表示幅, マニフェストのバージョン) → src、縮小しない場合は None）
+_variants = BoundedCache(maxsize=1024)
+
+# 全ページ・全セッションで共有する画像
+class AssetRegistry(NamedTuple):
+    images: dict        # グループ名 → {ラベル: base64文字列}
+    sources: dict       # グループ名 → {ラベル: <img> の src（静的ファイルのURL、配信できない場合はデータURI）}
+    manifest: dict      # 画像パス → {"sha256": 内容のハッシュ, "bytes": サイズ}
+    version: str        # マニフェスト全体のハッシュ（画像が変わると変わる）
+    static: bool        # 静的ファイルとして配信しているか
+
+# 画像1つを読み込む（ファイルがない場合は None）
+def _load_asset(path):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        print(f"画像読み込み失敗: {path} → {e}")
+        return None
+    return data, {"sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)}
+
+# 静的ファイルのファイル名（元の画像の内容のハッシュを付ける、縮小版は表示幅も付ける）
+def _static_name(path, sha256, width=None, ext=None):
+    stem, original_ext = os.path.splitext(os.path.basename(path))
+    size = f".w{width}" if width else ""
+    return f"{stem}.{sha256[:12]}{size}{ext or original_ext}"
+
+# 画像を静的ファイルのフォルダに書き出して、URLを返す
+def _export_static(name, data):
+    """
+    ファイル名が内容ごとに変わるので、ブラウザにキャッシュされた古い画像が使われることはない。
+    - 戻り値：URL（書き出せない場合は None）
+    """
+    target = os.path.join(STATIC_ICON_DIR, name)
+    try:
+        if not os.path.exists(target):
+            os.makedirs(STATIC_ICON_DIR, exist_ok=True)
+            temp = f"{target}.{os.getpid()}.tmp"
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, target)
+    except OSError as e:
+        print(f"画像の書き出し失敗: {name} → {e}")
+        return None
+    return STATIC_ICON_URL + name
+
+# 画像をプロセスで1回だけ並列で読み込む（最初に使われたときに読み込む）
+@st.cache_resource(show_spinner=False)
+def get_asset_registry():
+    paths = sorted({path for options in ASSET_GROUPS.values() for path in options.values()})
+    with ThreadPoolExecutor(max_workers=ASSET_LOAD_WORKERS) as executor:
+        loaded = dict(zip(paths, executor.map(_load_asset, paths)))
+
+    manifest = {path: asset[1] for path, asset in loaded.items() if asset}
+    encoded = {path: base64.b64encode(asset[0]).decode("utf-8") for path, asset in loaded.items() if asset}
+
+    # 静的ファイルを配信できる場合はURL、できない場合はデータURIを <img> に埋め込む
+    static = st.get_option("server.enableStaticServing")
+    urls = {path: _export_static(_static_name(path, entry["sha256"]), loaded[path][0]) if static else None for path, entry in manifest.items()}
+    sources = {path: urls[path] or f"data:image/png;base64,{encoded[path]}" for path in manifest}
+
+    images, group_sources = {}, {}
+    for group, options in ASSET_GROUPS.items():
+        images[group] = {label: encoded[path] for label, path in options.items() if path in manifest}
+        group_sources[group] = {label: sources[path] for label, path in options.items() if path in manifest}
+    version = hashlib.sha256("".join(f"{path}:{entry['sha256']}" for path, entry in manifest.items()).encode("utf-8")).hexdigest()
+    return AssetRegistry(images, group_sources, manifest, version, static)
+
+# 表示幅に合わせた縮小版を作って、<img> の src を返す
+def _make_variant(registry, path, width):
+    """
+    - 戻り値：src（Pillow がない場合・元の画像より大きくなる場合・作れない場合は None）
+    """
+    size = width * VARIANT_SCALE
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            if size >= max(image.size):
+                return None
+            image.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            Image.init()
+            image_format = VARIANT_FORMAT if VARIANT_FORMAT in Image.SAVE else "PNG"
+            image.save(buffer, image_format, quality=VARIANT_QUALITY)
+    except (OSError, ValueError) as e:
+        print(f"縮小版の作成失敗: {path}（{width}px） → {e}")
+        return None
+
+    data = buffer.getvalue()
+    ext = f".{image_format.lower()}"
+    if registry.static:
+        url = _export_static(_static_name(path, registry.manifest[path]["sha256"], width, ext), data)
+        if url:
+            return url
+    return f"data:image/{image_format.lower()};base64,{base64.b64encode(data).decode('utf-8')}"
+
+# 表示幅に合わせた画像の src（縮小版は最初に使うときに作って、以降はキャッシュを使う）
+def get_variant_src(registry, group, label, width):
+    path = ASSET_GROUPS[group].get(label)
+    if path not in registry.manifest:
+        return registry.sources[group][label]
+    src = _variants.get_or_create((path, width, registry.version), lambda: _make_variant(registry, path, width))
+    return src or registry.sources[group][label]
+
+# base64文字列、または静的ファイルのURL・データURIを <img> の src にする
+def image_src(value):
+    if value.startswith(("data:", STATIC_ICON_URL)):
+        return value
+    return f"data:image/png;base64,{value}"
+
+# 画像の辞書（ImageMap・base64文字列の辞書）から、表示幅に合わせた <img> の src を返す
+def icon_src(image_map, label, width=None):
+    if isinstance(image_map, ImageMap):
+        return image_map.src(label, width)
+    return image_src(image_map[label])
+
+# グループの画像（{ラベル: <img> の src}）を、最初に参照したときにレジストリから取り出す辞書
+class ImageMap(Mapping):
+    def __init__(self, group):
+        self.group = group
+
+    def _images(self):
+        return get_asset_registry().sources[self.group]
+
+    # 表示幅に合わせた縮小版の src（width が None の場合は元の画像）
+    def src(self, label, width=None):
+        if width is None:
+            return self[label]
+        return get_variant_src(get_asset_registry(), self.group, label, int(width))
+
+    def __getitem__(self, label):
+        return self._images()[label]
+
+    def __iter__(self):
+        return iter(self._images())
+
+    def __len__(self):
+        return len(self._images())
+
 # 画像ファイルをbase64文字列に変換
 @st.cache_data
 def get_base64_image(path):
@@ -54,7 +227,13 @@ def get_base64_image(path):
         return ""
 
 # ラベルと画像パスの辞書を受け取り、base64変換した辞書を返す(例：{"ほのお": "base64文字列"})
+@profiled
 def prepare_base64_images(option_dict):
+    # 登録済みのグループはレジストリの画像を使う
+    for group, options in ASSET_GROUPS.items():
+        if option_dict is options:
+            return dict(get_asset_registry().images[group])
+
     result = {}
     for label, path in option_dict.items():
         try:
@@ -75,7 +254,7 @@ def render_icon_with_label(label, base64_dict, width=32, font_size=10, fallback=
             st.markdown(
                 f"""
                 <div style="text-align:center;">
-                    <img src="data:image/png;base64,{img_base64}" width="{width}"><br>
+                    <img src="{icon_src(base64_dict, label, width)}" width="{width}"><br>
                     {label_html}
                 </div>
                 """,
@@ -158,7 +337,7 @@ def show_icon(label, base64_dict, size=40, show_label_text=True):
     st.markdown(
         f"""
         <div style="text-align:center;">
-            <img src="data:image/png;base64,{base64_dict[label]}" width="{size}">
+            <img src="{icon_src(base64_dict, label, size)}" width="{size}">
             {label_html}
         </div>
         """,
@@ -181,7 +360,7 @@ def render_monster_image_battlestate(image_base64: str, width: int = 80, darken:
     st.markdown(
         f"""
         <div style="{style} width:{width}px; display:inline-block;">
-            <img src="data:image/png;base64,{image_base64}" width="{width}">
+            <img src="{image_src(image_base64)}" width="{width}">
         </div>
         """,
         unsafe_allow_html=True
@@ -194,55 +373,187 @@ def render_type_icons(type_list: list, icon_map: dict, width: int = 24):
     # 有効なタイプがある場合：画像表示
     if valid_types:
         for t in valid_types:
-            st.image(f"data:image/png;base64,{icon_map[t]}", width=width)
+            st.markdown(f"<img src='{icon_src(icon_map, t, width)}' width='{width}'>", unsafe_allow_html=True)
     
     # 有効なタイプがない場合：案内メッセージを表示
     else:
         st.markdown("<span style='color:gray;'>上部からタイプを選択してください</span>", unsafe_allow_html=True)
 
+# アイコン選択のコンポーネント（ブラウザの中で選択・解除して、決定した選択だけをサーバーに送る）
+ICON_SELECT_COMPONENT = "icon_select"
+
+ICON_SELECT_HTML = """
+<div class="icon-select"></div>
+<div class="icon-select-footer">
+    <button type="button" class="icon-select-apply">決定</button>
+</div>
+"""
+
+ICON_SELECT_CSS = """
+.icon-select {
+    display: grid;
+    grid-template-columns: repeat(var(--columns), minmax(0, 1fr));
+    gap: 4px;
+}
+.icon-select-tile {
+    border: 1px solid transparent;
+    border-radius: 8px;
+    padding: 4px;
+    background: none;
+    color: inherit;
+    cursor: pointer;
+    text-align: center;
+}
+.icon-select-tile:hover {
+    border-color: var(--border-color);
+}
+.icon-select-tile.selected {
+    border: 3px solid var(--highlight-color);
+}
+.icon-select-tile span {
+    display: block;
+    font-size: 10px;
+    white-space: nowrap;
+}
+.icon-select-footer {
+    margin-top: 4px;
+}
+.icon-select-apply[hidden] {
+    display: none;
+}
+"""
+
+ICON_SELECT_JS = """
+export default function ({ data, parentElement, setStateValue, setTriggerValue }) {
+    const grid = parentElement.querySelector(".icon-select");
+    const apply = parentElement.querySelector(".icon-select-apply");
+    const maxSelect = data.max_select;
+    let selected = data.selected.slice();
+
+    grid.style.setProperty("--columns", data.columns);
+    grid.style.setProperty("--highlight-color", data.highlight_color);
+    grid.style.setProperty("--border-color", data.border_color);
+
+    const changed = () => selected.length !== data.selected.length || selected.some((label) => !data.selected.includes(label));
+    // 同じ選択をもう一度送った場合もサーバーで変更として扱われるように、送った時刻を付ける
+    const send = () => {
+        if (changed()) {
+            setStateValue("selection", { labels: selected, sent_at: Date.now() });
+        }
+    };
+
+    const render = () => {
+        grid.replaceChildren(...data.options.map(({ label, src }) => {
+            const tile = document.createElement("button");
+            tile.type = "button";
+            tile.title = label;
+            tile.className = selected.includes(label) ? "icon-select-tile selected" : "icon-select-tile";
+            const img = document.createElement("img");
+            img.src = src;
+            img.width = data.image_width;
+            img.alt = label;
+            tile.append(img);
+            if (data.show_label) {
+                const text = document.createElement("span");
+                text.textContent = label;
+                tile.append(text);
+            }
+            tile.onclick = () => toggle(label);
+            return tile;
+        }));
+        // 1つだけ選ぶ場合はクリックしたらすぐ送るので、決定ボタンは出さない
+        apply.hidden = maxSelect === 1;
+        apply.disabled = !changed();
+    };
+
+    const toggle = (label) => {
+        if (selected.includes(label)) {
+            selected = selected.filter((item) => item !== label);
+        } else if (selected.length < maxSelect) {
+            selected = [...selected, label];
+        } else {
+            // 上限まで選んでいる場合は選択を変えずに、警告を出すようにサーバーに知らせる
+            setTriggerValue("rejected", label);
+            return;
+        }
+        render();
+
+        // 1つだけ選ぶ場合・上限まで選んだ場合は、決定ボタンを待たずに送る
+        if (maxSelect === 1 || selected.length === maxSelect) {
+            send();
+        }
+    };
+
+    apply.onclick = send;
+    render();
+}
+"""
+
+# 選択コンポーネントを登録する（登録先は Streamlit のランタイム）
+def _register_icon_select():
+    global _icon_select_runtime
+    _icon_select_runtime = Runtime.instance() if Runtime.exists() else None
+    return st.components.v2.component(ICON_SELECT_COMPONENT, html=ICON_SELECT_HTML, css=ICON_SELECT_CSS, js=ICON_SELECT_JS)
+
+# import したときに1回だけ登録する（render_icon_selector では表示するだけ）
+_icon_select_runtime = None
+icon_select = _register_icon_select()
+
+# ランタイムより先に import された場合（テストなど）だけ、今のランタイムに登録し直す
+def _ensure_icon_select_registered():
+    if Runtime.exists() and Runtime.instance() is not _icon_select_runtime:
+        _register_icon_select()
+
+# コンポーネントから送られた選択をセッションのキーに入れる（選択済みのキーはそのまま、新しく選んだものは空いているキーへ）
+def _apply_icon_selection(component_key, session_keys, on_change=None):
+    selection = (st.session_state[component_key].get("selection") or {}).get("labels") or []
+    labels = [st.session_state.get(key) if st.session_state.get(key) in selection else None for key in session_keys]
+    new_labels = [label for label in selection if label not in labels]
+    # 空いているキーより多く選ばれた場合は、選択を変えずに警告を出す
+    if len(new_labels) > labels.count(None):
+        _reject_icon_selection(component_key)
+        return
+    for label in new_labels:
+        labels[labels.index(None)] = label
+    for key, label in zip(session_keys, labels):
+        st.session_state[key] = label
+    if on_change:
+        on_change()
+
+# 上限を超える選択は受け付けず、次の表示で警告を出す
+def _reject_icon_selection(component_key):
+    st.session_state[f"{component_key}_warning"] = True
+
 # 画像選択UI(タイプアイコンやモンスター画像の選択)
+@profiled
 def render_icon_selector(label_list, base64_dict, selected_labels, session_keys, max_select=1, title="画像を選択してください", image_width=60, columns_per_row=9,
-    highlight_color="#00ccff", border_color="#007BFF", show_label=True, select_key_prefix="select", unselect_key_prefix="unselect", rerun_on_select=True ):
+    highlight_color="#00ccff", border_color="#007BFF", show_label=True, select_key_prefix="select", unselect_key_prefix="unselect", rerun_on_select=True, on_change=None ):
+    """
+    選択・解除はブラウザの中で行い、決定した選択だけを1回で送るので、何回クリックしても実行は1回だけ
+    （1つだけ選ぶ場合・max_select まで選んだ場合はすぐに送る。それ以外は「決定」ボタンで送る）。
+    max_select まで選んだ後に別のものを選ぶと、選択は変えずに警告を出す（先に解除する）。
+    unselect_key_prefix・rerun_on_select は以前の呼び出しと同じ引数で呼べるように残している。
+    - select_key_prefix: コンポーネントのキー（同じページで複数使う場合は変える）
+    - on_change: 選択を session_keys に入れた後にコールバックの中で呼ぶ関数（st.rerun で再実行する範囲を指定する場合など）
+    """
 
     st.markdown(f"#### {title}")
-    rows = [label_list[i:i+columns_per_row] for i in range(0, len(label_list), columns_per_row)]
-
-    for row in rows:
-        cols = st.columns(len(row))
-        for i, label in enumerate(row):
-            with cols[i]:
-                selected = label in selected_labels
-                border = f"3px solid {highlight_color}" if selected else "1px solid transparent"
-                label_html = f"<div style='font-size:10px; white-space:nowrap;'>{label}</div>" if show_label else ""
-
-                img_base64 = base64_dict.get(label, "")
-                st.markdown(
-                    f"""
-                    <div style="border:{border}; border-radius:8px; padding:4px; text-align:center;">
-                        <img src="data:image/png;base64,{img_base64}" width="{image_width}"><br>
-                        {label_html}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-
-                # ボタン処理（選択されたら解除ボタンに変更する）
-                if selected:
-                    if st.button("解除", key=f"{unselect_key_prefix}_{label}_{i}"):
-                        for key in session_keys:
-                            if st.session_state.get(key) == label:
-                                st.session_state[key] = None
-                        if rerun_on_select:
-                            st.rerun()
-                else:
-                    if st.button("選択", key=f"{select_key_prefix}_{label}_{i}"):
-                        for key in session_keys:
-                            if st.session_state.get(key) is None:
-                                st.session_state[key] = label
-
-                                # 編集中のモンスター情報を即座に保存
-                                if rerun_on_select:
-                                    st.rerun()
-                                return
-                        st.warning(f"最大{max_select}つまで選択できます")
-
+    component_key = f"{select_key_prefix}_icons"
+    _ensure_icon_select_registered()
+    icon_select(
+        key=component_key,
+        data={
+            "options": [{"label": label, "src": icon_src(base64_dict, label, image_width) if label in base64_dict else ""} for label in label_list],
+            "selected": [label for label in selected_labels if label],
+            "max_select": max_select,
+            "columns": columns_per_row,
+            "image_width": image_width,
+            "highlight_color": highlight_color,
+            "border_color": border_color,
+            "show_label": show_label,
+        },
+        on_selection_change=lambda: _apply_icon_selection(component_key, session_keys, on_change),
+        on_rejected_change=lambda: _reject_icon_selection(component_key),
+    )
+    if st.session_state.pop(f"{component_key}_warning", False):
+        st.warning(f"最大{max_select}つまで選択できます")
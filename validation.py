@@ -0,0 +1,56 @@
+﻿# -*- coding: utf-8 -*-
+# チーム・モンスターの入力チェック（画面に依存しないので、team_creator と eval_server の両方から使う）
+
+# チームの入力チェック（セッションに依存しないので、保存以外の入力チェックにも使う）
+def validate_team(team_name, monsters):
+    """
+    - team_name: チーム名
+    - monsters: 1〜3体目のモンスター（キーは 1〜3 または "1"〜"3"）
+    - 戻り値：エラーメッセージのリスト（問題がなければ空）
+    """
+    errors = []
+
+    # チーム名チェック
+    if not (team_name or "").strip():
+        errors.append("チーム名を入力してください")
+
+    # モンスターごとのチェック
+    for i in range(1, 4):
+        mon = monsters.get(i) or monsters.get(str(i))
+        if not mon:
+            errors.append(f"{i}体目のモンスターが未設定です")
+            continue
+        errors.extend(validate_monster(i, mon))
+
+    return errors
+
+# モンスター1体の入力チェック
+def validate_monster(i, mon):
+    errors = []
+    name = mon["名前"]
+    image = mon["画像"]
+    moves = mon["わざ"]
+    types = mon.get("タイプ", ["未", "未"])
+
+    if name == "未":
+        errors.append(f"{i}体目のモンスターの名前を入力してください")
+    if image == "未":
+        errors.append(f"{i}体目のモンスターの画像を選択してください")
+
+    # タイプ1・2の両方が未設定ならエラー
+    if types[0] == "未" and types[1] == "未":
+        errors.append(f"{i}体目のモンスターのタイプを最低1つは選択してください")
+
+    # 通常技は必須
+    if moves[0] == "未":
+        errors.append(f"{i}体目のモンスターの通常わざを選択してください")
+
+    # スペシャルわざ1・2のどちらも未選択ならエラー
+    if moves[1] == "未" and moves[2] == "未":
+        errors.append(f"{i}体目のモンスターのスペシャルわざを最低1つは選択してください")
+
+    # タイプ1・2が同じ場合（未設定以外）
+    if types[0] != "未" and types[0] == types[1]:
+        errors.append(f"{i}体目のモンスターのタイプ1とタイプ2が同じです。異なるタイプを選択してください")
+
+    return errors